@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import db
+        from .instrumentation import register_command_listener
+        from .passwords import current_method_prefix
+
+        # pymongo hands listeners to clients as they are created, so register before any client exists
+        register_command_listener()
+        db.install_fork_hook()
+        db.configure()
+        # costs one full password hash, which login requests should not pay
+        current_method_prefix()
@@ -0,0 +1,53 @@
+import asyncio
+import weakref
+
+from django.conf import settings
+
+_clients = weakref.WeakKeyDictionary()
+_client_factory = None
+
+
+def default_client_factory():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    return AsyncIOMotorClient(settings.MONGODB_HOST, **{
+        **getattr(settings, 'MONGODB_CONNECT_OPTIONS', {}),
+        'maxPoolSize': getattr(settings, 'ASYNC_MONGODB_POOL_SIZE', 100),
+    })
+
+
+def set_client_factory(factory):
+    """Swaps the client used by the async views, e.g. for an in-memory stand-in in tests."""
+    global _client_factory
+    _client_factory = factory
+    _clients.clear()
+
+
+def forget_clients():
+    """Drops the clients of this process without closing them; used after fork (see db.py)."""
+    _clients.clear()
+
+
+def get_client():
+    """
+    Returns the async client for the running event loop. A motor client is bound to the loop
+    it was first used on, so the pool is shared by every request served on that loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = (_client_factory or default_client_factory)()
+        _clients[loop] = client
+    return client
+
+
+def get_collection(document, view=None):
+    """
+    The async counterpart of ``document._get_collection()``, in the same database, reading
+    with the preference db.routed() would give ``view``.
+    """
+    from .db import read_preference
+
+    collection = get_client()[document._get_db().name][document._get_collection_name()]
+    preference = read_preference(document, view)
+    return collection if preference is None else collection.with_options(read_preference=preference)
@@ -0,0 +1,208 @@
+"""
+Async versions of the catalog, cart and order-listing endpoints, backed by the motor client
+in async_db. They return the same payloads as their namesakes in views and are routed in
+place of them when API_ASYNC_VIEWS is set.
+"""
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from .async_db import get_collection
+from .cache import cache_parts, cached_catalog_response, get_cached_parts, json_response
+from .compatibility import CART_PROJECTION, cart_tdp_summary, parse_object_ids
+from .filters import parts_query
+from .instrumentation import timed, timed_db
+from .models import Order, PCPart
+from .pagination import PagePlan, PaginationError, sort_fields
+from .permissions import IsAuthenticatedCustom
+from .serializers import (
+    ORDER_PRODUCT_FIELDS, PCPartSerializer, RawOrderSerializer, RawPCPartSerializer, parse_part_fields,
+    raw_order_product_ids, select_part_fields,
+)
+from .snapshot import ENABLED as SNAPSHOT_ENABLED, current_snapshot, get_snapshot
+from .views import OrderPagination, OrderViewSet, async_csrf_exempt, method_not_allowed
+
+logger = logging.getLogger(__name__)
+
+order_list_view = OrderViewSet.as_view({'get': 'list', 'post': 'create'})
+
+
+def _projection(fields):
+    return {'_id': True, **{field: True for field in fields if field != 'id'}}
+
+
+async def _find(collection, query, projection, sort=None, limit=None, skip=None):
+    cursor = collection.find(query, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    if skip:
+        cursor = cursor.skip(skip)
+    if limit:
+        cursor = cursor.limit(limit)
+    with timed_db():
+        return await cursor.to_list(length=None)
+
+
+def _snapshot_select(params, plan):
+    return get_snapshot().select(params, plan)
+
+
+async def _select_from_snapshot(params, plan):
+    snapshot = current_snapshot()
+    if snapshot is None or params.get('search'):
+        # building the snapshot or the search index does blocking I/O
+        return await sync_to_async(_snapshot_select, thread_sensitive=False)(params, plan)
+    with timed('snapshot'):
+        return snapshot.select(params, plan)
+
+
+def _parts_response(plan, documents, fields):
+    parts, next_cursor = plan.finish(documents)
+    data = RawPCPartSerializer(parts, many=True, fields=fields).data
+    if plan.paginated:
+        return json_response({
+            "results": data,
+            "next_cursor": next_cursor,
+        })
+    return json_response(data)
+
+
+@cached_catalog_response
+async def get_parts(request):
+    if request.method != 'GET':
+        return method_not_allowed(request)
+    params = request.GET
+    try:
+        try:
+            fields = parse_part_fields(params.get('fields'))
+            plan = PagePlan(params)
+        except (ValueError, PaginationError) as e:
+            return json_response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if SNAPSHOT_ENABLED:
+            return _parts_response(plan, await _select_from_snapshot(params, plan), fields)
+
+        if params.get('search'):
+            query = await sync_to_async(parts_query, thread_sensitive=False)(params)
+        else:
+            query = parts_query(params)
+        if plan.condition:
+            query = {'$and': [query, plan.condition]}
+        projection = set(fields or PCPartSerializer.Meta.fields) | sort_fields(params)
+
+        documents = await _find(get_collection(PCPart, 'get_parts'), query, _projection(projection), plan.mongo_sort, plan.limit)
+        return _parts_response(plan, documents, fields)
+    except Exception as e:
+        logger.error(f"Error in async get_parts: {str(e)}", exc_info=True)
+        return json_response({
+            "error": "An error occurred while fetching parts. Please try again."
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@cached_catalog_response
+async def get_part_by_id(request, part_id):
+    """Fetches a single PCPart by its ID."""
+    if request.method != 'GET':
+        return method_not_allowed(request)
+    try:
+        try:
+            fields = parse_part_fields(request.GET.get('fields'))
+        except ValueError as e:
+            return json_response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        cached = get_cached_parts([part_id])
+        if part_id in cached:
+            return json_response(select_part_fields(cached[part_id], fields))
+
+        object_ids = parse_object_ids([part_id])
+        part = None
+        if object_ids:
+            with timed_db():
+                part = await get_collection(PCPart, 'get_part_by_id').find_one(
+                    {'_id': object_ids[0]}, _projection(PCPartSerializer.Meta.fields)
+                )
+        if part is None:
+            return json_response({'error': 'Part not found'}, status=status.HTTP_404_NOT_FOUND)
+        data = RawPCPartSerializer(part).data
+        cache_parts({part_id: data}, 'get_part_by_id')
+        return json_response(select_part_fields(data, fields))
+    except Exception as e:
+        logger.error(f"Error in async get_part_by_id for ID {part_id}: {str(e)}", exc_info=True)
+        return json_response({
+            "error": "An error occurred while fetching the part. Please try again."
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@async_csrf_exempt
+async def get_cart_tdp(request):
+    if request.method != 'POST':
+        return method_not_allowed(request)
+    try:
+        try:
+            part_ids = json.loads(request.body or b'{}').get("ids", [])
+        except (ValueError, AttributeError):
+            part_ids = None
+        if not part_ids or not isinstance(part_ids, list):
+            return json_response({"error": "Expected list of part IDs"}, status=400)
+
+        parts = await _find(
+            get_collection(PCPart), {'_id': {'$in': parse_object_ids(part_ids)}}, _projection(CART_PROJECTION)
+        )
+        return json_response(cart_tdp_summary(parts))
+
+    except Exception as e:
+        return json_response({"error": str(e)}, status=500)
+
+
+@async_csrf_exempt
+async def orders(request):
+    """
+    Lists the caller's orders asynchronously, with OrderViewSet's ?page_size= pagination and
+    ?expand=product summaries; order creation stays on OrderViewSet.
+    """
+    if request.method != 'GET':
+        return await sync_to_async(order_list_view, thread_sensitive=False)(request)
+
+    authenticated = await sync_to_async(IsAuthenticatedCustom().has_permission, thread_sensitive=False)(request, None)
+    if not authenticated:
+        return json_response(
+            {'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_403_FORBIDDEN
+        )
+    try:
+        collection = get_collection(Order)
+        query = {'user': request.user.id}
+        # same opt-in ?page_size= and ?page= handling as OrderViewSet; the page is found by its count
+        pagination = OrderPagination()
+        page = skip = limit = None
+        if pagination.get_page_size(Request(request)):
+            with timed_db():
+                count = await collection.count_documents(query)
+            try:
+                pagination.paginate_queryset(range(count), Request(request))
+            except NotFound as e:
+                return json_response({'detail': str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
+            page = pagination.page
+            skip, limit = max(page.start_index() - 1, 0), page.paginator.per_page
+        documents = await _find(collection, query, None, [('created_at', -1)], limit=limit, skip=skip)
+
+        products = None
+        if request.GET.get('expand') == 'product':
+            summaries = await _find(
+                get_collection(PCPart), {'_id': {'$in': raw_order_product_ids(documents)}},
+                _projection(ORDER_PRODUCT_FIELDS),
+            )
+            products = {
+                str(doc['_id']): RawPCPartSerializer(doc, fields=ORDER_PRODUCT_FIELDS).data for doc in summaries
+            }
+
+        data = RawOrderSerializer(documents, user=request.user, many=True, products=products).data
+        if page is not None:
+            return json_response(pagination.get_paginated_response(data).data)
+        return json_response(data)
+    except Exception as e:
+        logger.error(f"Error listing orders for user {request.user}: {e}", exc_info=True)
+        return json_response({'error': 'An internal server error occurred.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,211 @@
+"""
+Budget-constrained auto-builder: picks one part of every required type so that the build's
+weighted performance score is as high as possible while the parts stay compatible (CPU and
+motherboard socket, RAM and motherboard memory type, motherboard fits the case, PSU covers the
+build's TDP with headroom) and the total price fits the budget.
+
+This is a multiple-choice knapsack. Each type is first pruned to its Pareto front (no cheaper
+part of the same compatibility group scores at least as high), then every motherboard group is
+solved at once over NumPy arrays: all CPU x GPU pairs are priced together with the cheapest PSU
+and case they need, and the best RAM that fits the remaining budget is found by binary search.
+"""
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .compatibility import PSU_HEADROOM
+
+# part types of a complete build, as normalized by the rule table
+BUILD_TYPES = ('CPU', 'MOTHERBOARD', 'RAM', 'GPU', 'PSU', 'CASE')
+
+# per use case, how much each type's score (scaled to 0..1 within the type) counts towards the build's score
+SCORE_WEIGHTS = getattr(settings, 'BUILDER_SCORE_WEIGHTS', {
+    'gaming': {'CPU': 1.0, 'GPU': 1.5, 'RAM': 0.5},
+    'workstation': {'CPU': 1.5, 'GPU': 0.75, 'RAM': 1.0},
+    'office': {'CPU': 1.0, 'GPU': 0.25, 'RAM': 0.75},
+})
+DEFAULT_USE_CASE = getattr(settings, 'BUILDER_DEFAULT_USE_CASE', 'gaming')
+
+
+class NoBuildFound(Exception):
+    """No compatible combination of parts fits the budget."""
+
+
+class PartColumns:
+    """The parts of one type as NumPy columns; row i describes ``parts[i]``."""
+
+    def __init__(self, parts, codes):
+        self.parts = parts
+        self.price = np.array([part.price for part in parts], dtype=float)
+        score = np.array([part.score for part in parts], dtype=float)
+        top = score.max() if len(parts) else 0
+        self.score = score / top if top else score
+        self.tdp = np.array([part.tdp for part in parts], dtype=float)
+        self.wattage = np.array([part.wattage for part in parts], dtype=float)
+        self.board_size = np.array([part.board_size for part in parts], dtype=int)
+        self.socket = np.array([codes.setdefault(part.socket, len(codes)) for part in parts], dtype=int)
+        self.memory_type = np.array([codes.setdefault(part.memory_type, len(codes)) for part in parts], dtype=int)
+
+    def __len__(self):
+        return len(self.parts)
+
+
+def pareto_front(price, score, groups):
+    """Indices of the parts that no cheaper part of the same group matches or beats on score."""
+    keep = [np.array([], dtype=int)]
+    for group in np.unique(groups):
+        members = np.flatnonzero(groups == group)
+        members = members[np.lexsort((-score[members], price[members]))]
+        best_before = np.maximum.accumulate(np.concatenate(([-np.inf], score[members][:-1])))
+        keep.append(members[score[members] > best_before])
+    return np.concatenate(keep)
+
+
+def _group_key(*columns):
+    if not len(columns[0]):
+        return np.array([], dtype=int)
+    return np.unique(np.stack(columns, axis=1), axis=0, return_inverse=True)[1].ravel()
+
+
+class BuildCatalog:
+    """The pruned per-type candidate arrays the solver runs over, derived once per rule table."""
+
+    def __init__(self, table):
+        codes = {None: -1}
+        by_type = {part_type: [] for part_type in BUILD_TYPES}
+        # a snapshot: request threads may add parts to the table while this runs
+        for part in list(table.parts.values()):
+            if part.type in by_type and part.price > 0:
+                by_type[part.type].append(part)
+        self.codes = codes
+        self.columns = {part_type: PartColumns(parts, codes) for part_type, parts in by_type.items()}
+
+        cpus = self.columns['CPU']
+        gpus = self.columns['GPU']
+        rams = self.columns['RAM']
+        boards = self.columns['MOTHERBOARD']
+        psus = self.columns['PSU']
+        cases = self.columns['CASE']
+
+        # parts whose constraint specs are unknown cannot be checked, so they are never picked
+        cpu = np.flatnonzero(cpus.socket >= 0)
+        self.cpus = cpu[pareto_front(cpus.price[cpu], cpus.score[cpu], _group_key(cpus.socket[cpu], cpus.tdp[cpu]))]
+        self.gpus = pareto_front(gpus.price, gpus.score, _group_key(gpus.tdp))
+        ram = np.flatnonzero(rams.memory_type >= 0)
+        self.rams = ram[pareto_front(rams.price[ram], rams.score[ram], rams.memory_type[ram])]
+
+        # motherboards and cases only cost money, so the cheapest of each group is enough
+        board = np.flatnonzero((boards.socket >= 0) & (boards.memory_type >= 0) & (boards.board_size > 0))
+        self.boards = board[pareto_front(
+            boards.price[board], np.zeros(len(board)),
+            _group_key(boards.socket[board], boards.memory_type[board], boards.board_size[board]),
+        )]
+
+        case = np.flatnonzero(cases.board_size > 0)
+        self.cases = case[np.argsort(cases.price[case], kind='stable')]
+
+        # cheapest PSU delivering at least a given wattage: running minimum from the most powerful down
+        psu = np.flatnonzero(psus.wattage > 0)
+        psu = psu[np.argsort(psus.wattage[psu], kind='stable')]
+        self.psu_wattage = psus.wattage[psu]
+        self.psu_pick = np.empty(len(psu), dtype=int)
+        cheapest = None
+        for position in range(len(psu) - 1, -1, -1):
+            if cheapest is None or psus.price[psu[position]] < psus.price[cheapest]:
+                cheapest = psu[position]
+            self.psu_pick[position] = cheapest
+        self.psu_price = psus.price[self.psu_pick]
+
+    def cheapest_case(self, size):
+        cases = self.columns['CASE']
+        fitting = self.cases[cases.board_size[self.cases] >= size]
+        return fitting[0] if len(fitting) else None
+
+    def build(self, budget, socket=None, weights=None):
+        """The highest scoring compatible build within ``budget`` as {type: RulePart}, scored with a SCORE_WEIGHTS profile."""
+        weights = SCORE_WEIGHTS[DEFAULT_USE_CASE] if weights is None else weights
+        cpus, gpus, rams = self.columns['CPU'], self.columns['GPU'], self.columns['RAM']
+        boards, cases = self.columns['MOTHERBOARD'], self.columns['CASE']
+        if not all(len(candidates) for candidates in (self.cpus, self.gpus, self.rams, self.boards, self.psu_pick)):
+            raise NoBuildFound()
+
+        gpu = self.gpus[gpus.price[self.gpus] <= budget]
+        gpu_price, gpu_tdp = gpus.price[gpu], gpus.tdp[gpu]
+        gpu_score = weights.get('GPU', 0) * gpus.score[gpu]
+
+        best = None
+        for board in self.boards:
+            if socket is not None and boards.socket[board] != self.codes.get(socket):
+                continue
+            case = self.cheapest_case(boards.board_size[board])
+            if case is None:
+                continue
+            base_price = boards.price[board] + cases.price[case]
+
+            cpu = self.cpus[(cpus.socket[self.cpus] == boards.socket[board]) & (cpus.price[self.cpus] <= budget - base_price)]
+            ram = self.rams[rams.memory_type[self.rams] == boards.memory_type[board]]
+            if not len(cpu) or not len(ram) or not len(gpu):
+                continue
+            # within one memory type the front rises in score with price, so the last affordable RAM is the best
+            ram = ram[np.argsort(rams.price[ram], kind='stable')]
+            ram_price = rams.price[ram]
+            ram_score = weights.get('RAM', 0) * rams.score[ram]
+
+            need = (cpus.tdp[cpu][:, None] + gpu_tdp[None, :]) * PSU_HEADROOM
+            psu_position = np.searchsorted(self.psu_wattage, need, side='left')
+            has_psu = psu_position < len(self.psu_wattage)
+            psu_position = np.minimum(psu_position, len(self.psu_wattage) - 1)
+            price = base_price + cpus.price[cpu][:, None] + gpu_price[None, :] + self.psu_price[psu_position]
+
+            ram_position = np.searchsorted(ram_price, budget - price, side='right') - 1
+            feasible = has_psu & (ram_position >= 0)
+            if not feasible.any():
+                continue
+            ram_position = np.maximum(ram_position, 0)
+            score = (
+                weights.get('CPU', 0) * cpus.score[cpu][:, None] + gpu_score[None, :] + ram_score[ram_position]
+            )
+            # among equal scores prefer the cheaper build
+            total = price + ram_price[ram_position]
+            ranked = np.where(feasible, score - total * 1e-9, -np.inf)
+            i, j = np.unravel_index(np.argmax(ranked), ranked.shape)
+            if best is None or ranked[i, j] > best[0]:
+                best = (ranked[i, j], score[i, j], {
+                    'CPU': cpus.parts[cpu[i]],
+                    'MOTHERBOARD': boards.parts[board],
+                    'RAM': rams.parts[ram[ram_position[i, j]]],
+                    'GPU': gpus.parts[gpu[j]],
+                    'PSU': self.columns['PSU'].parts[self.psu_pick[psu_position[i, j]]],
+                    'CASE': cases.parts[case],
+                })
+        if best is None:
+            raise NoBuildFound()
+        return best[1], best[2]
+
+
+_catalog_lock = threading.Lock()
+
+
+def get_build_catalog(table):
+    """BuildCatalog of a rule table, derived on first use; a rebuilt table gets a fresh one."""
+    with _catalog_lock:
+        if getattr(table, 'build_catalog', None) is None:
+            table.build_catalog = BuildCatalog(table)
+        return table.build_catalog
+
+
+def auto_build(table, budget, socket=None, use_case=DEFAULT_USE_CASE):
+    """The response body of ``auto_build_view``; ``use_case`` names one of SCORE_WEIGHTS."""
+    score, parts = get_build_catalog(table).build(budget, socket, SCORE_WEIGHTS[use_case])
+    return {
+        'budget': budget,
+        'use_case': use_case,
+        'total_price': round(sum(part.price for part in parts.values()), 2),
+        'total_tdp': sum(part.tdp for part in parts.values()),
+        'score': round(float(score), 4),
+        'parts': [
+            {'id': part.id, 'name': part.name, 'type': part.type, 'price': part.price}
+            for part in parts.values()
+        ],
+    }
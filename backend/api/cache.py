@@ -0,0 +1,198 @@
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponseNotModified, JsonResponse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = getattr(settings, 'CATALOG_CACHE_ALIAS', 'catalog')
+MAX_AGE = getattr(settings, 'CATALOG_CACHE_MAX_AGE', 60)
+VERSION_KEY = 'catalog:version'
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def catalog_version():
+    """Current catalog generation; every cache key embeds it, so bumping it invalidates all entries."""
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version():
+    cache = get_cache()
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, timeout=None)
+        return 2
+
+
+def cache_timeout(view=None):
+    """
+    Seconds to keep catalog entries read by ``view``: the cache's timeout, capped at the max
+    staleness of the view's read preference so a lagging secondary read is not served for
+    longer than the lag it was allowed.
+    """
+    from .db import read_preference
+    from .models import PCPart
+
+    timeout = get_cache().default_timeout
+    staleness = getattr(read_preference(PCPart, view), 'max_staleness', -1)
+    if staleness > 0 and (timeout is None or staleness < timeout):
+        return staleness
+    return timeout
+
+
+def part_cache_key(version, part_id):
+    return f'catalog:{version}:part:{part_id}'
+
+
+def get_cached_parts(part_ids):
+    """
+    {part_id: serialized part} for the ``part_ids`` found in the per-part cache shared by
+    get_part_by_id and get_parts_batch. Entries hold every PCPartSerializer field.
+    """
+    try:
+        version = catalog_version()
+        keys = {part_cache_key(version, part_id): part_id for part_id in part_ids}
+        return {keys[key]: data for key, data in get_cache().get_many(list(keys)).items()}
+    except Exception as e:
+        logger.error(f"Catalog cache unavailable: {e}", exc_info=True)
+        return {}
+
+
+def cache_parts(parts, view=None):
+    """Stores {part_id: serialized part with every field}, as read by ``view``, in the per-part cache."""
+    if not parts:
+        return
+    try:
+        version = catalog_version()
+        entries = {part_cache_key(version, part_id): data for part_id, data in parts.items()}
+        get_cache().set_many(entries, timeout=cache_timeout(view))
+    except Exception as e:
+        logger.error(f"Catalog cache unavailable: {e}", exc_info=True)
+
+
+def response_cache_key(name, request, kwargs):
+    query = getattr(request, 'query_params', request.GET)
+    params = sorted((key, sorted(query.getlist(key))) for key in query)
+    normalized = json.dumps([name, sorted(kwargs.items()), params], separators=(',', ':'))
+    digest = hashlib.sha1(normalized.encode()).hexdigest()
+    return f'catalog:{catalog_version()}:{name}:{digest}'
+
+
+def compute_etag(data):
+    body = json.dumps(data, cls=JSONEncoder, separators=(',', ':'), sort_keys=True)
+    return '"%s"' % hashlib.sha1(body.encode()).hexdigest()
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    candidates = {candidate.strip().removeprefix('W/') for candidate in header.split(',')}
+    return '*' in candidates or etag in candidates
+
+
+def json_response(data, status=status.HTTP_200_OK, headers=None):
+    """JsonResponse encoded like DRF's JSONRenderer, for the async views that bypass DRF."""
+    response = JsonResponse(
+        data, status=status, headers=headers, safe=False, encoder=JSONEncoder,
+        json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False},
+    )
+    response.data = data
+    return response
+
+
+def _lookup(view, request, kwargs):
+    try:
+        key = response_cache_key(view.__name__, request, kwargs)
+        return key, get_cache().get(key)
+    except Exception as e:
+        logger.error(f"Catalog cache unavailable: {e}", exc_info=True)
+        return None, None
+
+
+def _store(view, key, response):
+    entry = (response.data, compute_etag(response.data))
+    try:
+        get_cache().set(key, entry, timeout=cache_timeout(view.__name__))
+    except Exception as e:
+        # the response is still served, with its ETag, just not cached
+        logger.error(f"Catalog cache unavailable: {e}", exc_info=True)
+    return entry
+
+
+def _headers(etag, cache_status):
+    return {
+        'ETag': etag,
+        'Cache-Control': f'public, max-age={MAX_AGE}',
+        'X-Cache': cache_status,
+    }
+
+
+def cached_catalog_response(view):
+    """
+    Caches successful responses of a catalog view keyed on the view name, its URL kwargs and the
+    normalized query params. Adds ETag/Cache-Control headers and answers If-None-Match with 304.
+    Apply beneath ``@api_view`` so the wrapped view returns unrendered Responses. Async views
+    (which share entries with their sync namesakes) must return ``json_response``.
+    """
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            key, entry = _lookup(view, request, kwargs)
+            if key is None:
+                return await view(request, *args, **kwargs)
+
+            cache_status = 'HIT'
+            if entry is None:
+                response = await view(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                entry = _store(view, key, response)
+                cache_status = 'MISS'
+
+            data, etag = entry
+            headers = _headers(etag, cache_status)
+            if _etag_matches(request, etag):
+                return HttpResponseNotModified(headers=headers)
+            return json_response(data, headers=headers)
+
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key, entry = _lookup(view, request, kwargs)
+        if key is None:
+            return view(request, *args, **kwargs)
+
+        cache_status = 'HIT'
+        if entry is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = _store(view, key, response)
+            cache_status = 'MISS'
+
+        data, etag = entry
+        headers = _headers(etag, cache_status)
+        if _etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(data, headers=headers)
+
+    return wrapper
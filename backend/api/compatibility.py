@@ -0,0 +1,309 @@
+import logging
+import re
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+
+from .cache import catalog_version
+from .indexes import LazyIndex, catalog_changed_or_expired
+from .specs import parse_specs, spec_number
+
+logger = logging.getLogger(__name__)
+
+# fields read from each part when checking a cart
+CART_PROJECTION = ['name', 'type', 'specs', 'spec_values']
+RULE_PROJECTION = ['name', 'type', 'price', 'specs', 'spec_values']
+
+# a PSU should have this much spare capacity over the cart's total TDP
+PSU_HEADROOM = getattr(settings, 'CART_PSU_HEADROOM', 1.25)
+
+TABLE_TTL = getattr(settings, 'COMPATIBILITY_TABLE_TTL', 300)
+# ids looked up and not found that a rule table remembers, see RuleTable.resolve
+MAX_UNKNOWN_IDS = 4096
+
+# motherboard form factors, smallest first; a case takes boards up to the largest size it lists
+BOARD_SIZES = {
+    'miniitx': 1, 'itx': 1, 'minidtx': 1,
+    'microatx': 2, 'matx': 2, 'uatx': 2,
+    'atx': 3,
+    'eatx': 4, 'extendedatx': 4, 'ssiceb': 4, 'ssieeb': 4, 'xlatx': 4,
+}
+_BOARD_SIZE_KEYS = sorted(BOARD_SIZES, key=len, reverse=True)
+_FORM_FACTOR_SPLIT_RE = re.compile(r'[,/|;]')
+
+# parsed specs whose product rates a part's performance, by part type
+SCORE_SPECS = {
+    'CPU': (('cores',), ('boost_clock', 'base_clock')),
+    'GPU': (('memory',), ('boost_clock', 'base_clock')),
+    'RAM': (('memory',),),
+}
+
+
+def parse_object_ids(part_ids):
+    """Converts the ids a client sent to ObjectIds, skipping malformed ones."""
+    object_ids = []
+    for pid in part_ids:
+        try:
+            object_ids.append(ObjectId(pid))
+        except (InvalidId, TypeError):
+            continue
+    return object_ids
+
+
+def _number(value):
+    value = round(float(value), 4)
+    return int(value) if value.is_integer() else value
+
+
+def _psu_warning(name, wattage, total_tdp):
+    if wattage == 0:
+        return {
+            "psu_name": name,
+            "wattage": "Unknown",
+            "warning": f"Could not read wattage for PSU: {name}"
+        }
+    if total_tdp > wattage:
+        return {
+            "psu_name": name,
+            "wattage": wattage,
+            "warning": f"Total TDP ({total_tdp}W) exceeds PSU wattage ({wattage}W)"
+        }
+    return None
+
+
+def cart_tdp_summary(parts):
+    """Total TDP and PSU wattage warnings for raw part documents, as returned by ``get_cart_tdp``."""
+    parts = list(parts)
+    total_tdp = sum(spec_number(part.get('specs'), part.get('spec_values'), "TDP") for part in parts)
+
+    psu_warnings = []
+    for part in parts:
+        if (part.get('type') or '').strip().upper() == "PSU":
+            wattage = spec_number(part.get('specs'), part.get('spec_values'), "Wattage")
+            warning = _psu_warning(part.get('name'), wattage, total_tdp)
+            if warning:
+                psu_warnings.append(warning)
+
+    return {
+        "total_tdp": total_tdp,
+        "psu_warnings": psu_warnings
+    }
+
+
+def board_size(form_factor):
+    """Largest board size named in a normalized form factor such as "atx" or "atxmidtower,microatx"; 0 if unknown."""
+    size = 0
+    for name in _FORM_FACTOR_SPLIT_RE.split(form_factor or ''):
+        key = next((key for key in _BOARD_SIZE_KEYS if name.startswith(key)), None)
+        size = max(size, BOARD_SIZES.get(key, 0))
+    return size
+
+
+def spec_score(part_type, values):
+    """Raw performance score of a part from its parsed specs, e.g. cores x boost clock for a CPU; 0 if unrated."""
+    score = 0
+    for names in SCORE_SPECS.get(part_type, ()):
+        value = next((values[name] for name in names if isinstance(values.get(name), (int, float))), None)
+        if not value:
+            return 0
+        score = value if not score else score * value
+    return score
+
+
+# One catalog part reduced to what the compatibility rules and the auto-builder read
+RulePart = namedtuple('RulePart', 'id name type price tdp wattage socket memory_type board_size score')
+
+
+def rule_part(doc):
+    specs = doc.get('specs') or {}
+    values = doc.get('spec_values')
+    if values is None:
+        # not backfilled yet (see the parse_specs command)
+        values, _ = parse_specs(specs)
+    form_factor = values.get('form_factor')
+    part_type = (doc.get('type') or '').strip().upper()
+    return RulePart(
+        id=str(doc['_id']),
+        name=doc.get('name'),
+        type=part_type,
+        price=float(doc.get('price') or 0),
+        tdp=spec_number(specs, values, 'TDP'),
+        wattage=spec_number(specs, values, 'Wattage'),
+        socket=values.get('socket'),
+        memory_type=values.get('memory_type'),
+        board_size=board_size(form_factor) if form_factor else 0,
+        score=spec_score(part_type, values),
+    )
+
+
+class RuleTable:
+    """
+    Every catalog part as a RulePart keyed by id, tagged with the catalog version it was read at.
+    ``parts`` and ``unknown`` are shared by request threads, so they are never changed in place:
+    ``resolve`` swaps in updated copies.
+    """
+
+    def __init__(self, parts, version):
+        self.parts = {part.id: part for part in parts}
+        # ids already looked up and not in the catalog, so repeating them costs no query
+        self.unknown = frozenset()
+        self.version = version
+        self.built_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.parts)
+
+    def resolve(self, part_ids):
+        """RuleParts for ``part_ids`` in order (repeats kept) and the ids that are not in the catalog."""
+        known, unknown = self.parts, self.unknown
+        missing = {str(pid) for pid in part_ids} - known.keys() - unknown
+        if missing:
+            # parts added since the table was built are fetched once and kept
+            from .models import PCPart
+
+            found = [
+                rule_part(doc)
+                for doc in PCPart.objects(id__in=parse_object_ids(missing)).only(*RULE_PROJECTION).as_pymongo()
+            ]
+            with self._lock:
+                known = dict(self.parts)
+                known.update((part.id, part) for part in found)
+                unknown = self.unknown if len(self.unknown) < MAX_UNKNOWN_IDS else frozenset()
+                unknown = unknown | (missing - known.keys())
+                self.parts, self.unknown = known, unknown
+        parts = [known.get(str(pid)) for pid in part_ids]
+        return [part for part in parts if part], [str(pid) for pid, part in zip(part_ids, parts) if part is None]
+
+
+def build_rule_table():
+    from .models import PCPart
+
+    started = time.monotonic()
+    version = catalog_version()
+    parts = [rule_part(doc) for doc in PCPart.objects.only(*RULE_PROJECTION).as_pymongo()]
+    table = RuleTable(parts, version)
+    logger.info(f"Built compatibility rule table over {len(table)} parts in {time.monotonic() - started:.3f}s")
+    return table
+
+
+# rebuilt when this process bumps the catalog version, and after COMPATIBILITY_TABLE_TTL seconds
+# to pick up writes made by other workers
+_table = LazyIndex('compatibility rule table', build_rule_table, catalog_changed_or_expired(TABLE_TTL))
+
+
+def get_rule_table():
+    return _table.get()
+
+
+def reset_rule_table():
+    _table.reset()
+
+
+def _violation(rule, severity, parts, message):
+    return {'rule': rule, 'severity': severity, 'parts': [part.id for part in parts], 'message': message}
+
+
+def check_compatibility(parts):
+    """
+    Checks CPU/motherboard socket, RAM/motherboard memory type, case/motherboard form factor and
+    PSU headroom over a cart of RulePart in one pass. Returns the structured report served by
+    ``check_cart_compatibility``.
+    """
+    by_type = {}
+    total_tdp = 0
+    for part in parts:
+        by_type.setdefault(part.type, []).append(part)
+        total_tdp += part.tdp
+
+    violations = []
+    boards = by_type.get('MOTHERBOARD', [])
+    for board in boards:
+        for cpu in by_type.get('CPU', []):
+            if not cpu.socket or not board.socket:
+                violations.append(_violation(
+                    'cpu_socket', 'warning', [cpu, board],
+                    f"Could not read the socket of {cpu.name if not cpu.socket else board.name}",
+                ))
+            elif cpu.socket != board.socket:
+                violations.append(_violation(
+                    'cpu_socket', 'error', [cpu, board],
+                    f"{cpu.name} ({cpu.socket}) does not fit the {board.socket} socket of {board.name}",
+                ))
+        for ram in by_type.get('RAM', []):
+            if ram.memory_type and board.memory_type and ram.memory_type != board.memory_type:
+                violations.append(_violation(
+                    'memory_type', 'error', [ram, board],
+                    f"{ram.name} is {ram.memory_type} but {board.name} takes {board.memory_type}",
+                ))
+        for case in by_type.get('CASE', []):
+            if board.board_size and case.board_size and board.board_size > case.board_size:
+                violations.append(_violation(
+                    'form_factor', 'error', [board, case],
+                    f"{board.name} is too large for {case.name}",
+                ))
+
+    recommended = total_tdp * PSU_HEADROOM
+    for psu in by_type.get('PSU', []):
+        if not psu.wattage:
+            violations.append(_violation('psu_headroom', 'warning', [psu], f"Could not read wattage for PSU: {psu.name}"))
+        elif total_tdp > psu.wattage:
+            violations.append(_violation(
+                'psu_headroom', 'error', [psu],
+                f"Total TDP ({total_tdp}W) exceeds PSU wattage ({psu.wattage}W)",
+            ))
+        elif recommended > psu.wattage:
+            violations.append(_violation(
+                'psu_headroom', 'warning', [psu],
+                f"PSU wattage ({psu.wattage}W) leaves less than the recommended headroom over {total_tdp}W",
+            ))
+
+    return {
+        'compatible': not any(violation['severity'] == 'error' for violation in violations),
+        'total_tdp': total_tdp,
+        'recommended_wattage': round(recommended),
+        'violations': violations,
+    }
+
+
+def evaluate_carts(carts, table):
+    """
+    ``cart_tdp_summary`` plus the price total for each of many carts (lists of part ids). The parts
+    of all carts are resolved together and the totals come from one cart x part membership matrix
+    multiplied by the shared TDP and price columns. As with ``get_cart_tdp``, a part listed twice
+    in a cart counts once.
+    """
+    carts = [[str(pid) for pid in cart] for cart in carts]
+    parts, _ = table.resolve(list(dict.fromkeys(pid for cart in carts for pid in cart)))
+    column = {part.id: i for i, part in enumerate(parts)}
+
+    tdp = np.array([part.tdp for part in parts], dtype=float)
+    price = np.array([part.price for part in parts], dtype=float)
+    membership = np.zeros((len(carts), len(parts)), dtype=bool)
+    for row, cart in enumerate(carts):
+        membership[row, [column[pid] for pid in cart if pid in column]] = True
+    total_tdp = membership @ tdp
+    total_price = membership @ price
+
+    results = []
+    for row, cart in enumerate(carts):
+        cart_tdp = _number(total_tdp[row])
+        psu_warnings = []
+        for pid in dict.fromkeys(cart):
+            part = parts[column[pid]] if pid in column else None
+            if part and part.type == 'PSU':
+                warning = _psu_warning(part.name, part.wattage, cart_tdp)
+                if warning:
+                    psu_warnings.append(warning)
+        results.append({
+            "total_tdp": cart_tdp,
+            "psu_warnings": psu_warnings,
+            "total_price": round(float(total_price[row]), 2),
+            "missing_ids": [pid for pid in dict.fromkeys(cart) if pid not in column],
+        })
+    return results
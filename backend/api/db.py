@@ -0,0 +1,129 @@
+"""
+MongoDB connection setup.
+
+``configure()`` (called from ApiConfig.ready) only registers the default mongoengine alias; the
+MongoClient, and with it the connection pool, is created by the first query. Forked workers
+(gunicorn --preload) drop any client inherited from the parent in an at-fork hook, so every
+process opens its own pool sized by MONGODB_CONNECT_OPTIONS.
+
+Reads can be routed away from the primary per view or per model with MONGODB_READ_PREFERENCES;
+only querysets passed through ``routed()`` are affected.
+"""
+import functools
+import logging
+import os
+import time
+
+import mongoengine
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from mongoengine.connection import DEFAULT_CONNECTION_NAME
+from pymongo import MongoClient
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+logger = logging.getLogger(__name__)
+
+# seconds spent in each startup step of this process, also exported at /metrics
+startup_timings = {}
+
+
+def _create_client(**kwargs):
+    started = time.perf_counter()
+    client = MongoClient(**kwargs)
+    startup_timings['mongodb_client_seconds'] = time.perf_counter() - started
+    logger.info(
+        f"Opened MongoDB client in process {os.getpid()} (maxPoolSize={client.options.pool_options.max_pool_size}) "
+        f"in {startup_timings['mongodb_client_seconds'] * 1000:.1f} ms"
+    )
+    return client
+
+
+def configure():
+    """Registers the default connection from settings without connecting."""
+    started = time.perf_counter()
+    for spec in getattr(settings, 'MONGODB_READ_PREFERENCES', {}).values():
+        parse_read_preference(spec)
+    if not settings.MONGODB_HOST:
+        logger.warning("MONGODB_CONNECTION_STRING is not set; database access will fail until it is.")
+        return
+    mongoengine.register_connection(
+        DEFAULT_CONNECTION_NAME, host=settings.MONGODB_HOST, mongo_client_class=_create_client,
+        **settings.MONGODB_CONNECT_OPTIONS,
+    )
+    if settings.MONGODB_CONNECT_ON_STARTUP:
+        warm_up()
+    startup_timings['mongodb_configure_seconds'] = time.perf_counter() - started
+
+
+def warm_up():
+    """Opens the pool now instead of on the first request and records how long the first round trip took."""
+    started = time.perf_counter()
+    mongoengine.get_db().command('ping')
+    startup_timings['mongodb_first_ping_seconds'] = time.perf_counter() - started
+    logger.info(f"MongoDB answered the first ping in {startup_timings['mongodb_first_ping_seconds'] * 1000:.1f} ms")
+
+
+def forget_inherited_clients():
+    """
+    Drops the clients a forked child inherited without closing them (their sockets still belong
+    to the parent); the registered settings stay, so the next query opens a fresh pool.
+    """
+    from mongoengine import Document, connection
+    from mongoengine.base.common import _get_documents_by_db
+    from . import async_db
+
+    for alias in list(connection._dbs):
+        for document in _get_documents_by_db(alias, DEFAULT_CONNECTION_NAME):
+            if issubclass(document, Document):
+                document._collection = None
+    connection._connections.clear()
+    connection._dbs.clear()
+    async_db.forget_clients()
+    startup_timings.pop('mongodb_client_seconds', None)
+
+
+def install_fork_hook():
+    os.register_at_fork(after_in_child=forget_inherited_clients)
+
+
+READ_PREFERENCE_MODES = {
+    'primary': Primary,
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def parse_read_preference(spec):
+    """A pymongo read preference from "mode" or "mode:max staleness seconds", e.g. "secondaryPreferred:90"."""
+    mode, _, staleness = spec.partition(':')
+    preference = READ_PREFERENCE_MODES.get(mode.strip())
+    if preference is None:
+        raise ImproperlyConfigured(f"Unknown read preference {spec!r}. Expected one of {', '.join(READ_PREFERENCE_MODES)}.")
+    if preference is Primary:
+        if staleness:
+            raise ImproperlyConfigured(f"Read preference {spec!r}: primary reads cannot have a max staleness.")
+        return Primary()
+    try:
+        max_staleness = int(staleness) if staleness.strip() else -1
+    except ValueError:
+        raise ImproperlyConfigured(f"Read preference {spec!r}: max staleness must be whole seconds.")
+    # the driver rejects anything below 90s when it selects a server, far from where it was configured
+    if max_staleness != -1 and max_staleness < 90:
+        raise ImproperlyConfigured(f"Read preference {spec!r}: max staleness must be at least 90 seconds.")
+    return preference(max_staleness=max_staleness)
+
+
+def read_preference(document, view=None):
+    """The read preference configured for ``view``, else for the ``document`` class; None means the client default."""
+    routes = getattr(settings, 'MONGODB_READ_PREFERENCES', {})
+    spec = routes.get(view) or routes.get(document.__name__)
+    return parse_read_preference(spec) if spec else None
+
+
+def routed(queryset, view=None):
+    """``queryset`` reading with the preference configured for ``view`` or its document."""
+    preference = read_preference(queryset._document, view)
+    return queryset if preference is None else queryset.read_preference(preference)
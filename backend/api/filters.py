@@ -0,0 +1,168 @@
+import logging
+
+from django.conf import settings
+
+from .search import MAX_RESULTS, search_part_ids
+from .specs import SPEC_FIELDS, catalog_key, spec_filters
+
+logger = logging.getLogger(__name__)
+
+PRICE_BUCKETS = getattr(settings, 'PARTS_PRICE_BUCKETS', [0, 50, 100, 200, 300, 500, 750, 1000, 1500, 2000])
+NUMERIC_SPEC_FIELDS = [name for name, field in SPEC_FIELDS.items() if field[1] == 'number']
+# derived key field -> the scraped field it is computed from, see models.derived_part_fields
+KEY_FIELDS = {'type_key': 'type', 'manufacturer_key': 'manufacturer'}
+
+
+def part_filters(params):
+    """
+    The ``get_parts`` filters other than ``search`` as mongoengine filter kwargs, shared by
+    filter_parts and the in-memory catalog snapshot.
+    """
+    filters = {}
+    part_type = params.get('type')
+    if part_type and part_type.lower() != 'all':
+        filters['type_key'] = catalog_key(part_type)
+
+    manufacturer = params.get('manufacturer')
+    if manufacturer and manufacturer.lower() != 'all':
+        filters['manufacturer_key'] = catalog_key(manufacturer)
+
+    min_price = params.get('min_price')
+    if min_price:
+        try:
+            filters['price__gte'] = float(min_price)
+        except ValueError:
+            logger.warning(f"Invalid min_price value: {min_price}")
+
+    max_price = params.get('max_price')
+    if max_price:
+        try:
+            filters['price__lte'] = float(max_price)
+        except ValueError:
+            logger.warning(f"Invalid max_price value: {max_price}")
+
+    specs, invalid = spec_filters(params)
+    for param in invalid:
+        logger.warning(f"Invalid spec filter value: {param}={params.get(param)}")
+    filters.update(specs)
+    return filters
+
+
+def search_ids(params, filtered):
+    """
+    ``search_part_ids`` for the ``search`` param. When other filters apply too, every match is
+    returned: the SEARCH_MAX_RESULTS best could all fail them, so the cap is applied to the
+    filtered results instead (see PagePlan).
+    """
+    return search_part_ids(params['search'], None if filtered else MAX_RESULTS)
+
+
+def part_query(params):
+    """
+    ``part_filters`` as a mongoengine Q. Parts saved before the ``*_key`` fields existed have none
+    until ``manage.py parse_specs`` backfills them, so those match on the scraped field instead,
+    case-insensitively as before.
+    """
+    from mongoengine.queryset.visitor import Q
+
+    query = Q()
+    for lookup, value in part_filters(params).items():
+        if lookup in KEY_FIELDS:
+            query &= Q(**{lookup: value}) | Q(**{lookup: None, f'{KEY_FIELDS[lookup]}__iexact': value})
+        else:
+            query &= Q(**{lookup: value})
+    return query
+
+
+def filter_parts(queryset, params):
+    """Applies the catalog query params accepted by ``get_parts`` to a PCPart queryset."""
+    query = part_query(params)
+    if not query.empty:
+        queryset = queryset.filter(query)
+
+    search = params.get('search')
+    if search:
+        try:
+            queryset = queryset.filter(id__in=search_ids(params, not query.empty))
+        except Exception as e:
+            logger.error(f"Search error: {str(e)}")
+            raise
+
+    return queryset
+
+
+def parts_query(params):
+    """
+    The filter ``filter_parts`` applies, as a raw Mongo query for the motor-backed async views.
+    Does no I/O unless a search has to build the search index first.
+    """
+    from mongoengine.queryset.visitor import Q
+
+    from .models import PCPart
+
+    query = part_query(params)
+    search = params.get('search')
+    if search:
+        query &= Q(id__in=search_ids(params, not query.empty))
+    return {} if query.empty else query.to_query(PCPart)
+
+
+def facet_stages():
+    """Sub-pipelines of the single ``$facet`` aggregation behind ``get_part_facets``."""
+    spec_ranges = {'_id': None}
+    for name in NUMERIC_SPEC_FIELDS:
+        spec_ranges[f'{name}_min'] = {'$min': f'$spec_values.{name}'}
+        spec_ranges[f'{name}_max'] = {'$max': f'$spec_values.{name}'}
+    return {
+        'types': [
+            {'$group': {'_id': '$type', 'count': {'$sum': 1}}},
+            {'$sort': {'count': -1, '_id': 1}},
+        ],
+        'manufacturers': [
+            {'$group': {'_id': '$manufacturer', 'count': {'$sum': 1}}},
+            {'$sort': {'count': -1, '_id': 1}},
+        ],
+        'price_range': [
+            {'$group': {'_id': None, 'count': {'$sum': 1}, 'min': {'$min': '$price'}, 'max': {'$max': '$price'}}},
+        ],
+        'price_histogram': [
+            {'$bucket': {
+                'groupBy': '$price',
+                'boundaries': PRICE_BUCKETS,
+                'default': PRICE_BUCKETS[-1],
+                'output': {'count': {'$sum': 1}},
+            }},
+        ],
+        'spec_ranges': [{'$group': spec_ranges}],
+    }
+
+
+def format_facets(result):
+    price_range = (result.get('price_range') or [{}])[0]
+    spec_ranges = (result.get('spec_ranges') or [{}])[0]
+
+    histogram = []
+    for bucket in result.get('price_histogram', []):
+        # the overflow bucket is keyed on the last boundary and has no upper bound
+        lower = bucket['_id']
+        i = PRICE_BUCKETS.index(lower)
+        upper = PRICE_BUCKETS[i + 1] if i + 1 < len(PRICE_BUCKETS) else None
+        histogram.append({'min': lower, 'max': upper, 'count': bucket['count']})
+
+    specs = {}
+    for name in NUMERIC_SPEC_FIELDS:
+        low, high = spec_ranges.get(f'{name}_min'), spec_ranges.get(f'{name}_max')
+        if low is not None:
+            specs[name] = {'min': low, 'max': high, 'unit': SPEC_FIELDS[name][2]}
+
+    return {
+        'total': price_range.get('count', 0),
+        'types': [{'value': facet['_id'], 'count': facet['count']} for facet in result.get('types', [])],
+        'manufacturers': [{'value': facet['_id'], 'count': facet['count']} for facet in result.get('manufacturers', [])],
+        'price': {
+            'min': price_range.get('min'),
+            'max': price_range.get('max'),
+            'histogram': histogram,
+        },
+        'specs': specs,
+    }
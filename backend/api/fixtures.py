@@ -0,0 +1,140 @@
+"""Sample and synthetic catalog data shared by the tests and the benchmark commands."""
+import random
+
+import mongoengine
+
+SAMPLE_PARTS = [
+    {
+        'name': 'Ryzen 7 7800X3D', 'manufacturer': 'AMD', 'type': 'CPU', 'price': 449.0,
+        'url': 'https://www.amd.com/ryzen-7-7800x3d',
+        'specs': {'Cores': '8', 'Threads': '16', 'Base Clock': '4.2 GHz', 'Boost Clock': '5.0 GHz', 'TDP': '120 W', 'Socket': 'AM5'},
+        'description': 'Gaming CPU with 3D V-Cache.',
+    },
+    {
+        'name': 'Core i5-13600K', 'manufacturer': 'Intel', 'type': 'CPU', 'price': 319.995,
+        'url': 'https://www.intel.com/i5-13600k',
+        'specs': {'Cores': '14', 'Threads': '20', 'Base Clock': '3500 MHz', 'Boost Clock': '5.1 GHz', 'TDP': '125 W', 'Socket': 'LGA 1700'},
+    },
+    {
+        'name': 'ROG Strix B650E-F', 'manufacturer': 'ASUS', 'type': 'Motherboard', 'price': 279.99,
+        'url': 'https://www.asus.com/b650e-f',
+        'specs': {'Socket': 'AM5', 'Form Factor': 'ATX', 'Memory Type': 'DDR5', 'Memory Slots': 4},
+        'description': None,
+    },
+    {
+        'name': 'Vengeance 32GB', 'manufacturer': 'Corsair', 'type': 'RAM', 'price': 104.5,
+        'url': 'https://www.corsair.com/vengeance-32gb',
+        'specs': {'Memory': '2 x 16GB', 'Memory Type': 'DDR5', 'Speed': '6000 MHz'},
+        'description': 'Low-latency DDR5 kit — “EXPO” certified.',
+    },
+    {
+        'name': 'GeForce RTX 4070', 'manufacturer': 'NVIDIA', 'type': 'GPU', 'price': 599,
+        'url': 'https://www.nvidia.com/rtx-4070',
+        'specs': {'Memory': '12 GB', 'TDP': '200 W', 'Boost Clock': '2475 MHz'},
+    },
+    {
+        'name': 'RM850x', 'manufacturer': 'Corsair', 'type': 'PSU', 'price': 0.005,
+        'url': 'https://www.corsair.com/rm850x',
+        'specs': {'Wattage': '850 W', 'Efficiency': '80+ Gold', 'Modular': {'type': 'Full', 'cables': 12}},
+    },
+    {
+        'name': 'NR200P', 'manufacturer': 'Cooler Master', 'type': 'Case', 'price': 99.99,
+        'url': 'https://www.coolermaster.com/nr200p',
+        'specs': {'Form Factor': 'Mini-ITX', 'Color': 'Black'},
+    },
+]
+
+_MANUFACTURERS = {
+    'CPU': ['AMD', 'Intel'],
+    'GPU': ['NVIDIA', 'AMD', 'Intel'],
+    'Motherboard': ['ASUS', 'MSI', 'Gigabyte', 'ASRock'],
+    'RAM': ['Corsair', 'G.Skill', 'Kingston'],
+    'PSU': ['Corsair', 'Seasonic', 'EVGA'],
+    'Case': ['Fractal Design', 'Lian Li', 'NZXT', 'Cooler Master'],
+}
+_SOCKETS = {'AMD': ['AM4', 'AM5'], 'Intel': ['LGA 1700', 'LGA 1851']}
+_FORM_FACTORS = ['ATX', 'Micro-ATX', 'Mini-ITX']
+_MEMORY_TYPES = ['DDR4', 'DDR5']
+
+
+def _synthetic_specs(rng, part_type, manufacturer):
+    if part_type == 'CPU':
+        cores = rng.choice([4, 6, 8, 12, 16, 24])
+        return {
+            'Cores': str(cores),
+            'Threads': str(cores * 2),
+            'Base Clock': f'{rng.uniform(2.5, 4.5):.1f} GHz',
+            'Boost Clock': f'{rng.uniform(4.4, 6.0):.1f} GHz',
+            'TDP': f'{rng.choice([65, 105, 125, 170])} W',
+            'Socket': rng.choice(_SOCKETS[manufacturer]),
+        }
+    if part_type == 'GPU':
+        return {
+            'Memory': f'{rng.choice([8, 12, 16, 24])} GB',
+            'Boost Clock': f'{rng.randint(1700, 2700)} MHz',
+            'TDP': f'{rng.choice([115, 200, 285, 320, 450])} W',
+        }
+    if part_type == 'Motherboard':
+        return {
+            'Socket': rng.choice(sum(_SOCKETS.values(), [])),
+            'Form Factor': rng.choice(_FORM_FACTORS),
+            'Memory Type': rng.choice(_MEMORY_TYPES),
+        }
+    if part_type == 'RAM':
+        return {
+            'Memory': f'2 x {rng.choice([8, 16, 32])}GB',
+            'Memory Type': rng.choice(_MEMORY_TYPES),
+            'Speed': f'{rng.choice([3200, 3600, 5600, 6000])} MHz',
+        }
+    if part_type == 'PSU':
+        return {'Wattage': f'{rng.choice([550, 650, 750, 850, 1000])} W'}
+    return {'Form Factor': rng.choice(_FORM_FACTORS)}
+
+
+def synthetic_parts(count, seed=0):
+    """Yields ``count`` reproducible PCPart field dicts spread over every part type."""
+    rng = random.Random(seed)
+    types = list(_MANUFACTURERS)
+    for i in range(count):
+        part_type = types[i % len(types)]
+        manufacturer = rng.choice(_MANUFACTURERS[part_type])
+        yield {
+            'name': f'{part_type} Model {i:06d}',
+            'manufacturer': manufacturer,
+            'type': part_type,
+            'price': round(rng.uniform(20, 2000), 2),
+            'url': f'https://example.com/parts/{i}',
+            'specs': _synthetic_specs(rng, part_type, manufacturer),
+            'description': f'Synthetic {part_type.lower()} #{i}' if i % 3 else None,
+        }
+
+
+def insert_parts(parts, batch_size=5000):
+    """Bulk-inserts PCPart field dicts, deriving fields as PCPart.save would. Returns the inserted ids."""
+    from .models import PCPart, derived_part_fields
+    from .snapshot import next_revision
+
+    collection = PCPart._get_collection()
+    revision = next_revision()
+    ids = []
+    batch = []
+    for fields in parts:
+        part = PCPart(**fields, **derived_part_fields(fields.get('specs'), fields.get('type'), fields.get('manufacturer')),
+                      revision=revision)
+        batch.append(part.to_mongo().to_dict())
+        if len(batch) >= batch_size:
+            ids.extend(collection.insert_many(batch).inserted_ids)
+            batch = []
+    if batch:
+        ids.extend(collection.insert_many(batch).inserted_ids)
+    return ids
+
+
+def connect_in_memory(db='pcparts_test'):
+    """Points the default mongoengine alias at an in-memory mongomock database."""
+    import mongomock
+    from .indexes import reset_indexes
+
+    mongoengine.disconnect()
+    mongoengine.connect(db, mongo_client_class=mongomock.MongoClient)
+    reset_indexes()
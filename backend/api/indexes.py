@@ -0,0 +1,119 @@
+"""
+Process-wide in-memory indexes (search, compatibility rules, similarity, suggestions): each is
+built on first use and, once its staleness predicate says so, rebuilt in a background thread
+while the old one keeps serving.
+"""
+import logging
+import threading
+import time
+
+from .cache import catalog_version
+
+logger = logging.getLogger(__name__)
+
+# reset callbacks of every process-wide index, see reset_indexes()
+_resets = []
+
+
+def register_reset(reset):
+    _resets.append(reset)
+    return reset
+
+
+def reset_indexes():
+    """Drops every process-wide index, e.g. after switching databases; each rebuilds on next use."""
+    # importing the modules registers their indexes
+    from . import compatibility, search, similar, snapshot, suggest  # noqa: F401
+
+    for reset in _resets:
+        reset()
+
+
+def expired(ttl):
+    """Staleness predicate: the index (with a ``built_at`` monotonic time) is older than ``ttl`` seconds."""
+    return lambda index: time.monotonic() - index.built_at > ttl
+
+
+def catalog_changed(index):
+    """Staleness predicate for indexes tagged with the catalog ``version`` they were built at."""
+    return index.version != catalog_version()
+
+
+def catalog_changed_or_expired(ttl):
+    """
+    ``catalog_changed``, or older than ``ttl`` seconds: the catalog version lives in a per-process
+    cache by default, so writes made by other workers only show up once the index expires.
+    """
+    is_expired = expired(ttl)
+    return lambda index: catalog_changed(index) or is_expired(index)
+
+
+class LazyIndex:
+    """
+    One process-wide index made by ``build()``. ``get()`` builds it on first use and starts a
+    background rebuild once ``is_stale(index)``. Changes applied with ``update()`` while a rebuild
+    runs may be missing from the database read it started from, so they are queued and replayed
+    onto the new index before it is swapped in.
+    """
+
+    def __init__(self, name, build, is_stale):
+        self.name = name
+        self._build = build
+        self._is_stale = is_stale
+        self._index = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._pending = []
+        # bumped by reset() so a rebuild started before it is discarded
+        self._generation = 0
+        register_reset(self.reset)
+
+    def get(self):
+        with self._lock:
+            if self._index is None:
+                self._index = self._build()
+            index = self._index
+            rebuild = not self._rebuilding and self._is_stale(index)
+            if rebuild:
+                self._rebuilding = True
+                self._pending = []
+                generation = self._generation
+        if rebuild:
+            threading.Thread(target=self._rebuild, args=(generation,), daemon=True).start()
+        return index
+
+    def current(self):
+        """The built index, or None; never builds."""
+        return self._index
+
+    def update(self, change):
+        """Applies ``change(index)`` to the built index, if any, and to the one being rebuilt."""
+        with self._lock:
+            index = self._index
+            if index is None:
+                return
+            if self._rebuilding:
+                self._pending.append(change)
+        change(index)
+
+    def _rebuild(self, generation):
+        try:
+            index = self._build()
+        except Exception as e:
+            logger.error(f"Error rebuilding {self.name}: {e}", exc_info=True)
+            index = None
+        with self._lock:
+            if generation == self._generation:
+                if index is not None:
+                    for change in self._pending:
+                        change(index)
+                    self._index = index
+                self._pending = []
+                self._rebuilding = False
+
+    def reset(self):
+        with self._lock:
+            self._index = None
+            self._pending = []
+            self._rebuilding = False
+            self._generation += 1
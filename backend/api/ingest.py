@@ -0,0 +1,155 @@
+"""
+Reading and normalizing vendor catalog rows for the import_parts command.
+
+Rows come from CSV (one column per PCPart field; specs as a JSON ``specs`` column and/or one
+``spec:<Key>`` column per spec) or JSONL (one object per line). ``prepare_rows`` turns a chunk of
+raw rows into the documents to upsert; it touches no database, so the command can run it in
+worker processes.
+"""
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from .specs import SPEC_FIELDS, parse_quantity
+
+SPEC_COLUMN_PREFIX = 'spec:'
+
+# scraped spec key in any case -> the spelling parse_specs looks up first
+CANONICAL_SPEC_KEYS = {key.lower(): field[0][0] for field in SPEC_FIELDS.values() for key in field[0]}
+
+
+class RowError(ValueError):
+    """A catalog row that cannot be imported; the message is reported with its line number."""
+
+
+def read_rows(stream, file_format):
+    """Yields (line number, raw row dict) from an open CSV or JSONL text stream, one row at a time."""
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = {'__error__': f"Invalid JSON: {e}"}
+        yield line_number, row
+
+
+def _text(row, field):
+    value = row.get(field)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def normalize_price(raw):
+    if raw is None or str(raw).strip() == '':
+        raise RowError("Missing price")
+    try:
+        price = Decimal(str(raw).strip().lstrip('$').replace(',', ''))
+    except InvalidOperation:
+        raise RowError(f"Invalid price: {raw!r}")
+    if not price.is_finite() or price < 0:
+        raise RowError(f"Invalid price: {raw!r}")
+    return float(price)
+
+
+def normalize_specs(row):
+    """
+    Merges the ``specs`` object and ``spec:<Key>`` columns, strips keys and values, drops empty
+    values and renames known keys to their canonical spelling ("core count" -> "Cores"). Numeric
+    specs the filters rely on must parse in their field's unit.
+    """
+    raw = row.get('specs')
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw) if raw.strip() else {}
+        except ValueError:
+            raise RowError(f"Invalid specs JSON: {raw[:80]!r}")
+    if raw is None:
+        raw = {}
+    if not isinstance(raw, dict):
+        raise RowError("specs must be an object")
+    raw = dict(raw)
+    for column, value in row.items():
+        if isinstance(column, str) and column.startswith(SPEC_COLUMN_PREFIX):
+            raw[column[len(SPEC_COLUMN_PREFIX):]] = value
+
+    specs = {}
+    for key, value in raw.items():
+        key = str(key).strip()
+        if isinstance(value, str):
+            value = value.strip()
+        if not key or value in (None, ''):
+            continue
+        specs[CANONICAL_SPEC_KEYS.get(key.lower(), key)] = value
+
+    for name, (keys, kind, unit, _) in SPEC_FIELDS.items():
+        value = specs.get(keys[0])
+        if kind != 'number' or value is None:
+            continue
+        number, parsed_unit = parse_quantity(value)
+        if number is None or (unit and parsed_unit and parsed_unit != unit):
+            raise RowError(f"Unparseable {keys[0]} spec: {value!r}")
+    return specs
+
+
+def normalize_part(row):
+    """The PCPart fields of one raw row, validated. Raises RowError."""
+    if not isinstance(row, dict):
+        raise RowError("Expected an object")
+    if '__error__' in row:
+        raise RowError(row['__error__'])
+    fields = {
+        'name': _text(row, 'name'),
+        'manufacturer': _text(row, 'manufacturer'),
+        'type': _text(row, 'type'),
+        'price': normalize_price(row.get('price')),
+        'url': _text(row, 'url'),
+        'specs': normalize_specs(row),
+        'description': _text(row, 'description'),
+    }
+    missing = [field for field in ('name', 'manufacturer', 'type', 'url') if not fields[field]]
+    if missing:
+        raise RowError(f"Missing {', '.join(missing)}")
+    return fields
+
+
+def prepare_rows(rows):
+    """
+    [(line number, document or None, error or None)] for a chunk of (line number, raw row).
+    Documents are what PCPart.save would store, derived fields included, without ``_id``.
+    Fields are checked with PCPart's own field validators; building a Document per row
+    would cost more than the rest of the import.
+    """
+    from mongoengine import ValidationError
+    from .models import PCPart, derived_part_fields
+
+    fields_of = PCPart._fields
+    prepared = []
+    for line_number, row in rows:
+        try:
+            fields = normalize_part(row)
+            for name, value in fields.items():
+                if value is not None:
+                    fields_of[name].validate(value)
+        except RowError as e:
+            prepared.append((line_number, None, str(e)))
+            continue
+        except ValidationError as e:
+            prepared.append((line_number, None, f"{e.field_name}: {e.message}"))
+            continue
+        document = {name: fields_of[name].to_mongo(value) for name, value in fields.items() if value is not None}
+        document.update(derived_part_fields(fields['specs'], fields['type'], fields['manufacturer']))
+        prepared.append((line_number, document, None))
+    return prepared
+
+
+def upsert_key(document):
+    """Catalog identity of a part: manufacturer (case-insensitive) plus exact name."""
+    return {'manufacturer_key': document['manufacturer_key'], 'name': document['name']}
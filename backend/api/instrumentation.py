@@ -0,0 +1,338 @@
+"""
+Per-request performance instrumentation.
+
+TimingMiddleware opens a RequestTimings for every request. The pymongo CommandListener adds
+each command's round trip to it, ``timed()`` blocks add serializer and auth time, and when the
+response leaves the middleware the breakdown is sent as a ``Server-Timing`` header, logged as
+one JSON line on the ``api.requests`` logger and folded into the histograms served at /metrics
+(only when METRICS_ENABLED, behind METRICS_TOKEN if set). Commands slower than SLOW_QUERY_MS are
+logged on ``api.slow_queries`` whether or not they ran inside a request.
+
+Histograms are per process; scrape every worker (or sum them in Prometheus).
+"""
+import contextvars
+import hmac
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+request_logger = logging.getLogger('api.requests')
+slow_query_logger = logging.getLogger('api.slow_queries')
+
+SLOW_QUERY_MS = getattr(settings, 'SLOW_QUERY_MS', 100)
+SERVER_TIMING_HEADER = getattr(settings, 'SERVER_TIMING_HEADER', True)
+# bearer token /metrics requires, if set
+METRICS_TOKEN = getattr(settings, 'METRICS_TOKEN', '')
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+# command fields worth logging for a slow command; documents and updates are left out
+SLOW_QUERY_FIELDS = ('filter', 'sort', 'projection', 'limit', 'pipeline', 'query', 'key')
+SLOW_QUERY_MAX_CHARS = 1000
+# user cache stats that only grow; the rest are exported as gauges
+USER_CACHE_COUNTERS = ('hits', 'misses', 'evictions')
+
+
+class Histogram:
+    """A Prometheus-style histogram with cumulative buckets, one series per label combination."""
+
+    def __init__(self, name, documentation, buckets, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted(self._series.items())
+        for label_values, (counts, total, count) in series:
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values)]
+            for bound, bucket_count in [*zip(self.buckets, counts), ('+Inf', count)]:
+                bucket_labels = ','.join(labels + [f'le="{_number(bound)}"'])
+                lines.append(f'{self.name}_bucket{{{bucket_labels}}} {bucket_count}')
+            suffix = '{%s}' % ','.join(labels) if labels else ''
+            lines.append(f'{self.name}_sum{suffix} {_number(total)}')
+            lines.append(f'{self.name}_count{suffix} {count}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time from the first to the last middleware, by route.',
+    LATENCY_BUCKETS, ('method', 'route', 'status'),
+)
+REQUEST_DB_DURATION = Histogram(
+    'http_request_db_duration_seconds', 'Time a request spent waiting on MongoDB.', LATENCY_BUCKETS, ('route',),
+)
+REQUEST_DB_ROUND_TRIPS = Histogram(
+    'http_request_db_round_trips', 'MongoDB commands issued by a request.', ROUND_TRIP_BUCKETS, ('route',),
+)
+REQUEST_SERIALIZE_DURATION = Histogram(
+    'http_request_serialize_duration_seconds', 'Time a request spent in serializers.', LATENCY_BUCKETS, ('route',),
+)
+MONGO_COMMAND_DURATION = Histogram(
+    'mongodb_command_duration_seconds', 'MongoDB command round trips, by command and outcome.',
+    LATENCY_BUCKETS, ('command', 'outcome'),
+)
+HISTOGRAMS = [
+    REQUEST_DURATION, REQUEST_DB_DURATION, REQUEST_DB_ROUND_TRIPS, REQUEST_SERIALIZE_DURATION,
+    MONGO_COMMAND_DURATION,
+]
+
+
+class RequestTimings:
+    """What one request spent its time on, in seconds."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_round_trips = 0
+        self.db = 0.0
+        self.phases = {}
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def add_db(self, seconds):
+        # commands of one request may complete on several threads (sync_to_async, executors)
+        with self._lock:
+            self.db_round_trips += 1
+            self.db += seconds
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+def current_timings():
+    """The RequestTimings of the request being served, or None outside TimingMiddleware."""
+    return _current.get()
+
+
+@contextmanager
+def timed(phase):
+    """
+    Adds the time spent in the block to the current request's ``phase``. Nested blocks of the
+    same phase (a serializer serializing another one) are only counted once. Also a decorator.
+    """
+    timings = _current.get()
+    if timings is None or phase in timings._active:
+        yield
+        return
+    timings._active.add(phase)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._active.discard(phase)
+        timings.add(phase, time.perf_counter() - started)
+
+
+@contextmanager
+def timed_db():
+    """
+    Counts the block as one database round trip of the current request. For motor calls, whose
+    commands run on executor threads the listener cannot tie back to the request.
+    """
+    timings = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings.add_db(time.perf_counter() - started)
+
+
+class CommandTimingListener(monitoring.CommandListener):
+    """
+    Adds every command's round trip to the current request and logs the ones slower than
+    ``slow_query_ms`` (SLOW_QUERY_MS by default; 0 turns the slow-query log off).
+    """
+
+    def __init__(self, slow_query_ms=None):
+        self.slow_query_ms = SLOW_QUERY_MS if slow_query_ms is None else slow_query_ms
+        self._pending = {}
+
+    def started(self, event):
+        if self.slow_query_ms:
+            self._pending[(event.connection_id, event.request_id)] = (event.database_name, event.command)
+
+    def succeeded(self, event):
+        self._finished(event, 'success')
+
+    def failed(self, event):
+        self._finished(event, 'failure')
+
+    def _finished(self, event, outcome):
+        seconds = event.duration_micros / 1e6
+        started = self._pending.pop((event.connection_id, event.request_id), None)
+        timings = _current.get()
+        if timings is not None:
+            timings.add_db(seconds)
+        MONGO_COMMAND_DURATION.observe(seconds, event.command_name, outcome)
+        if self.slow_query_ms and seconds * 1000 >= self.slow_query_ms:
+            self._log_slow(event, outcome, seconds, started)
+
+    def _log_slow(self, event, outcome, seconds, started):
+        database, command = started or (None, {})
+        target = command.get(event.command_name)
+        record = {
+            'command': event.command_name,
+            'database': database,
+            'collection': target if isinstance(target, str) else None,
+            'duration_ms': round(seconds * 1000, 3),
+            'outcome': outcome,
+            'server': '%s:%s' % event.connection_id,
+        }
+        query = {field: command[field] for field in SLOW_QUERY_FIELDS if field in command}
+        body = json.dumps({**record, **query}, default=str)
+        if len(body) > SLOW_QUERY_MAX_CHARS:
+            body = json.dumps({**record, 'query_truncated': body[:SLOW_QUERY_MAX_CHARS]}, default=str)
+        slow_query_logger.warning(body)
+
+
+command_listener = CommandTimingListener()
+
+
+def register_command_listener():
+    """Registers the listener with pymongo; only clients created afterwards report to it."""
+    monitoring.register(command_listener)
+
+
+class TimingMiddleware:
+    """Times each request and reports the breakdown (see the module docstring)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        total = timings.elapsed()
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None else 'unmatched'
+        serialize = timings.phases.get('serialize', 0.0)
+
+        REQUEST_DURATION.observe(total, request.method, route, response.status_code)
+        REQUEST_DB_DURATION.observe(timings.db, route)
+        REQUEST_DB_ROUND_TRIPS.observe(timings.db_round_trips, route)
+        REQUEST_SERIALIZE_DURATION.observe(serialize, route)
+
+        if SERVER_TIMING_HEADER:
+            response['Server-Timing'] = server_timing(timings, total)
+        if request_logger.isEnabledFor(logging.INFO):
+            request_logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'route': route,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 3),
+                'db_ms': round(timings.db * 1000, 3),
+                'db_round_trips': timings.db_round_trips,
+                **{f'{phase}_ms': round(seconds * 1000, 3) for phase, seconds in timings.phases.items()},
+            }))
+        return response
+
+
+def server_timing(timings, total):
+    """The Server-Timing header value: db, every timed phase, and the total (milliseconds)."""
+    entries = [f'db;dur={timings.db * 1000:.3f};desc="{timings.db_round_trips} round trips"']
+    entries += [f'{phase};dur={seconds * 1000:.3f}' for phase, seconds in sorted(timings.phases.items())]
+    entries.append(f'total;dur={total * 1000:.3f}')
+    return ', '.join(entries)
+
+
+def render_metrics():
+    """All histograms plus the authenticated-user cache counters and startup timings, in the Prometheus text format."""
+    from .db import startup_timings
+    from .user_cache import user_cache
+
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render()
+    for key, value in user_cache.stats().items():
+        if key in USER_CACHE_COUNTERS:
+            name = f'auth_user_cache_{key}_total'
+            lines += [f'# TYPE {name} counter', f'{name} {_number(value)}']
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            name = f'auth_user_cache_{key}'
+            lines += [f'# TYPE {name} gauge', f'{name} {_number(value)}']
+    for key, value in sorted(startup_timings.items()):
+        name = f'process_startup_{key}'
+        lines += [f'# TYPE {name} gauge', f'{name} {_number(value)}']
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Serves ``render_metrics()``; mounted at /metrics when METRICS_ENABLED."""
+    if METRICS_TOKEN:
+        auth_header = request.headers.get('Authorization') or ''
+        if not hmac.compare_digest(auth_header.encode(), f'Bearer {METRICS_TOKEN}'.encode()):
+            return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def reset_metrics():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
@@ -0,0 +1,247 @@
+import datetime
+import json
+import logging
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import mongoengine
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from api.cache import get_cache
+from api.fixtures import connect_in_memory, insert_parts, synthetic_parts
+from api.indexes import reset_indexes
+from api.models import Order, OrderItem, PCPart, User
+from api.user_cache import user_cache
+
+PASSWORD = 'benchmark-password'
+PERCENTILES = (50, 90, 95, 99)
+SEARCHES = ['amd', 'corsair', 'geforce model', 'model 0001', 'intel cpu', 'lian li case']
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds synthetic parts, users and orders at several catalog sizes and measures latency "
+        "percentiles and throughput of the API hot paths through the full Django stack. "
+        "Results are written as JSON for comparison between commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help="Comma-separated catalog sizes to seed and measure.")
+        parser.add_argument('--requests', type=int, default=100, help="Timed requests per scenario and size.")
+        parser.add_argument('--warmup', type=int, default=5, help="Untimed requests before each scenario.")
+        parser.add_argument('--mongo-uri',
+                            help="Seed and benchmark a local mongod at this URI (its database is dropped). "
+                                 "Defaults to the in-memory mongomock stand-in (see requirements-dev.txt), "
+                                 "which is only good for comparing runs with each other.")
+        parser.add_argument('--scenarios', help="Comma-separated subset of scenarios to run.")
+        parser.add_argument('--with-cache', action='store_true',
+                            help="Keep the catalog response cache between requests (cleared by default).")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='benchmark-results.json', help="JSON file to write, or - for stdout.")
+        parser.add_argument('--compare', help="Earlier results file to print p50/p95 changes against.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError(f"Invalid --sizes: {options['sizes']}")
+        scenarios = self.scenarios()
+        if options['scenarios']:
+            wanted = options['scenarios'].split(',')
+            unknown = set(wanted) - set(scenarios)
+            if unknown:
+                raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}. Expected some of {', '.join(scenarios)}.")
+            scenarios = {name: scenarios[name] for name in wanted}
+
+        if options['verbosity'] < 2:
+            # one structured log line per request would drown the report
+            logging.getLogger('api.requests').setLevel(logging.WARNING)
+
+        results = []
+        for size in sizes:
+            self.stdout.write(f"Seeding {size} parts...")
+            state = self.seed(size, options)
+            for name, scenario in scenarios.items():
+                result = self.measure(name, scenario, state, options)
+                result['size'] = size
+                results.append(result)
+                latency = result['latency_ms']
+                self.stdout.write(
+                    f"{size:>7} {name:<22} p50 {latency['p50']:8.2f} ms  p95 {latency['p95']:8.2f} ms  "
+                    f"{result['throughput_rps']:8.1f} req/s  errors {result['errors']}"
+                )
+
+        report = {'meta': self.meta(options), 'results': results}
+        body = json.dumps(report, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(body)
+        else:
+            with open(options['output'], 'w') as f:
+                f.write(body + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}"))
+        if options['compare']:
+            self.compare(results, options['compare'])
+
+    def seed(self, size, options):
+        if options['mongo_uri']:
+            mongoengine.disconnect()
+            mongoengine.connect('pcparts_benchmark', host=options['mongo_uri'])
+            db = PCPart._get_db()
+            db.client.drop_database(db.name)
+            reset_indexes()
+        else:
+            connect_in_memory('pcparts_benchmark')
+        for document in (PCPart, User, Order):
+            document.ensure_indexes()
+        get_cache().clear()
+        user_cache.clear()
+
+        rng = random.Random(options['seed'])
+        part_ids = insert_parts(synthetic_parts(size, seed=options['seed']))
+        prices = {doc['_id']: float(doc['price']) for doc in PCPart.objects.only('price').as_pymongo()}
+
+        user = User(username='benchmark')
+        user.set_password(PASSWORD)
+        user.save()
+        # the benchmark user owns one order in twenty; the rest belong to other customers
+        owners = [user.id] + User._get_collection().insert_many(
+            [{'username': f'customer-{i}', 'password_hash': 'x'} for i in range(19)]
+        ).inserted_ids
+        orders = []
+        started = datetime.datetime(2024, 1, 1)
+        for i in range(max(size // 10, 20)):
+            lines = [(pid, rng.randint(1, 2)) for pid in rng.sample(part_ids, 3)]
+            items = [OrderItem(product=pid, quantity=quantity) for pid, quantity in lines]
+            subtotal = sum(prices[pid] * quantity for pid, quantity in lines)
+            order = Order(
+                user=owners[i % len(owners)], items=items, subtotal=subtotal, taxes=subtotal * 0.13,
+                total_amount=subtotal * 1.13, created_at=started + datetime.timedelta(minutes=i),
+                order_number=f'BENCH-{i:07d}',
+            )
+            orders.append(order.to_mongo().to_dict())
+        Order._get_collection().insert_many(orders)
+
+        token = self.client().post(
+            '/api/login/', {'username': 'benchmark', 'password': PASSWORD}, content_type='application/json'
+        ).json()['token']
+        return {'part_ids': [str(pid) for pid in part_ids], 'token': token, 'rng': rng}
+
+    @staticmethod
+    def client():
+        return Client(SERVER_NAME='localhost')
+
+    def scenarios(self):
+        def get_parts(client, state):
+            return client.get('/api/parts/?page_size=24')
+
+        def get_parts_filtered(client, state):
+            return client.get('/api/parts/?type=CPU&min_price=100&max_price=800&cores__gte=8&sort=price&page_size=24')
+
+        def get_parts_search(client, state):
+            return client.get('/api/parts/', {'search': state['rng'].choice(SEARCHES), 'page_size': 24})
+
+        def get_part_by_id(client, state):
+            return client.get(f"/api/parts/{state['rng'].choice(state['part_ids'])}/")
+
+        def get_cart_tdp(client, state):
+            ids = state['rng'].sample(state['part_ids'], 6)
+            return client.post('/api/cart/tdp/', {'ids': ids}, content_type='application/json')
+
+        def login(client, state):
+            return client.post(
+                '/api/login/', {'username': 'benchmark', 'password': PASSWORD}, content_type='application/json'
+            )
+
+        def orders_list(client, state):
+            return client.get('/api/orders/?page_size=20', HTTP_AUTHORIZATION=f"Bearer {state['token']}")
+
+        def orders_create(client, state):
+            items = [{'product_id': pid, 'quantity': 1} for pid in state['rng'].sample(state['part_ids'], 3)]
+            return client.post(
+                '/api/orders/', {'order_items_input': items}, content_type='application/json',
+                HTTP_AUTHORIZATION=f"Bearer {state['token']}",
+            )
+
+        return {func.__name__: func for func in (
+            get_parts, get_parts_filtered, get_parts_search, get_part_by_id, get_cart_tdp,
+            login, orders_list, orders_create,
+        )}
+
+    def measure(self, name, scenario, state, options):
+        client = self.client()
+        cache = get_cache()
+        for _ in range(options['warmup']):
+            self.clean_up(name, scenario(client, state))
+
+        latencies = []
+        errors = 0
+        total = 0.0
+        for _ in range(options['requests']):
+            if not options['with_cache']:
+                cache.clear()
+            started = time.perf_counter()
+            response = scenario(client, state)
+            elapsed = time.perf_counter() - started
+            total += elapsed
+            latencies.append(elapsed * 1000)
+            if response.status_code >= 400:
+                errors += 1
+            self.clean_up(name, response)
+
+        latencies = np.array(latencies)
+        return {
+            'scenario': name,
+            'requests': len(latencies),
+            'errors': errors,
+            'latency_ms': {
+                **{f'p{p}': round(float(np.percentile(latencies, p)), 3) for p in PERCENTILES},
+                'mean': round(float(latencies.mean()), 3),
+                'max': round(float(latencies.max()), 3),
+            },
+            'throughput_rps': round(len(latencies) / total, 2) if total else None,
+        }
+
+    @staticmethod
+    def clean_up(name, response):
+        # order numbers have one-second resolution, so created orders are removed before the next one
+        if name == 'orders_create' and response.status_code == 201:
+            Order.objects(id=response.json()['id']).delete()
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'timestamp': datetime.datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'database': 'mongod' if options['mongo_uri'] else 'mongomock',
+            'requests': options['requests'],
+            'warmup': options['warmup'],
+            'cache': options['with_cache'],
+            'seed': options['seed'],
+        }
+
+    def compare(self, results, path):
+        with open(path) as f:
+            baseline = {(r['size'], r['scenario']): r for r in json.load(f)['results']}
+        self.stdout.write(f"\nChange against {path} (negative is faster):")
+        for result in results:
+            before = baseline.get((result['size'], result['scenario']))
+            if before is None:
+                continue
+            changes = []
+            for key in ('p50', 'p95'):
+                old, new = before['latency_ms'][key], result['latency_ms'][key]
+                changes.append(f"{key} {(new - old) / old * 100:+6.1f}%" if old else f"{key} n/a")
+            self.stdout.write(f"{result['size']:>7} {result['scenario']:<22} {'  '.join(changes)}")
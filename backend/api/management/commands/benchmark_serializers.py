@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.fixtures import connect_in_memory, insert_parts, synthetic_parts
+from api.models import PCPart
+from api.serializers import PCPartSerializer, RawPCPartSerializer
+
+
+class Command(BaseCommand):
+    help = "Compares the Document/DocumentSerializer catalog read path with the raw fast path."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--parts', type=int, default=10000, help="Synthetic parts to seed.")
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--use-database', action='store_true',
+                            help="Benchmark against the configured MongoDB instead of an in-memory database. "
+                                 "Nothing is seeded in this mode.")
+
+    def handle(self, *args, **options):
+        if not options['use_database']:
+            connect_in_memory()
+            insert_parts(synthetic_parts(options['parts']))
+        count = PCPart.objects.count()
+
+        def document_path():
+            return PCPartSerializer(list(PCPart.objects), many=True).data
+
+        def raw_path():
+            return RawPCPartSerializer(list(PCPart.objects.only(*RawPCPartSerializer.fields).as_pymongo()), many=True).data
+
+        timings = {}
+        for label, func in (('document', document_path), ('raw', raw_path)):
+            best = None
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                func()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[label] = best
+            self.stdout.write(f"{label:>8}: {best * 1000:.1f} ms for {count} parts")
+
+        self.stdout.write(self.style.SUCCESS(f"Fast path speedup: {timings['document'] / timings['raw']:.1f}x"))
@@ -0,0 +1,152 @@
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from api.cache import bump_catalog_version
+from api.ingest import prepare_rows, read_rows, upsert_key
+from api.models import PCPart
+from api.snapshot import next_revision
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _bounded_map(executor, fn, chunks, window):
+    """Like executor.map, in order, but never more than ``window`` chunks read ahead of the consumer."""
+    pending = deque()
+    for chunk in chunks:
+        pending.append(executor.submit(fn, chunk))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams a vendor catalog (CSV or JSONL) into PCPart, normalizing specs and upserting on "
+        "manufacturer + name in batched bulk writes. Rows that fail validation are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSONL file, or - for stdin (then --format is required).")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per bulk write.")
+        parser.add_argument('--workers', type=int, default=0,
+                            help="Processes that parse and validate rows; 0 does it inline.")
+        parser.add_argument('--errors', help="Also write rejected rows as JSONL to this file.")
+        parser.add_argument('--max-errors', type=int, help="Abort once this many rows were rejected.")
+        parser.add_argument('--progress-every', type=int, default=10000, help="Rows between progress lines.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate only; write nothing.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (path.rsplit('.', 1)[-1].lower() if '.' in path else None)
+        if file_format in ('json', 'ndjson'):
+            file_format = 'jsonl'
+        if file_format not in ('csv', 'jsonl'):
+            raise CommandError("Cannot tell the input format; pass --format csv or --format jsonl.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        errors_file = open(options['errors'], 'w') if options['errors'] else None
+        executor = None
+        # filled in by load() as batches are written, so a failed import still invalidates what it wrote
+        totals = dict.fromkeys(('rows', 'upserted', 'modified', 'unchanged', 'errors', 'in_flight', 'seconds'), 0)
+        try:
+            chunks = _chunks(read_rows(stream, file_format), options['batch_size'])
+            if options['workers'] > 0:
+                # spawned workers start clean instead of inheriting this process's Mongo client
+                executor = ProcessPoolExecutor(options['workers'], mp_context=multiprocessing.get_context('spawn'))
+                batches = _bounded_map(executor, prepare_rows, chunks, options['workers'] * 2)
+            else:
+                batches = map(prepare_rows, chunks)
+            self.load(batches, errors_file, options, totals)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            if stream is not sys.stdin:
+                stream.close()
+            if errors_file is not None:
+                errors_file.close()
+            if totals['upserted'] or totals['modified'] or totals['in_flight']:
+                # the bulk writes do not say which parts changed, so snapshots reload
+                next_revision(reload=True)
+                bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Validated' if options['dry_run'] else 'Imported'} {totals['rows']} rows in {totals['seconds']:.1f}s: "
+            f"{totals['upserted']} new, {totals['modified']} updated, {totals['unchanged']} unchanged, "
+            f"{totals['errors']} rejected."
+        ))
+
+    def load(self, batches, errors_file, options, totals):
+        collection = None if options['dry_run'] else PCPart._get_collection()
+        if collection is not None:
+            PCPart.ensure_indexes()
+        started = time.monotonic()
+        next_progress = options['progress_every']
+
+        for prepared in batches:
+            # the last row for a part wins; one upsert per part keeps the batch free of races
+            latest = {}
+            for line_number, document, error in prepared:
+                totals['rows'] += 1
+                if error is not None:
+                    self.reject(totals, errors_file, line_number, error, options)
+                    continue
+                key = upsert_key(document)
+                latest[(key['manufacturer_key'], key['name'])] = (line_number, document)
+
+            if latest and collection is not None:
+                lines = [line_number for line_number, _ in latest.values()]
+                operations = [
+                    UpdateOne(upsert_key(document), {'$set': document}, upsert=True)
+                    for _, document in latest.values()
+                ]
+                # until counted, any of these may have been written when an exception escapes
+                totals['in_flight'] = len(operations)
+                try:
+                    result = collection.bulk_write(operations, ordered=False).bulk_api_result
+                except BulkWriteError as e:
+                    result = e.details
+                    for write_error in result['writeErrors']:
+                        self.reject(totals, errors_file, lines[write_error['index']], write_error['errmsg'], options)
+                upserted = len(result.get('upserted', []))
+                totals['upserted'] += upserted
+                totals['modified'] += result.get('nModified', 0)
+                totals['unchanged'] += result.get('nMatched', 0) - result.get('nModified', 0)
+                totals['in_flight'] = 0
+
+            if options['progress_every'] and totals['rows'] >= next_progress:
+                next_progress += options['progress_every']
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{totals['rows']} rows ({totals['rows'] / elapsed:.0f}/s): {totals['upserted']} new, "
+                    f"{totals['modified']} updated, {totals['errors']} rejected"
+                )
+
+        totals['seconds'] = time.monotonic() - started
+
+    def reject(self, totals, errors_file, line_number, error, options):
+        totals['errors'] += 1
+        self.stderr.write(f"Line {line_number}: {error}")
+        if errors_file is not None:
+            errors_file.write(json.dumps({'line': line_number, 'error': error}) + '\n')
+        if options['max_errors'] is not None and totals['errors'] >= options['max_errors']:
+            raise CommandError(f"Stopped after {totals['errors']} rejected rows (--max-errors).")
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+
+from api.cache import bump_catalog_version
+from api.models import PCPart, derived_part_fields
+from api.snapshot import next_revision
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the derived PCPart fields (spec_values/spec_units parsed from specs, type_key/manufacturer_key) "
+        "for existing parts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        collection = PCPart._get_collection()
+        PCPart.ensure_indexes()
+
+        updated = 0
+        batch = []
+        for doc in collection.find({}, {'specs': 1, 'type': 1, 'manufacturer': 1}):
+            fields = derived_part_fields(doc.get('specs'), doc.get('type'), doc.get('manufacturer'))
+            batch.append(UpdateOne({'_id': doc['_id']}, {'$set': fields}))
+            if len(batch) >= batch_size:
+                updated += collection.bulk_write(batch, ordered=False).modified_count
+                batch = []
+        if batch:
+            updated += collection.bulk_write(batch, ordered=False).modified_count
+
+        next_revision(reload=True)
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"Updated derived fields for {updated} parts."))
@@ -1,19 +1,45 @@
 from mongoengine import Document, StringField, DecimalField, URLField, DictField, EmbeddedDocument, ListField, ReferenceField, DateTimeField, FloatField, IntField, EmbeddedDocumentField
-from werkzeug.security import generate_password_hash, check_password_hash
 import datetime
 
+from .specs import INDEXED_SPEC_FIELDS, catalog_key, parse_specs, spec_number
+from . import search, snapshot, suggest
+from .cache import bump_catalog_version
+from .user_cache import user_cache
+from . import passwords
+
 # Create your models here.
 
+def derived_part_fields(specs, part_type, manufacturer):
+    """The PCPart fields computed from scraped ones; set by PCPart.save and by the bulk loaders."""
+    spec_values, spec_units = parse_specs(specs or {})
+    return {
+        'spec_values': spec_values,
+        'spec_units': spec_units,
+        'type_key': catalog_key(part_type),
+        'manufacturer_key': catalog_key(manufacturer),
+    }
+
+
 class User(Document):
     username = StringField(required=True, unique=True)
     password_hash = StringField(required=True)
     meta = {'collection': 'users'}
+
+    def save(self, *args, **kwargs):
+        result = super(User, self).save(*args, **kwargs)
+        user_cache.invalidate(self.id)
+        return result
+
+    def delete(self, *args, **kwargs):
+        user_id = self.id
+        super(User, self).delete(*args, **kwargs)
+        user_cache.invalidate(user_id)
     
     def set_password(self,password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash_password(password)
         
     def check_password(self,password):
-        return check_password_hash(self.password_hash, password)
+        return passwords.check_password(self.password_hash, password)
         
     
 
@@ -25,16 +51,46 @@ class PCPart(Document):
     url = URLField(max_length=500, required=True)
     specs = DictField(required=True)    
     description = StringField(max_length=1000, required=False)
+    spec_values = DictField()
+    spec_units = DictField()
+    # lowercased type/manufacturer, so filters are indexed equality matches instead of regexes
+    type_key = StringField(max_length=50)
+    manufacturer_key = StringField(max_length=100)
+    # catalog revision of the last write, so in-memory snapshots can re-read only what changed
+    revision = IntField()
 
     meta = {
         'collection': 'products', 
         'indexes': [
-            'type',
-            'manufacturer',
-            'name'
-        ]
+            ('price', 'id'),
+            ('name', 'id'),
+            ('type_key', 'price', 'id'),
+            ('type_key', 'name', 'id'),
+            ('manufacturer_key', 'price', 'id'),
+            ('manufacturer_key', 'name', 'id'),
+            ('type_key', 'manufacturer_key', 'price', 'id'),
+            'revision',
+        ] + [('type_key', f'spec_values.{name}') for name in INDEXED_SPEC_FIELDS]
     }
 
+    def save(self, *args, **kwargs):
+        for field, value in derived_part_fields(self.specs, self.type, self.manufacturer).items():
+            setattr(self, field, value)
+        self.revision = snapshot.next_revision()
+        result = super(PCPart, self).save(*args, **kwargs)
+        search.index_part(self)
+        suggest.index_part(self)
+        bump_catalog_version()
+        return result
+
+    def delete(self, *args, **kwargs):
+        part_id = self.id
+        super(PCPart, self).delete(*args, **kwargs)
+        search.unindex_part(part_id)
+        suggest.unindex_part(part_id)
+        snapshot.next_revision()
+        bump_catalog_version()
+
     def __str__(self):
         return f"{self.manufacturer} {self.name} ({self.type})"
 
@@ -63,14 +119,7 @@ class PCPart(Document):
         return self.specs.get('Socket')
     
     def numeric_spec(self, key):
-        try:
-            raw = self.specs.get(key, "")
-            if not raw:
-                return 0
-            numeric = ''.join(filter(str.isdigit, raw))
-            return int(numeric) if numeric else 0
-        except:
-            return 0
+        return spec_number(self.specs, self.spec_values, key)
 
 
 class OrderItem(EmbeddedDocument):
@@ -91,7 +140,7 @@ class Order(Document):
     meta = {
         'collection': 'orders',
         'indexes': [
-            'user',
+            ('user', '-created_at'),
             'order_number',
             'created_at'
         ]
@@ -99,12 +148,17 @@ class Order(Document):
 
     def save(self, *args, **kwargs):
         self.updated_at = datetime.datetime.utcnow()
-  
+        self.assign_order_number()
+        super(Order, self).save(*args, **kwargs)
+
+    def assign_order_number(self):
         if not self.order_number:
              timestamp = self.created_at.strftime('%Y%m%d%H%M%S')
-             user_id_part = str(self.user.id)[-4:] 
+             # read the stored reference; self.user would fetch the whole user just for its id
+             user = self._data.get('user')
+             user_id_part = str(getattr(user, 'id', user))[-4:]
              self.order_number = f"ORD-{timestamp}-{user_id_part}"
-        super(Order, self).save(*args, **kwargs)
+        return self.order_number
 
     def __str__(self):
         return f"Order {self.order_number} by {self.user.username}"
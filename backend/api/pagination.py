@@ -0,0 +1,187 @@
+import base64
+import binascii
+import json
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+
+from .search import MAX_RESULTS, search_part_ids
+
+# sort param -> Mongo field; every sort is tie-broken on _id so the order is total
+SORT_FIELDS = {
+    'price': 'price',
+    'name': 'name',
+    'id': '_id',
+}
+
+DEFAULT_PAGE_SIZE = getattr(settings, 'PARTS_DEFAULT_PAGE_SIZE', 24)
+MAX_PAGE_SIZE = getattr(settings, 'PARTS_MAX_PAGE_SIZE', 200)
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def parse_sort(raw, search=None):
+    """Returns (sort param, Mongo field, direction) for values like "price" or "-name"."""
+    raw = (raw or ('relevance' if search else 'id')).strip()
+    if raw == 'relevance':
+        if not search:
+            raise PaginationError("Sorting by relevance requires a search query.")
+        return 'relevance', None, 1
+    direction = -1 if raw.startswith('-') else 1
+    key = raw.lstrip('+-')
+    if key not in SORT_FIELDS:
+        raise PaginationError(f"Invalid sort field: {key}. Expected one of {', '.join(SORT_FIELDS)}.")
+    return key, SORT_FIELDS[key], direction
+
+
+def sort_fields(params):
+    """Document fields the requested sort order reads, so projections can keep them."""
+    key = (params.get('sort') or '').strip().lstrip('+-')
+    return {key} if key in SORT_FIELDS else set()
+
+
+def parse_page_size(raw):
+    if raw in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    try:
+        page_size = int(raw)
+    except ValueError:
+        raise PaginationError(f"Invalid page_size value: {raw}")
+    if page_size < 1:
+        raise PaginationError("page_size must be a positive integer.")
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+def encode_cursor(sort, value, last_id):
+    payload = json.dumps({'s': sort, 'v': value, 'id': str(last_id)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        last_id = ObjectId(payload['id'])
+    except (binascii.Error, ValueError, KeyError, TypeError, InvalidId):
+        raise PaginationError("Invalid cursor.")
+    if payload.get('s') != sort:
+        raise PaginationError("Cursor does not match the requested sort order.")
+    return payload.get('v'), last_id
+
+
+def keyset_condition(field, direction, value, last_id):
+    """Raw Mongo condition selecting documents strictly after (value, last_id) in sort order."""
+    op = '$gt' if direction == 1 else '$lt'
+    if field == '_id':
+        return {'_id': {op: last_id}}
+    return {'$or': [
+        {field: {op: value}},
+        {field: value, '_id': {op: last_id}},
+    ]}
+
+
+def _value(doc, field):
+    """Reads a field from either a PCPart Document or a raw ``as_pymongo()`` dict."""
+    if isinstance(doc, dict):
+        return doc.get('_id' if field == 'id' else field)
+    return getattr(doc, field)
+
+
+class PagePlan:
+    """
+    Sort, keyset condition and page size for one catalog request, independent of how the
+    documents are fetched so the sync (mongoengine) and async (motor) views share it.
+    """
+
+    def __init__(self, params):
+        self.search = params.get('search')
+        self.explicit_sort = bool(params.get('sort'))
+        self.sort, self.field, self.direction = parse_sort(params.get('sort'), self.search)
+        self.cursor = params.get('cursor')
+        self.paginated = bool(self.cursor) or 'page_size' in params
+        self.page_size = parse_page_size(params.get('page_size')) if self.paginated else None
+        self.signed_sort = f'-{self.sort}' if self.direction == -1 else self.sort
+
+        self.condition = None
+        self.after = None
+        self.offset = 0
+        if self.cursor and self.relevance:
+            self.offset, _ = decode_cursor(self.cursor, 'relevance')
+            if not isinstance(self.offset, int) or self.offset < 0:
+                raise PaginationError("Invalid cursor.")
+        elif self.cursor:
+            value, last_id = decode_cursor(self.cursor, self.signed_sort)
+            self.after = (value, last_id)
+            self.condition = keyset_condition(self.field, self.direction, value, last_id)
+
+    @property
+    def relevance(self):
+        return self.sort == 'relevance'
+
+    @property
+    def ordering(self):
+        """mongoengine ``order_by`` arguments, or None when the natural order is fine."""
+        if self.relevance or not (self.paginated or self.explicit_sort):
+            return None
+        prefix = '-' if self.direction == -1 else '+'
+        return [f'{prefix}id'] if self.sort == 'id' else [f'{prefix}{self.sort}', f'{prefix}id']
+
+    @property
+    def mongo_sort(self):
+        """The same ordering as a pymongo sort specification."""
+        if self.ordering is None:
+            return None
+        return [(SORT_FIELDS[key.lstrip('+-')], self.direction) for key in self.ordering]
+
+    @property
+    def limit(self):
+        """Rows to fetch: one extra tells whether another page follows."""
+        return self.page_size + 1 if self.paginated and not self.relevance else None
+
+    def finish(self, documents):
+        """Turns the fetched rows into (page, next_cursor)."""
+        if self.relevance:
+            return self._finish_by_relevance(documents)
+        if not self.paginated or len(documents) <= self.page_size:
+            return documents, None
+        documents = documents[:self.page_size]
+        last = documents[-1]
+        value = None if self.sort == 'id' else _value(last, self.sort)
+        if self.field == 'price' and value is not None:
+            value = float(value)
+        return documents, encode_cursor(self.signed_sort, value, _value(last, 'id'))
+
+    def _finish_by_relevance(self, documents):
+        """
+        Search results are ranked in memory and paged by offset. Filters other than the search may
+        let through matches beyond the SEARCH_MAX_RESULTS best (see filters.search_ids), so the
+        cap is applied here, after filtering.
+        """
+        rank = {part_id: i for i, part_id in enumerate(search_part_ids(self.search, limit=None))}
+        documents = sorted(documents, key=lambda doc: rank.get(str(_value(doc, 'id')), len(rank)))[:MAX_RESULTS]
+        if not self.paginated:
+            return documents, None
+        page = documents[self.offset:self.offset + self.page_size]
+        next_cursor = None
+        if self.offset + self.page_size < len(documents):
+            next_cursor = encode_cursor('relevance', self.offset + self.page_size, _value(page[-1], 'id'))
+        return page, next_cursor
+
+
+def paginate_parts(queryset, params):
+    """
+    Applies a stable sort and, when ``cursor`` or ``page_size`` is given, keyset pagination.
+    Works on Document and ``as_pymongo()`` querysets. Returns (documents, next_cursor, paginated).
+    """
+    plan = PagePlan(params)
+    if plan.condition:
+        queryset = queryset.filter(__raw__=plan.condition)
+    if plan.ordering:
+        queryset = queryset.order_by(*plan.ordering)
+    if plan.limit:
+        queryset = queryset.limit(plan.limit)
+    documents, next_cursor = plan.finish(list(queryset))
+    return documents, next_cursor, plan.paginated
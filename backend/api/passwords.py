@@ -0,0 +1,61 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# werkzeug method string, e.g. "scrypt", "scrypt:16384:8:1" or "pbkdf2:sha256:600000"
+HASH_METHOD = getattr(settings, 'PASSWORD_HASH_METHOD', 'scrypt')
+HASH_WORKERS = getattr(settings, 'PASSWORD_HASH_WORKERS', 4)
+# hashes allowed to wait for a worker before new ones are rejected
+HASH_QUEUE_SIZE = getattr(settings, 'PASSWORD_HASH_QUEUE_SIZE', 32)
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='password-hash')
+_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_SIZE)
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing executor is saturated; callers should answer 503."""
+
+
+def hash_password(password):
+    return generate_password_hash(password, method=HASH_METHOD)
+
+
+def check_password(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+
+@functools.lru_cache(maxsize=None)
+def current_method_prefix():
+    """
+    The method prefix of new hashes, e.g. "scrypt:32768:8:1". werkzeug fills in default cost
+    parameters, so this hashes once to learn it; ``ApiConfig.ready`` calls it at startup so that
+    hash never runs on a request.
+    """
+    return generate_password_hash('', method=HASH_METHOD).split('$', 1)[0]
+
+
+def needs_rehash(password_hash):
+    """True when a stored hash was made with a different method or cost than PASSWORD_HASH_METHOD."""
+    return password_hash.split('$', 1)[0] != current_method_prefix()
+
+
+async def _run(func, *args):
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+    finally:
+        _slots.release()
+
+
+async def hash_password_async(password):
+    """Hashes on the bounded executor so the event loop and request workers stay free."""
+    return await _run(hash_password, password)
+
+
+async def check_password_async(password_hash, password):
+    return await _run(check_password, password_hash, password)
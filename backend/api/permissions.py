@@ -1,7 +1,9 @@
 import jwt
 from django.conf import settings
 from rest_framework import permissions
+from .instrumentation import timed
 from .models import User
+from .user_cache import user_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,6 +13,7 @@ class IsAuthenticatedCustom(permissions.BasePermission):
     Custom permission to check for a valid JWT in the Authorization header.
     Attaches the user object to the request if valid.
     """
+    @timed('auth')
     def has_permission(self, request, view):
         auth_header = request.headers.get('Authorization')
         if not auth_header or not auth_header.startswith('Bearer '):
@@ -25,7 +28,7 @@ class IsAuthenticatedCustom(permissions.BasePermission):
                 logger.warning("CustomAuth: Token payload missing 'id'.")
                 return False
             
-            user = User.objects.get(id=user_id)
+            user = user_cache.get(user_id, lambda pk: User.objects.get(id=pk))
             request.user = user
             request.auth = token
             logger.debug(f"CustomAuth: User {user_id} authenticated successfully.")
@@ -0,0 +1,198 @@
+import logging
+import math
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+from .indexes import LazyIndex, expired
+
+logger = logging.getLogger(__name__)
+
+FIELD_WEIGHTS = {'name': 3.0, 'manufacturer': 2.0, 'type': 1.5}
+MIN_FUZZY_LENGTH = 4
+MIN_SIMILARITY = 0.3
+MAX_LENGTH_DIFFERENCE = 2
+PREFIX_SIMILARITY = 0.8
+MAX_CACHED_QUERIES = 1024
+
+MAX_RESULTS = getattr(settings, 'SEARCH_MAX_RESULTS', 1000)
+INDEX_TTL = getattr(settings, 'SEARCH_INDEX_TTL', 300)
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or '').lower())
+
+
+def trigrams(token):
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """
+    In-process inverted index over PCPart name, manufacturer and type.
+    Terms are matched exactly, by prefix, or by trigram similarity for typo tolerance,
+    so a query only touches the postings of the terms it resolves to.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}      # term -> {part_id: field weight}
+        self._trigrams = {}      # trigram -> set of terms
+        self._documents = {}     # part_id -> set of terms
+        self._sorted_terms = None
+        self._results = {}
+        self.built_at = 0.0
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, part_id, name, manufacturer, type):
+        part_id = str(part_id)
+        with self._lock:
+            self._remove(part_id)
+            weights = {}
+            for field, text in (('name', name), ('manufacturer', manufacturer), ('type', type)):
+                for term in tokenize(text):
+                    weights[term] = max(weights.get(term, 0), FIELD_WEIGHTS[field])
+            for term, weight in weights.items():
+                if term not in self._postings:
+                    self._postings[term] = {}
+                    self._sorted_terms = None
+                    for gram in trigrams(term):
+                        self._trigrams.setdefault(gram, set()).add(term)
+                self._postings[term][part_id] = weight
+            self._documents[part_id] = set(weights)
+            self._results.clear()
+
+    def remove(self, part_id):
+        with self._lock:
+            self._remove(str(part_id))
+            self._results.clear()
+
+    def _remove(self, part_id):
+        for term in self._documents.pop(part_id, ()):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(part_id, None)
+            if not postings:
+                del self._postings[term]
+                self._sorted_terms = None
+                for gram in trigrams(term):
+                    terms = self._trigrams.get(gram)
+                    if terms:
+                        terms.discard(term)
+                        if not terms:
+                            del self._trigrams[gram]
+
+    def _expand(self, token):
+        """Returns {term: similarity} for the indexed terms a query token resolves to."""
+        matches = {}
+        if token in self._postings:
+            matches[token] = 1.0
+
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        i = bisect_left(self._sorted_terms, token)
+        while i < len(self._sorted_terms) and self._sorted_terms[i].startswith(token):
+            matches.setdefault(self._sorted_terms[i], PREFIX_SIMILARITY)
+            i += 1
+
+        if len(token) >= MIN_FUZZY_LENGTH:
+            grams = trigrams(token)
+            shared = {}
+            for gram in grams:
+                for term in self._trigrams.get(gram, ()):
+                    shared[term] = shared.get(term, 0) + 1
+            for term, count in shared.items():
+                if abs(len(term) - len(token)) > MAX_LENGTH_DIFFERENCE:
+                    continue
+                similarity = count / (len(grams) + len(trigrams(term)) - count)
+                if similarity >= MIN_SIMILARITY and term not in matches:
+                    matches[term] = similarity * PREFIX_SIMILARITY
+        return matches
+
+    def search(self, query, limit=MAX_RESULTS):
+        """Returns part ids ranked by relevance, best first."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        key = (' '.join(tokens), limit)
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+
+            total = max(len(self._documents), 1)
+            scores = {}
+            matched = {}
+            for token in tokens:
+                best = {}
+                for term, similarity in self._expand(token).items():
+                    postings = self._postings[term]
+                    idf = math.log(1 + total / len(postings))
+                    for part_id, weight in postings.items():
+                        score = similarity * weight * idf
+                        if score > best.get(part_id, 0):
+                            best[part_id] = score
+                for part_id, score in best.items():
+                    scores[part_id] = scores.get(part_id, 0) + score
+                    matched[part_id] = matched.get(part_id, 0) + 1
+
+            if not scores:
+                results = []
+            else:
+                # prefer documents matching every query token, fall back to the best partial matches
+                required = max(matched.values())
+                ranked = sorted(
+                    (part_id for part_id in scores if matched[part_id] == required),
+                    key=lambda part_id: (-scores[part_id], part_id),
+                )
+                results = ranked[:limit] if limit is not None else ranked
+            if len(self._results) >= MAX_CACHED_QUERIES:
+                self._results.clear()
+            self._results[key] = results
+            return results
+
+
+def build_index():
+    from .models import PCPart
+
+    started = time.monotonic()
+    index = SearchIndex()
+    for doc in PCPart.objects.only('id', 'name', 'manufacturer', 'type').as_pymongo():
+        index.add(doc['_id'], doc.get('name'), doc.get('manufacturer'), doc.get('type'))
+    index.built_at = time.monotonic()
+    logger.info(f"Built search index over {len(index)} parts in {index.built_at - started:.3f}s")
+    return index
+
+
+# rebuilt after SEARCH_INDEX_TTL seconds to pick up writes made by other workers
+_index = LazyIndex('search index', build_index, expired(INDEX_TTL))
+
+
+def get_index():
+    return _index.get()
+
+
+def reset_index():
+    _index.reset()
+
+
+def search_part_ids(query, limit=MAX_RESULTS):
+    """Part ids matching ``query``, best first; ``limit=None`` returns every match."""
+    return get_index().search(query, limit)
+
+
+def index_part(part):
+    part_id, name, manufacturer, part_type = part.id, part.name, part.manufacturer, part.type
+    _index.update(lambda index: index.add(part_id, name, manufacturer, part_type))
+
+
+def unindex_part(part_id):
+    _index.update(lambda index: index.remove(part_id))
@@ -1,28 +1,142 @@
+from decimal import Decimal, ROUND_HALF_UP
 from rest_framework import serializers
 from rest_framework_mongoengine import serializers as mongo_serializers
+from .compatibility import parse_object_ids
+from .instrumentation import timed
 from .models import PCPart, User, Order, OrderItem
 
 
-class PCPartSerializer(mongo_serializers.DocumentSerializer):
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    @timed('serialize')
+    def data(self):
+        return super().data
+
+
+class TimedDataMixin:
+    """
+    Counts ``.data`` towards the request's serializer time (Server-Timing ``serialize``). Pair it
+    with ``list_serializer_class = TimedListSerializer`` so ``many=True`` is counted too.
+    """
+
+    @property
+    @timed('serialize')
+    def data(self):
+        return super().data
+
+
+class PCPartSerializer(TimedDataMixin, mongo_serializers.DocumentSerializer):
     class Meta:
         model = PCPart
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'name', 'manufacturer', 'type', 'price', 'url', 'specs', 'description']
 
-class UserSerializer(mongo_serializers.DocumentSerializer):
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+def parse_part_fields(raw):
+    """
+    Returns the PCPartSerializer fields requested by a ``?fields=id,name,price`` param,
+    or None when the param is absent. Raises ValueError for unknown fields.
+    """
+    if raw is None:
+        return None
+    requested = [field.strip() for field in raw.split(',') if field.strip()]
+    unknown = [field for field in requested if field not in PCPartSerializer.Meta.fields]
+    if unknown or not requested:
+        raise ValueError(f"Invalid fields: {', '.join(unknown) or raw!r}. Expected any of {', '.join(PCPartSerializer.Meta.fields)}.")
+    return [field for field in PCPartSerializer.Meta.fields if field in requested]
+
+def select_part_fields(data, fields):
+    """A serialized part narrowed to ``fields`` as returned by parse_part_fields (None keeps all)."""
+    return dict(data) if fields is None else {field: data[field] for field in fields}
+
+class RawPCPartSerializer:
+    """
+    Read-only fast path producing the same output as PCPartSerializer from raw documents
+    returned by ``as_pymongo()``, skipping Document hydration and per-field DRF dispatch.
+    """
+    fields = PCPartSerializer.Meta.fields
+
+    def __init__(self, instance, many=False, fields=None):
+        self.instance = instance
+        self.many = many
+        self.selected = [(field, _RAW_FIELDS[field]) for field in (fields or self.fields)]
+
+    def to_representation(self, doc):
+        return {field: convert(doc) for field, convert in self.selected}
+
+    @property
+    @timed('serialize')
+    def data(self):
+        if self.many:
+            return [self.to_representation(doc) for doc in self.instance]
+        return self.to_representation(self.instance)
+
+
+def _raw_str(value):
+    return None if value is None else str(value)
+
+
+def _raw_price(doc):
+    price = doc.get('price')
+    if price is None:
+        return None
+    # mirrors mongoengine DecimalField.to_python followed by DRF DecimalField coercion
+    return '{:f}'.format(Decimal('%s' % price).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+
+
+def _raw_specs(doc):
+    specs = doc.get('specs')
+    return None if specs is None else {str(key): value for key, value in specs.items()}
+
+
+_RAW_FIELDS = {
+    'id': lambda doc: str(doc['_id']),
+    'name': lambda doc: _raw_str(doc.get('name')),
+    'manufacturer': lambda doc: _raw_str(doc.get('manufacturer')),
+    'type': lambda doc: _raw_str(doc.get('type')),
+    'price': _raw_price,
+    'url': lambda doc: _raw_str(doc.get('url')),
+    'specs': _raw_specs,
+    'description': lambda doc: _raw_str(doc.get('description')),
+}
+
+# product summary embedded in order items with ?expand=product
+ORDER_PRODUCT_FIELDS = ['id', 'name', 'manufacturer', 'type', 'price']
+
+
+class UserSerializer(TimedDataMixin, mongo_serializers.DocumentSerializer):
     class Meta:
         model = User
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'username']
 
 class OrderItemSerializer(mongo_serializers.EmbeddedDocumentSerializer):
-    product_id = serializers.CharField(source='product.id', read_only=True)
+    product_id = serializers.SerializerMethodField()
 
     class Meta:
         model = OrderItem
         fields = ['product_id', 'quantity'] 
 
+    def get_product_id(self, item):
+        # read the stored reference so listing orders never dereferences their products
+        return _raw_str(_reference_id(item._data.get('product')))
 
-class OrderSerializer(mongo_serializers.DocumentSerializer):
-    user = UserSerializer(read_only=True) 
+    def to_representation(self, item):
+        data = super().to_representation(item)
+        products = self.context.get('products')
+        if products is not None:
+            data['product'] = products.get(data['product_id'])
+        return data
+
+
+class OrderSerializer(TimedDataMixin, mongo_serializers.DocumentSerializer):
+    user = serializers.SerializerMethodField()
     items = OrderItemSerializer(many=True, read_only=True)
     order_items_input = serializers.ListField(
         child=serializers.DictField(), 
@@ -35,6 +149,7 @@ class OrderSerializer(mongo_serializers.DocumentSerializer):
 
     class Meta:
         model = Order
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'order_number', 'user', 'items', 
             'subtotal', 'shipping_cost', 'taxes', 'total_amount', 
@@ -47,6 +162,15 @@ class OrderSerializer(mongo_serializers.DocumentSerializer):
             'created_at', 'updated_at'
         ]
 
+    def get_user(self, order):
+        user = order._data.get('user')
+        if not isinstance(user, User):
+            # orders are listed per owner, so the requesting user stands in for the stored reference
+            user_id = _reference_id(user)
+            request_user = getattr(self.context.get('request'), 'user', None)
+            user = request_user if getattr(request_user, 'id', None) == user_id else User.objects(id=user_id).first()
+        return UserSerializer(user).data if user else None
+
     def validate_order_items_input(self, items_input_data):
         if not items_input_data:
             raise serializers.ValidationError("Order items cannot be empty.")
@@ -60,19 +184,24 @@ class OrderSerializer(mongo_serializers.DocumentSerializer):
             if not isinstance(item_data['quantity'], int) or item_data['quantity'] < 1:
                  raise serializers.ValidationError("Item quantity must be a positive integer.")
             product_ids.append(item_data['product_id'])
-            
-        try:
-            found_products = PCPart.objects.filter(id__in=product_ids)
-            found_ids = {str(p.id) for p in found_products}
-            missing_ids = [pid for pid in product_ids if pid not in found_ids]
-            if missing_ids:
-                raise serializers.ValidationError(f"Products with IDs not found: {missing_ids}")
-        except Exception as e:
-            raise serializers.ValidationError(f"Error validating product IDs: {e}")
+
+        # bulk imports pass the products of the whole batch in; otherwise fetch them here, once
+        products = self.context.get('products')
+        if products is None:
+            try:
+                products = fetch_order_products(product_ids)
+            except Exception as e:
+                raise serializers.ValidationError(f"Error validating product IDs: {e}")
+        missing_ids = [pid for pid in product_ids if str(pid) not in products]
+        if missing_ids:
+            raise serializers.ValidationError(f"Products with IDs not found: {missing_ids}")
+        self._products = products
             
         return items_input_data
 
-    def create(self, validated_data):
+    def build_order(self, validated_data):
+        """Prices the validated items with the products fetched during validation; returns an unsaved Order."""
+        validated_data = dict(validated_data)
         items_input = validated_data.pop('order_items_input')
         shipping_cost_input = validated_data.pop('shipping_cost_input', 0.0) 
         taxes_input = validated_data.pop('taxes_input', None)
@@ -80,14 +209,14 @@ class OrderSerializer(mongo_serializers.DocumentSerializer):
         if not user:
              raise serializers.ValidationError("User information is missing for order creation.")
 
+        products_dict = getattr(self, '_products', None)
+        if products_dict is None:
+            products_dict = fetch_order_products([item['product_id'] for item in items_input])
+
         order_items = []
         subtotal = 0
-        product_ids = [item['product_id'] for item in items_input]
-        products = PCPart.objects.filter(id__in=product_ids)
-        products_dict = {str(p.id): p for p in products}
-
         for item_data in items_input:
-            product = products_dict.get(item_data['product_id'])
+            product = products_dict.get(str(item_data['product_id']))
             if not product:
                 raise serializers.ValidationError(f"Product {item_data['product_id']} inconsistency.") 
 
@@ -103,7 +232,7 @@ class OrderSerializer(mongo_serializers.DocumentSerializer):
         taxes = float(taxes_input) if taxes_input is not None else (subtotal * 0.13)
         total_amount = subtotal + shipping_cost + taxes
 
-        order = Order(
+        return Order(
             user=user,
             items=order_items,
             subtotal=subtotal,
@@ -112,6 +241,83 @@ class OrderSerializer(mongo_serializers.DocumentSerializer):
             total_amount=total_amount,
             **{k: v for k, v in validated_data.items() if hasattr(Order, k)} 
         )
-        
+
+    def create(self, validated_data):
+        order = self.build_order(validated_data)
         order.save()
-        return order
\ No newline at end of file
+        return order
+
+
+class OrderImportSerializer(OrderSerializer):
+    """One order of a bulk import; replayed orders keep their original timestamp and number."""
+    created_at = serializers.DateTimeField(required=False)
+    order_number = serializers.CharField(required=False, max_length=64)
+
+
+def fetch_order_products(product_ids):
+    """Products referenced by an order (or a batch of orders) keyed by id string, in one $in query."""
+    object_ids = parse_object_ids(product_ids)
+    return {str(product.id): product for product in PCPart.objects(id__in=object_ids).only('id', 'price')}
+
+class RawOrderSerializer:
+    """
+    Read-only counterpart of OrderSerializer for raw order documents, used by the async order
+    listing. ``user`` is the owner of every order, so it is serialized once instead of dereferenced.
+    ``products`` are the summaries embedded with ?expand=product, keyed by id.
+    """
+    _datetime = serializers.DateTimeField()
+
+    def __init__(self, instance, user, many=False, products=None):
+        self.instance = instance
+        self.user = UserSerializer(user).data
+        self.many = many
+        self.products = products
+
+    def to_representation(self, doc):
+        return {
+            'id': str(doc['_id']),
+            'order_number': _raw_str(doc.get('order_number')),
+            'user': self.user,
+            'items': [self._item(item) for item in doc.get('items', [])],
+            'subtotal': _raw_float(doc.get('subtotal')),
+            'shipping_cost': _raw_float(doc.get('shipping_cost')),
+            'taxes': _raw_float(doc.get('taxes')),
+            'total_amount': _raw_float(doc.get('total_amount')),
+            'created_at': self._raw_datetime(doc.get('created_at')),
+            'updated_at': self._raw_datetime(doc.get('updated_at')),
+        }
+
+    def _item(self, item):
+        data = {'product_id': _raw_str(_reference_id(item.get('product'))), 'quantity': item.get('quantity')}
+        if self.products is not None:
+            data['product'] = self.products.get(data['product_id'])
+        return data
+
+    def _raw_datetime(self, value):
+        return None if value is None else self._datetime.to_representation(value)
+
+    @property
+    @timed('serialize')
+    def data(self):
+        if self.many:
+            return [self.to_representation(doc) for doc in self.instance]
+        return self.to_representation(self.instance)
+
+
+def _raw_float(value):
+    return None if value is None else float(value)
+
+
+def _reference_id(value):
+    """ReferenceFields are stored as ObjectIds, or as DBRefs when declared with dbref=True."""
+    return getattr(value, 'id', value)
+
+
+def order_product_ids(orders):
+    """Ids of every product referenced by ``orders``, read without dereferencing them."""
+    return list({_reference_id(item._data.get('product')) for order in orders for item in order.items})
+
+
+def raw_order_product_ids(docs):
+    """``order_product_ids`` for raw order documents."""
+    return list({_reference_id(item.get('product')) for doc in docs for item in doc.get('items', [])})
@@ -0,0 +1,150 @@
+import logging
+import math
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .cache import catalog_version
+from .indexes import LazyIndex, catalog_changed_or_expired
+from .specs import SPEC_FIELDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = getattr(settings, 'SIMILAR_PARTS_MAX_LIMIT', 50)
+INDEX_TTL = getattr(settings, 'SIMILAR_INDEX_TTL', 300)
+
+NUMERIC_FIELDS = [name for name, field in SPEC_FIELDS.items() if field[1] == 'number']
+TEXT_FIELDS = [name for name, field in SPEC_FIELDS.items() if field[1] == 'text']
+# a differing socket/memory type/form factor weighs as much as this many standard deviations
+TEXT_WEIGHT = 1.0
+SIMILAR_PROJECTION = ['type', 'price', 'spec_values']
+
+
+def _type_key(doc):
+    return (doc.get('type') or '').strip().upper()
+
+
+class TypeVectors:
+    """
+    The parts of one type as rows of z-scored numeric specs (plus log price) and one-hot
+    text specs. Specs missing on a part sit at the type's mean, so they neither attract nor repel.
+    """
+
+    def __init__(self, docs):
+        self.ids = [str(doc['_id']) for doc in docs]
+        raw = np.array([self._numbers(doc) for doc in docs], dtype=float).reshape(len(docs), -1)
+        present = ~np.isnan(raw)
+        self.numeric = np.flatnonzero(present.any(axis=0))
+        raw = raw[:, self.numeric]
+        counts = present[:, self.numeric].sum(axis=0)
+        self.mean = np.where(present[:, self.numeric], raw, 0).sum(axis=0) / counts
+        filled = np.where(np.isnan(raw), self.mean, raw)
+        std = filled.std(axis=0)
+        self.std = np.where(std > 0, std, 1)
+
+        self.vocabulary = {}
+        for doc in docs:
+            values = doc.get('spec_values') or {}
+            for name in TEXT_FIELDS:
+                if values.get(name):
+                    self.vocabulary.setdefault((name, values[name]), len(self.vocabulary))
+
+        self.matrix = np.hstack([(filled - self.mean) / self.std, self._one_hot(docs)])
+        self.rows = {part_id: row for row, part_id in enumerate(self.ids)}
+
+    @staticmethod
+    def _numbers(doc):
+        values = doc.get('spec_values') or {}
+        numbers = [values.get(name) if isinstance(values.get(name), (int, float)) else np.nan for name in NUMERIC_FIELDS]
+        price = float(doc.get('price') or 0)
+        return numbers + [math.log1p(price) if price > 0 else np.nan]
+
+    def _one_hot(self, docs):
+        encoded = np.zeros((len(docs), len(self.vocabulary)))
+        for row, doc in enumerate(docs):
+            values = doc.get('spec_values') or {}
+            for name in TEXT_FIELDS:
+                column = self.vocabulary.get((name, values.get(name)))
+                if column is not None:
+                    encoded[row, column] = TEXT_WEIGHT
+        return encoded
+
+    def vector(self, doc):
+        """Encodes a part that is not in the index (added since it was built) with this type's scaling."""
+        raw = np.array(self._numbers(doc), dtype=float)[self.numeric]
+        numeric = (np.where(np.isnan(raw), self.mean, raw) - self.mean) / self.std
+        return np.concatenate([numeric, self._one_hot([doc])[0]])
+
+    def nearest(self, vector, limit, exclude=None):
+        """
+        The ``limit`` rows closest to ``vector`` as [(part id, distance)]. A brute-force scan over
+        every part of the type; types hold a few thousand parts at most and the one-hot columns
+        make the vectors too wide for a KD-tree to prune much.
+        """
+        distances = np.sqrt(((self.matrix - vector) ** 2).sum(axis=1))
+        if exclude is not None and exclude in self.rows:
+            distances[self.rows[exclude]] = np.inf
+        limit = min(limit, int(np.isfinite(distances).sum()))
+        if limit <= 0:
+            return []
+        rows = np.argpartition(distances, limit - 1)[:limit]
+        rows = rows[np.argsort(distances[rows], kind='stable')]
+        return [(self.ids[row], float(distances[row])) for row in rows]
+
+
+class SimilarityIndex:
+    """Per-type spec vectors for every catalog part, tagged with the catalog version it was read at."""
+
+    def __init__(self, docs, version):
+        by_type = {}
+        for doc in docs:
+            by_type.setdefault(_type_key(doc), []).append(doc)
+        self.types = {part_type: TypeVectors(type_docs) for part_type, type_docs in by_type.items()}
+        self.part_types = {part_id: part_type for part_type, vectors in self.types.items() for part_id in vectors.ids}
+        self.version = version
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return sum(len(vectors.ids) for vectors in self.types.values())
+
+    def __contains__(self, part_id):
+        return str(part_id) in self.part_types
+
+    def similar(self, part_id, limit=DEFAULT_LIMIT, doc=None):
+        """
+        [(part id, distance)] of the parts of the same type closest to ``part_id``, nearest first.
+        Parts added since the index was built need their raw ``doc`` (see SIMILAR_PROJECTION).
+        """
+        part_id = str(part_id)
+        part_type = self.part_types.get(part_id) or (_type_key(doc) if doc else None)
+        vectors = self.types.get(part_type)
+        if vectors is None:
+            return []
+        row = vectors.rows.get(part_id)
+        vector = vectors.matrix[row] if row is not None else vectors.vector(doc)
+        return vectors.nearest(vector, limit, exclude=part_id)
+
+
+def build_index():
+    from .models import PCPart
+
+    started = time.monotonic()
+    version = catalog_version()
+    index = SimilarityIndex(list(PCPart.objects.only(*SIMILAR_PROJECTION).as_pymongo()), version)
+    logger.info(f"Built similarity index over {len(index)} parts in {time.monotonic() - started:.3f}s")
+    return index
+
+
+# rebuilt when this process bumps the catalog version, and after SIMILAR_INDEX_TTL seconds to pick
+# up writes made by other workers
+_index = LazyIndex('similarity index', build_index, catalog_changed_or_expired(INDEX_TTL))
+
+
+def get_index():
+    return _index.get()
+
+
+def reset_index():
+    _index.reset()
@@ -0,0 +1,390 @@
+"""
+In-memory columnar snapshot of the catalog, answering ``get_parts`` without a database round trip.
+
+Every part is one row of NumPy columns (price, type and manufacturer codes, one column per
+parsed spec) next to its raw document, and the rows are pre-sorted once per sort order. A
+request becomes a boolean mask over the columns, a gather through the sort permutation and a
+slice, so filtering and paging cost well under a millisecond at catalog sizes that fit in RAM.
+
+The snapshot is rebuilt incrementally. Where the server supports change streams (replica sets)
+a background thread applies the changed documents as they arrive; otherwise it polls the
+``catalog_meta`` revision counter that every PCPart write bumps and re-reads only the parts
+stamped with a newer revision (bulk imports ask for a full reload instead). Both produce a new snapshot and swap it in, so requests never see a half-applied
+change.
+"""
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from bson import Decimal128
+from django.conf import settings
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure, PyMongoError
+
+from .filters import KEY_FIELDS, part_filters, search_ids
+from .indexes import register_reset
+from .specs import SPEC_FIELDS, catalog_key
+
+logger = logging.getLogger(__name__)
+
+ENABLED = getattr(settings, 'CATALOG_SNAPSHOT', False)
+POLL_SECONDS = getattr(settings, 'CATALOG_SNAPSHOT_POLL_SECONDS', 5)
+CHANGE_STREAMS = getattr(settings, 'CATALOG_SNAPSHOT_CHANGE_STREAMS', True)
+
+META_COLLECTION = 'catalog_meta'
+SNAPSHOT_PROJECTION = [
+    'name', 'manufacturer', 'type', 'price', 'url', 'specs', 'description',
+    'type_key', 'manufacturer_key', 'spec_values',
+]
+NUMERIC_FIELDS = [name for name, field in SPEC_FIELDS.items() if field[1] == 'number']
+TEXT_FIELDS = [name for name, field in SPEC_FIELDS.items() if field[1] == 'text']
+# columns holding codes into a vocabulary, by the document field they encode
+CODED_FIELDS = ['type_key', 'manufacturer_key'] + [f'spec_values__{name}' for name in TEXT_FIELDS]
+COMPARISONS = {'gte': np.greater_equal, 'lte': np.less_equal, 'gt': np.greater, 'lt': np.less}
+# change stream events applied per new snapshot
+CHANGE_BATCH = 1000
+
+
+def _meta():
+    from .models import PCPart
+
+    return PCPart._get_db()[META_COLLECTION]
+
+
+def next_revision(reload=False):
+    """
+    Bumps and returns the catalog revision. PCPart writers stamp the parts they write with it;
+    bulk writers that cannot tell which parts they changed pass ``reload`` so polling snapshots
+    rebuild instead. Returns None without a round trip when CATALOG_SNAPSHOT is off: nothing
+    polls the revisions then, and a snapshot enabled later starts from a full load.
+    """
+    if not ENABLED:
+        return None
+    doc = _meta().find_one_and_update(
+        {'_id': 'products'}, {'$inc': {'revision': 1}}, upsert=True, return_document=ReturnDocument.AFTER,
+    )
+    if reload:
+        _meta().update_one({'_id': 'products'}, {'$max': {'reload': doc['revision']}})
+    return doc['revision']
+
+
+def catalog_revision():
+    """(current revision, revision of the last bulk write that requires a full reload)."""
+    doc = _meta().find_one({'_id': 'products'}) or {}
+    return doc.get('revision', 0), doc.get('reload', 0)
+
+
+def _spec(doc, name):
+    return (doc.get('spec_values') or {}).get(name)
+
+
+def _field_value(doc, field):
+    if field.startswith('spec_values__'):
+        return _spec(doc, field[len('spec_values__'):])
+    if field in KEY_FIELDS and doc.get(field) is None:
+        # not backfilled yet (see the parse_specs command)
+        return catalog_key(doc.get(KEY_FIELDS[field]))
+    return doc.get(field)
+
+
+class CatalogSnapshot:
+    """
+    Column arrays over ``docs``; row i describes ``docs[i]``. Immutable once built: ``apply``
+    returns a new snapshot that re-encodes only the changed rows.
+    """
+
+    def __init__(self, docs, revision, columns=None, vocabularies=None):
+        self.docs = docs
+        self.revision = revision
+        self.rows = {str(doc['_id']): row for row, doc in enumerate(docs)}
+        self.vocabularies = vocabularies if vocabularies is not None else {field: {} for field in CODED_FIELDS}
+        self.columns = columns if columns is not None else _encode(docs, self.vocabularies)
+        # every sort is (key, _id) ascending; descending pages walk the same order backwards
+        self.sort_keys = {
+            'price': np.where(np.isnan(self.columns['price']), -np.inf, self.columns['price']),
+            'name': self.columns['name'],
+        }
+        self.orders = {key: np.lexsort((self.columns['_id'], values)) for key, values in self.sort_keys.items()}
+        self.orders['id'] = np.argsort(self.columns['_id'], kind='stable')
+
+    def __len__(self):
+        return len(self.docs)
+
+    def get(self, part_id):
+        row = self.rows.get(str(part_id))
+        return None if row is None else self.docs[row]
+
+    def mask(self, params):
+        """Rows matching the ``get_parts`` filters in ``params``, as a boolean array."""
+        mask = np.ones(len(self.docs), dtype=bool)
+        filters = part_filters(params)
+        for lookup, value in filters.items():
+            field, _, operator = lookup.rpartition('__')
+            if operator not in COMPARISONS:
+                field, operator = lookup, None
+            column = self.columns[field]
+            if field in self.vocabularies:
+                # a value no part has gets a code no row has
+                mask &= column == self.vocabularies[field].get(value, -2)
+            elif operator:
+                mask &= COMPARISONS[operator](column, value)
+            else:
+                mask &= column == value
+        search = params.get('search')
+        if search:
+            matched = np.zeros(len(self.docs), dtype=bool)
+            matched[[self.rows[part_id] for part_id in search_ids(params, bool(filters)) if part_id in self.rows]] = True
+            mask &= matched
+        return mask
+
+    def select(self, params, plan):
+        """The documents ``paginate_parts`` would fetch for ``params`` under ``plan``, in order."""
+        mask = self.mask(params)
+        if plan.ordering is None:
+            rows = np.flatnonzero(mask)
+        else:
+            order = self.orders[plan.sort]
+            if plan.after is not None:
+                order = self._after(plan, order)
+            elif plan.direction == -1:
+                order = order[::-1]
+            rows = order[mask[order]]
+        if plan.limit:
+            rows = rows[:plan.limit]
+        return [self.docs[row] for row in rows]
+
+    def _after(self, plan, order):
+        """The part of ``order`` strictly after the plan's cursor, walked in the plan's direction."""
+        value, last_id = plan.after
+        ids = self.columns['_id'][order]
+        low, high = 0, len(order)
+        if plan.sort != 'id':
+            keys = self.sort_keys[plan.sort][order]
+            if plan.sort == 'price':
+                value = -np.inf if value is None else float(value)
+            low, high = np.searchsorted(keys, value, 'left'), np.searchsorted(keys, value, 'right')
+        side = 'right' if plan.direction == 1 else 'left'
+        position = low + np.searchsorted(ids[low:high], np.bytes_(last_id.binary), side)
+        return order[position:] if plan.direction == 1 else order[:position][::-1]
+
+    def apply(self, upserts, deleted_ids, revision):
+        """A new snapshot with ``upserts`` (raw documents) written and ``deleted_ids`` removed."""
+        docs = list(self.docs)
+        columns = {field: column.copy() for field, column in self.columns.items()}
+        vocabularies = {field: dict(codes) for field, codes in self.vocabularies.items()}
+
+        updated, added = {}, {}
+        for doc in upserts:
+            part_id = str(doc['_id'])
+            if part_id in self.rows:
+                updated[self.rows[part_id]] = doc
+            else:
+                added[part_id] = doc
+        if updated:
+            rows = list(updated)
+            for field, values in _encode([updated[row] for row in rows], vocabularies).items():
+                # a longer name widens the fixed-width string column instead of being truncated
+                columns[field] = columns[field].astype(np.result_type(columns[field], values), copy=False)
+                columns[field][rows] = values
+            for row, doc in updated.items():
+                docs[row] = doc
+        if added:
+            for field, values in _encode(list(added.values()), vocabularies).items():
+                columns[field] = np.concatenate([columns[field], values])
+            docs.extend(added.values())
+
+        gone = {str(part_id) for part_id in deleted_ids} - {str(doc['_id']) for doc in upserts}
+        gone_rows = [self.rows[part_id] for part_id in gone if part_id in self.rows]
+        if gone_rows:
+            keep = np.ones(len(docs), dtype=bool)
+            keep[gone_rows] = False
+            columns = {field: column[keep] for field, column in columns.items()}
+            docs = [doc for doc, kept in zip(docs, keep) if kept]
+        return CatalogSnapshot(docs, revision, columns, vocabularies)
+
+
+def _encode(docs, vocabularies):
+    """Column arrays for ``docs``, adding unseen type, manufacturer and text spec values to ``vocabularies``."""
+    columns = {
+        '_id': np.array([doc['_id'].binary for doc in docs], dtype='S12'),
+        'name': np.array([doc.get('name') or '' for doc in docs], dtype=str),
+        'price': np.array([_number(doc.get('price')) for doc in docs], dtype=float),
+    }
+    for name in NUMERIC_FIELDS:
+        columns[f'spec_values__{name}'] = np.array([_number(_spec(doc, name)) for doc in docs], dtype=float)
+    for field in CODED_FIELDS:
+        codes = vocabularies[field]
+        values = (_field_value(doc, field) for doc in docs)
+        columns[field] = np.array(
+            [-1 if value is None else codes.setdefault(value, len(codes)) for value in values], dtype=np.int32,
+        )
+    return columns
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float, Decimal128)):
+        return np.nan
+    return float(value.to_decimal()) if isinstance(value, Decimal128) else float(value)
+
+
+def _fetch(query=None):
+    from .models import PCPart
+
+    return list(PCPart._get_collection().find(query or {}, {field: True for field in SNAPSHOT_PROJECTION}))
+
+
+def build_snapshot():
+    started = time.monotonic()
+    revision, _ = catalog_revision()
+    snapshot = CatalogSnapshot(_fetch(), revision)
+    logger.info(f"Built catalog snapshot of {len(snapshot)} parts in {time.monotonic() - started:.3f}s")
+    return snapshot
+
+
+def poll(snapshot, since=None):
+    """
+    ``snapshot`` brought up to the stored revision: parts stamped after ``since`` (default: the
+    snapshot's revision) are re-read, and deleted parts are dropped when the part count shows
+    some are gone. Returns ``snapshot`` itself when nothing changed.
+    """
+    from .models import PCPart
+
+    revision, reload = catalog_revision()
+    since = snapshot.revision if since is None else since
+    if revision == snapshot.revision == since:
+        return snapshot
+    if reload > snapshot.revision:
+        return build_snapshot()
+    upserts = [doc for doc in _fetch({'revision': {'$gt': since}}) if snapshot.get(doc['_id']) != doc]
+    deleted = []
+    if revision != snapshot.revision:
+        collection = PCPart._get_collection()
+        if len(snapshot.rows.keys() | {str(doc['_id']) for doc in upserts}) != collection.count_documents({}):
+            stored = {str(doc['_id']) for doc in collection.find({}, {'_id': True})}
+            deleted = [part_id for part_id in snapshot.rows if part_id not in stored]
+    if not upserts and not deleted and revision == snapshot.revision:
+        return snapshot
+    return snapshot.apply(upserts, deleted, revision)
+
+
+_snapshot = None
+_lock = threading.Lock()
+# bumped by reset_snapshot so a refresh thread of a discarded snapshot stops
+_generation = 0
+_refresher_pid = None
+
+
+def _swap(generation, expected, snapshot):
+    """Installs ``snapshot`` unless the snapshot was reset or replaced since ``expected`` was read."""
+    global _snapshot
+    with _lock:
+        if generation != _generation or _snapshot is not expected:
+            return False
+        _snapshot = snapshot
+        return True
+
+
+def _watch(generation):
+    """
+    Applies change stream events in batches until the snapshot is reset. Returns False right
+    away when the deployment has no change streams (standalone servers).
+    """
+    from .models import PCPart
+
+    try:
+        stream = PCPart._get_collection().watch(full_document='updateLookup', max_await_time_ms=1000)
+    except (NotImplementedError, OperationFailure) as e:
+        logger.info(f"Catalog snapshot falls back to polling; change streams are unavailable: {e}")
+        return False
+    with stream:
+        # catch up on whatever was written between the build and the stream opening
+        snapshot = _snapshot
+        if snapshot is None or not _swap(generation, snapshot, poll(snapshot, since=snapshot.revision - 1)):
+            return True
+        upserts, deleted = [], []
+        while generation == _generation:
+            change = stream.try_next()
+            if change is not None:
+                operation = change['operationType']
+                if operation in ('insert', 'update', 'replace') and change.get('fullDocument'):
+                    document = change['fullDocument']
+                    upserts.append({key: document[key] for key in ['_id', *SNAPSHOT_PROJECTION] if key in document})
+                elif operation == 'delete':
+                    deleted.append(change['documentKey']['_id'])
+                elif operation in ('drop', 'rename', 'dropDatabase', 'invalidate'):
+                    _swap(generation, _snapshot, build_snapshot())
+                    return True
+            if (upserts or deleted) and (change is None or len(upserts) + len(deleted) >= CHANGE_BATCH):
+                snapshot = _snapshot
+                _swap(generation, snapshot, snapshot.apply(upserts, deleted, snapshot.revision))
+                upserts, deleted = [], []
+    return True
+
+
+def _poll_forever(generation):
+    since = None
+    while generation == _generation:
+        snapshot = _snapshot
+        if snapshot is None:
+            return
+        # parts stamped by writes that were still in flight during the last poll are read again
+        _swap(generation, snapshot, poll(snapshot, since=since))
+        since = snapshot.revision
+        time.sleep(POLL_SECONDS)
+
+
+def _refresh(generation):
+    while generation == _generation:
+        try:
+            if not (CHANGE_STREAMS and _watch(generation)):
+                _poll_forever(generation)
+        except PyMongoError as e:
+            logger.error(f"Error refreshing catalog snapshot: {e}", exc_info=True)
+            time.sleep(POLL_SECONDS)
+
+
+def get_snapshot():
+    """
+    The process-wide snapshot, built on first use, or None when CATALOG_SNAPSHOT is off. Each
+    process (forked workers included) starts its own refresh thread unless
+    CATALOG_SNAPSHOT_POLL_SECONDS is 0.
+    """
+    global _snapshot, _refresher_pid
+    if not ENABLED:
+        return None
+    snapshot = _snapshot
+    if snapshot is not None and (not POLL_SECONDS or _refresher_pid == os.getpid()):
+        return snapshot
+    with _lock:
+        if _snapshot is None:
+            _snapshot = build_snapshot()
+        if POLL_SECONDS and _refresher_pid != os.getpid():
+            _refresher_pid = os.getpid()
+            threading.Thread(target=_refresh, args=(_generation,), daemon=True).start()
+        return _snapshot
+
+
+def current_snapshot():
+    """The snapshot if this process already built it; never blocks, for the async views."""
+    return _snapshot if ENABLED and _refresher_pid in (None, os.getpid()) else None
+
+
+def refresh_snapshot():
+    """Applies the changes stored since the snapshot's revision now instead of on the next poll."""
+    snapshot = _snapshot
+    if snapshot is not None:
+        _swap(_generation, snapshot, poll(snapshot))
+    return _snapshot
+
+
+def reset_snapshot():
+    global _snapshot, _generation, _refresher_pid
+    with _lock:
+        _snapshot = None
+        _generation += 1
+        _refresher_pid = None
+
+
+register_reset(reset_snapshot)
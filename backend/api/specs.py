@@ -0,0 +1,127 @@
+import re
+
+# Filterable spec fields: query name -> (spec keys as scraped, kind, canonical unit, indexed)
+SPEC_FIELDS = {
+    'cores': (('Cores', 'Core Count'), 'number', None, True),
+    'threads': (('Threads', 'Thread Count'), 'number', None, False),
+    'base_clock': (('Base Clock', 'Core Clock', 'Performance Core Clock'), 'number', 'GHz', False),
+    'boost_clock': (('Boost Clock', 'Performance Core Boost Clock'), 'number', 'GHz', True),
+    'tdp': (('TDP',), 'number', 'W', True),
+    'wattage': (('Wattage',), 'number', 'W', True),
+    'memory': (('Memory',), 'number', 'GB', True),
+    # storage drives; kept apart from memory so memory filters and facets only see GPU/RAM sizes
+    'capacity': (('Capacity',), 'number', 'GB', False),
+    'socket': (('Socket', 'Socket / CPU'), 'text', None, True),
+    'memory_type': (('Memory Type',), 'text', None, False),
+    'form_factor': (('Form Factor',), 'text', None, False),
+}
+
+INDEXED_SPEC_FIELDS = [name for name, field in SPEC_FIELDS.items() if field[3]]
+
+# spec key as scraped -> query name
+SPEC_KEY_NAMES = {key: name for name, field in SPEC_FIELDS.items() for key in field[0]}
+
+# unit as written -> (canonical unit, multiplier)
+UNIT_CONVERSIONS = {
+    'ghz': ('GHz', 1),
+    'mhz': ('GHz', 0.001),
+    'w': ('W', 1),
+    'kw': ('W', 1000),
+    'gb': ('GB', 1),
+    'tb': ('GB', 1024),
+    'mb': ('GB', 1 / 1024),
+}
+
+RANGE_OPERATORS = ('gte', 'lte', 'gt', 'lt')
+
+_QUANTITY_RE = re.compile(r'(?:(\d+)\s*x\s*)?(\d+(?:\.\d+)?)\s*([a-zA-Z]+)?')
+
+
+def _as_number(value):
+    value = round(value, 4)
+    return int(value) if float(value).is_integer() else value
+
+
+def parse_quantity(raw):
+    """Parses strings like "65 W", "3.8 GHz" or "2 x 16GB" into (number, unit)."""
+    if raw is None:
+        return None, None
+    if isinstance(raw, (int, float)):
+        return _as_number(raw), None
+    match = _QUANTITY_RE.search(str(raw).replace(',', ''))
+    if not match:
+        return None, None
+    count, amount, unit = match.groups()
+    value = float(amount) * (int(count) if count else 1)
+    if unit and unit.lower() in UNIT_CONVERSIONS:
+        unit, multiplier = UNIT_CONVERSIONS[unit.lower()]
+        value *= multiplier
+    return _as_number(value), unit
+
+
+def normalize_text(raw):
+    """Lowercases and strips separators so "LGA 1700" and "lga1700" compare equal."""
+    return re.sub(r'[\s\-_]+', '', str(raw).lower())
+
+
+def catalog_key(raw):
+    """Case-folded type/manufacturer stored in the indexed ``*_key`` fields, so equality lookups can use them."""
+    return (raw or '').strip().lower()
+
+
+def parse_specs(specs):
+    """Returns (values, units) for every known spec field present in ``specs``."""
+    values = {}
+    units = {}
+    for name, (keys, kind, unit, _) in SPEC_FIELDS.items():
+        raw = next((specs[key] for key in keys if specs.get(key) not in (None, '')), None)
+        if raw is None:
+            continue
+        if kind == 'text':
+            values[name] = normalize_text(raw)
+            continue
+        value, parsed_unit = parse_quantity(raw)
+        if value is None:
+            continue
+        if unit and parsed_unit and parsed_unit != unit:
+            continue
+        values[name] = value
+        if unit:
+            units[name] = unit
+    return values, units
+
+
+def spec_number(specs, spec_values, key):
+    """Numeric value of a spec by its scraped key ("TDP", "Wattage"), preferring the pre-parsed value; 0 if unknown."""
+    value = (spec_values or {}).get(SPEC_KEY_NAMES.get(key))
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        value, _ = parse_quantity((specs or {}).get(key))
+        return value or 0
+    except Exception:
+        return 0
+
+
+def spec_filters(params):
+    """Builds mongoengine filter kwargs from params such as ``cores__gte=8`` or ``socket=AM5``."""
+    filters = {}
+    invalid = []
+    for param, raw in params.items():
+        name, _, operator = param.partition('__')
+        if name not in SPEC_FIELDS or (operator and operator not in RANGE_OPERATORS):
+            continue
+        if SPEC_FIELDS[name][1] == 'text':
+            if operator:
+                invalid.append(param)
+                continue
+            filters[f'spec_values__{name}'] = normalize_text(raw)
+            continue
+        try:
+            value = float(raw)
+        except (TypeError, ValueError):
+            invalid.append(param)
+            continue
+        lookup = f'spec_values__{name}__{operator}' if operator else f'spec_values__{name}'
+        filters[lookup] = _as_number(value)
+    return filters, invalid
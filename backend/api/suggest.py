@@ -0,0 +1,211 @@
+import bisect
+import logging
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .indexes import LazyIndex, expired
+from .search import tokenize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = getattr(settings, 'SUGGEST_MAX_LIMIT', 20)
+INDEX_TTL = getattr(settings, 'SUGGEST_INDEX_TTL', 300)
+MAX_CACHED_PREFIXES = 4096
+# overlay entries plus masked parts written since the key arrays were built, before they are rebuilt
+MAX_OVERLAY = 1024
+# candidates taken per wanted suggestion before de-duplicating parts matched by several keys
+CANDIDATE_FACTOR = 4
+
+
+def display_name(name, manufacturer):
+    """The name shown in suggestions, e.g. "Corsair RM850x"; a manufacturer the name starts with is not repeated."""
+    name, manufacturer = (name or '').strip(), (manufacturer or '').strip()
+    if not manufacturer or name.lower().startswith(manufacturer.lower()):
+        return name
+    return f'{manufacturer} {name}'
+
+
+def prefix_keys(name, manufacturer):
+    """
+    The normalized strings a part is found under: its name from every word on ("rtx 4070"
+    matches "GeForce RTX 4070") and its manufacturer followed by its name.
+    """
+    words = tokenize(name)
+    keys = {' '.join(words[i:]) for i in range(len(words))}
+    keys.add(' '.join(tokenize(manufacturer) + words))
+    keys.discard('')
+    return keys
+
+
+class SuggestIndex:
+    """
+    Sorted array of prefix keys, each pointing at a part, so the parts matching a typed prefix
+    are one contiguous range found with two binary searches. Within the range parts are ranked
+    by how many orders they appear in, then by key order (shorter and alphabetically first).
+
+    Parts saved or deleted after the arrays were built go to a small sorted overlay and their
+    array entries are masked, both merged in at query time, so a write never copies the arrays.
+    The overlay is folded into the arrays once it reaches MAX_OVERLAY entries, and is dropped
+    with the whole index when it is rebuilt after SUGGEST_INDEX_TTL.
+    """
+
+    def __init__(self, popularity=None):
+        self._lock = threading.RLock()
+        self._popularity = popularity or {}    # part_id -> order count
+        self._names = {}                       # part_id -> display name
+        self._part_keys = {}                   # part_id -> set of keys
+        self._keys = np.array([], dtype=str)
+        self._key_parts = np.array([], dtype=object)
+        self._key_scores = np.array([], dtype=np.int64)
+        self._overlay = []                     # sorted (key, part_id) of parts changed since the arrays were built
+        self._masked = set()                   # parts whose entries in the arrays are outdated
+        self._results = {}
+        self.built_at = 0.0
+
+    def __len__(self):
+        return len(self._names)
+
+    def load(self, docs):
+        """Indexes raw ``docs`` (``_id``, ``name``, ``manufacturer``) in one pass."""
+        with self._lock:
+            for doc in docs:
+                part_id = str(doc['_id'])
+                self._names[part_id] = display_name(doc.get('name'), doc.get('manufacturer'))
+                self._part_keys[part_id] = prefix_keys(doc.get('name'), doc.get('manufacturer'))
+            self._compact()
+
+    def add(self, part_id, name, manufacturer):
+        part_id = str(part_id)
+        keys = prefix_keys(name, manufacturer)
+        with self._lock:
+            self._names[part_id] = display_name(name, manufacturer)
+            if keys != self._part_keys.get(part_id):
+                self._unlink(part_id)
+                self._part_keys[part_id] = keys
+                for key in keys:
+                    bisect.insort(self._overlay, (key, part_id))
+                self._compact_if_full()
+            self._results.clear()
+
+    def remove(self, part_id):
+        part_id = str(part_id)
+        with self._lock:
+            if self._names.pop(part_id, None) is not None:
+                self._unlink(part_id)
+                self._part_keys.pop(part_id, None)
+                self._compact_if_full()
+                self._results.clear()
+
+    def _unlink(self, part_id):
+        """Masks the array entries of one part and takes its current keys out of the overlay."""
+        self._masked.add(part_id)
+        for key in self._part_keys.get(part_id, ()):
+            position = bisect.bisect_left(self._overlay, (key, part_id))
+            if position < len(self._overlay) and self._overlay[position] == (key, part_id):
+                del self._overlay[position]
+
+    def _compact_if_full(self):
+        if len(self._overlay) + len(self._masked) >= MAX_OVERLAY:
+            self._compact()
+
+    def _compact(self):
+        entries = [(key, part_id) for part_id, keys in self._part_keys.items() for key in keys]
+        entries.sort()
+        self._keys = np.array([key for key, _ in entries], dtype=str)
+        self._key_parts = np.array([part_id for _, part_id in entries], dtype=object)
+        self._key_scores = np.array([self._popularity.get(part_id, 0) for _, part_id in entries], dtype=np.int64)
+        self._overlay = []
+        self._masked = set()
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        """[(part_id, display name)] for parts with a key starting with ``query``, most ordered first."""
+        prefix = ' '.join(tokenize(query))
+        if not prefix:
+            return []
+        with self._lock:
+            key = (prefix, limit)
+            if key in self._results:
+                return self._results[key]
+            low = np.searchsorted(self._keys, prefix, 'left')
+            high = np.searchsorted(self._keys, prefix + '\U0010ffff', 'left')
+            ranked = self._top(low, high, limit)
+            # overlay entries in the same order as the arrays: most orders, then key
+            first = bisect.bisect_left(self._overlay, (prefix,))
+            last = bisect.bisect_left(self._overlay, (prefix + '\U0010ffff',))
+            ranked += [(-self._popularity.get(part_id, 0), key, part_id) for key, part_id in self._overlay[first:last]]
+            part_ids = list(dict.fromkeys(part_id for _, _, part_id in sorted(ranked)))
+            results = [(part_id, self._names[part_id]) for part_id in part_ids[:limit]]
+            if len(self._results) >= MAX_CACHED_PREFIXES:
+                self._results.clear()
+            self._results[key] = results
+            return results
+
+    def _top(self, low, high, limit):
+        """(-orders, key, part_id) of the best array entries in ``low:high``, enough to cover ``limit`` live parts."""
+        size = high - low
+        if not size:
+            return []
+        # most orders first, then key order; unique per entry, so the ranking is total
+        priority = -self._key_scores[low:high] * size + np.arange(size)
+        wanted = min(size, limit * CANDIDATE_FACTOR)
+        while True:
+            candidates = np.argpartition(priority, wanted - 1)[:wanted] if wanted < size else np.arange(size)
+            rows = low + candidates[np.argsort(priority[candidates])]
+            ranked = [
+                (-score, key, part_id)
+                for score, key, part_id in zip(
+                    self._key_scores[rows].tolist(), self._keys[rows].tolist(), self._key_parts[rows].tolist()
+                )
+                if part_id not in self._masked
+            ]
+            if len({part_id for _, _, part_id in ranked}) >= limit or wanted >= size:
+                return ranked
+            wanted = min(size, wanted * 2)
+
+
+def order_counts():
+    """part_id -> number of order lines naming the part."""
+    from .models import Order
+
+    pipeline = [
+        {'$unwind': '$items'},
+        {'$group': {'_id': '$items.product', 'orders': {'$sum': 1}}},
+    ]
+    return {str(row['_id']): row['orders'] for row in Order._get_collection().aggregate(pipeline)}
+
+
+def build_index():
+    from .models import PCPart
+
+    started = time.monotonic()
+    index = SuggestIndex(order_counts())
+    index.load(PCPart.objects.only('id', 'name', 'manufacturer').as_pymongo())
+    index.built_at = time.monotonic()
+    logger.info(f"Built suggest index over {len(index)} parts in {index.built_at - started:.3f}s")
+    return index
+
+
+# parts saved in this process are applied directly; rebuilt after SUGGEST_INDEX_TTL seconds to
+# refresh the order counts and pick up writes made by other workers
+_index = LazyIndex('suggest index', build_index, expired(INDEX_TTL))
+
+
+def get_index():
+    return _index.get()
+
+
+def reset_index():
+    _index.reset()
+
+
+def index_part(part):
+    part_id, name, manufacturer = part.id, part.name, part.manufacturer
+    _index.update(lambda index: index.add(part_id, name, manufacturer))
+
+
+def unindex_part(part_id):
+    _index.update(lambda index: index.remove(part_id))
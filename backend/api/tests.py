@@ -1,3 +1,1463 @@
-from django.test import TestCase
+import base64
+import datetime
+import io
+import json
+import math
+import os
+import tempfile
+import unittest
+from unittest import mock
 
-# Create your tests here.
+import jwt
+import mongoengine
+from bson import ObjectId
+from asgiref.sync import async_to_sync
+from pymongo import monitoring
+from pymongo.hello import Hello
+from pymongo.read_preferences import Nearest, Primary, SecondaryPreferred
+from pymongo.server_description import ServerDescription
+from pymongo.settings import TopologySettings
+from pymongo.topology_description import TOPOLOGY_TYPE, TopologyDescription
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.test import Client, RequestFactory, SimpleTestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from werkzeug.security import generate_password_hash
+
+from . import async_views, views
+from .async_db import set_client_factory
+from .cache import cache_timeout, catalog_version, get_cache
+from . import compatibility, db, filters, instrumentation, pagination, passwords, search, similar, snapshot, suggest
+from .compatibility import check_compatibility, get_rule_table
+from .fixtures import SAMPLE_PARTS, connect_in_memory, insert_parts, synthetic_parts
+from .indexes import reset_indexes
+from .instrumentation import CommandTimingListener, RequestTimings, render_metrics, reset_metrics
+from .models import Order, OrderItem, PCPart, User
+from .passwords import current_method_prefix, needs_rehash
+from .permissions import IsAuthenticatedCustom
+from .serializers import PCPartSerializer, RawPCPartSerializer
+from .specs import normalize_text, parse_quantity, parse_specs
+from .user_cache import UserCache, user_cache
+
+
+class MongoTestCase(SimpleTestCase):
+    """Runs against an in-memory mongomock database seeded with the shared fixture catalog."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        connect_in_memory()
+        for fields in SAMPLE_PARTS:
+            PCPart(**fields).save()
+        insert_parts(synthetic_parts(60))
+
+    @classmethod
+    def tearDownClass(cls):
+        mongoengine.disconnect()
+        super().tearDownClass()
+
+    def setUp(self):
+        get_cache().clear()
+
+
+class AsyncClientStandIn:
+    """
+    The subset of motor's client API used by the async views, backed by a synchronous client
+    such as the mongomock one from ``connect_in_memory``, so the async paths run in-memory.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getitem__(self, name):
+        return _AsyncDatabase(self._client[name])
+
+
+class _AsyncDatabase:
+    def __init__(self, database):
+        self._database = database
+
+    def __getitem__(self, name):
+        return _AsyncCollection(self._database[name])
+
+
+class _AsyncCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def find(self, *args, **kwargs):
+        return _AsyncCursor(self._collection.find(*args, **kwargs))
+
+    async def find_one(self, *args, **kwargs):
+        return self._collection.find_one(*args, **kwargs)
+
+    async def count_documents(self, *args, **kwargs):
+        return self._collection.count_documents(*args, **kwargs)
+
+    def with_options(self, **kwargs):
+        return _AsyncCollection(self._collection.with_options(**kwargs))
+
+
+class _AsyncCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, skip):
+        self._cursor = self._cursor.skip(skip)
+        return self
+
+    def limit(self, limit):
+        self._cursor = self._cursor.limit(limit)
+        return self
+
+    async def to_list(self, length=None):
+        documents = list(self._cursor)
+        return documents if length is None else documents[:length]
+
+
+class SpecParsingTests(SimpleTestCase):
+    def test_parse_quantity(self):
+        cases = {
+            '2 x 16GB': (32, 'GB'),
+            '3500 MHz': (3.5, 'GHz'),
+            '65 W': (65, 'W'),
+            '1,000 W': (1000, 'W'),
+            '2 TB': (2048, 'GB'),
+            '4.7 GHz': (4.7, 'GHz'),
+            '8': (8, None),
+            12: (12, None),
+            'N/A': (None, None),
+            '': (None, None),
+            None: (None, None),
+        }
+        for raw, expected in cases.items():
+            with self.subTest(raw=raw):
+                self.assertEqual(parse_quantity(raw), expected)
+
+    def test_parse_specs(self):
+        values, units = parse_specs({
+            'Core Count': '8', 'Boost Clock': '5000 MHz', 'TDP': '120 W', 'Memory': '2 x 16GB',
+            'Socket': 'AM 5', 'Threads': 'unknown', 'Wattage': '', 'Colour': 'Black',
+        })
+        self.assertEqual(values, {'cores': 8, 'boost_clock': 5, 'tdp': 120, 'memory': 32, 'socket': 'am5'})
+        self.assertEqual(units, {'boost_clock': 'GHz', 'tdp': 'W', 'memory': 'GB'})
+        # a quantity in the wrong unit is dropped rather than misread
+        self.assertEqual(parse_specs({'TDP': '65 GHz', 'Memory': 'lots'}), ({}, {}))
+        # a drive's capacity is not memory
+        self.assertEqual(parse_specs({'Capacity': '2 TB'}), ({'capacity': 2048}, {'capacity': 'GB'}))
+
+
+class RawPCPartSerializerTests(MongoTestCase):
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def test_matches_document_serializer(self):
+        documents = list(PCPart.objects.order_by('id'))
+        raw = list(PCPart.objects.order_by('id').only(*RawPCPartSerializer.fields).as_pymongo())
+
+        self.assertEqual(
+            self.render(RawPCPartSerializer(raw, many=True).data),
+            self.render(PCPartSerializer(documents, many=True).data),
+        )
+
+    def test_views_match_with_and_without_fast_path(self):
+        factory = APIRequestFactory()
+        part_id = str(PCPart.objects.get(name='RM850x').id)
+        requests = [
+            (views.get_parts, '/api/parts/', {}),
+            (views.get_parts, '/api/parts/?type=cpu&sort=-price&page_size=5', {}),
+            (views.get_parts, '/api/parts/?search=corsair', {}),
+            (views.get_part_by_id, f'/api/parts/{part_id}/', {'part_id': part_id}),
+        ]
+        for view, url, kwargs in requests:
+            with self.subTest(url=url):
+                with mock.patch.object(views, 'FAST_PATH', True):
+                    fast = view(factory.get(url), **kwargs)
+                get_cache().clear()
+                with mock.patch.object(views, 'FAST_PATH', False):
+                    slow = view(factory.get(url), **kwargs)
+                self.assertEqual(fast.status_code, 200)
+                self.assertEqual(self.render(fast.data), self.render(slow.data))
+
+
+class SparseFieldsetTests(MongoTestCase):
+    def test_fields_param_narrows_output_on_both_paths(self):
+        factory = APIRequestFactory()
+        part_id = str(PCPart.objects.get(name='NR200P').id)
+        for fast_path in (True, False):
+            get_cache().clear()
+            with self.subTest(fast_path=fast_path), mock.patch.object(views, 'FAST_PATH', fast_path):
+                response = views.get_parts(factory.get('/api/parts/?fields=id,name,price&sort=-price&page_size=3'))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([set(part) for part in response.data['results']], [{'id', 'name', 'price'}] * 3)
+                self.assertIsNotNone(response.data['next_cursor'])
+
+                response = views.get_part_by_id(factory.get(f'/api/parts/{part_id}/?fields=name,type'), part_id=part_id)
+                self.assertEqual(response.data, {'name': 'NR200P', 'type': 'Case'})
+
+    def test_unknown_field_is_rejected(self):
+        response = views.get_parts(APIRequestFactory().get('/api/parts/?fields=name,password_hash'))
+        self.assertEqual(response.status_code, 400)
+
+
+class CursorPaginationTests(MongoTestCase):
+    def get(self, url):
+        get_cache().clear()
+        return views.get_parts(APIRequestFactory().get(url))
+
+    def walk(self, url):
+        """Ids of every page of ``url`` in order, following next_cursor, and the page sizes."""
+        ids, sizes = [], []
+        while url:
+            response = self.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+            ids += [part['id'] for part in response.data['results']]
+            sizes.append(len(response.data['results']))
+            cursor = response.data['next_cursor']
+            url = cursor and f"{url.split('&cursor=')[0]}&cursor={cursor}"
+        return ids, sizes
+
+    def test_pages_cover_the_catalog_once_in_order(self):
+        expected = [str(part.id) for part in PCPart.objects.order_by('+price', '+id')]
+        ids, sizes = self.walk('/api/parts/?sort=price&page_size=7')
+        self.assertEqual(ids, expected)
+        self.assertTrue(all(size == 7 for size in sizes[:-1]))
+        self.assertEqual(sum(sizes), len(expected))
+
+    def test_last_page_at_an_exact_boundary(self):
+        count = PCPart.objects(type_key='cpu').count()
+        response = self.get(f'/api/parts/?type=cpu&page_size={count}')
+        self.assertEqual(len(response.data['results']), count)
+        self.assertIsNone(response.data['next_cursor'])
+        ids, sizes = self.walk(f'/api/parts/?type=cpu&page_size={count - 1}')
+        self.assertEqual(sizes, [count - 1, 1])
+
+    def test_cursor_with_filters_and_descending_sort(self):
+        expected = [
+            str(part.id) for part in PCPart.objects(type_key='cpu', price__gte=100).order_by('-name', '-id')
+        ]
+        ids, _ = self.walk('/api/parts/?type=cpu&min_price=100&sort=-name&page_size=2')
+        self.assertEqual(ids, expected)
+
+    def test_invalid_cursors(self):
+        valid = self.get('/api/parts/?sort=price&page_size=2').data['next_cursor']
+        payload = json.loads(base64.urlsafe_b64decode(valid + '=' * (-len(valid) % 4)))
+        tampered = base64.urlsafe_b64encode(json.dumps({**payload, 'id': 'not-an-object-id'}).encode()).decode()
+        for query in (
+            f'sort=price&cursor={tampered}',
+            'sort=price&cursor=not base64!',
+            f'sort=-price&cursor={valid}',
+            f'sort=name&cursor={valid}',
+            f'sort=price&cursor={valid}&page_size=0',
+        ):
+            with self.subTest(query=query):
+                response = self.get(f'/api/parts/?{query}')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.data)
+
+
+class FacetTests(MongoTestCase):
+    def facets(self, query=''):
+        response = views.get_part_facets(APIRequestFactory().get(f'/api/parts/facets/{query}'))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_counts_and_price_histogram(self):
+        docs = list(PCPart.objects(type_key='cpu').only('type', 'manufacturer', 'price').as_pymongo())
+        facets = self.facets('?type=cpu')
+        self.assertEqual(facets['total'], len(docs))
+        self.assertEqual({facet['value']: facet['count'] for facet in facets['types']}, {'CPU': len(docs)})
+        manufacturers = {}
+        for doc in docs:
+            manufacturers[doc['manufacturer']] = manufacturers.get(doc['manufacturer'], 0) + 1
+        self.assertEqual({facet['value']: facet['count'] for facet in facets['manufacturers']}, manufacturers)
+        counts = [facet['count'] for facet in facets['manufacturers']]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+
+        prices = [float(doc['price']) for doc in docs]
+        self.assertEqual((facets['price']['min'], facets['price']['max']), (min(prices), max(prices)))
+        histogram = facets['price']['histogram']
+        self.assertEqual(sum(bucket['count'] for bucket in histogram), len(docs))
+        for bucket in histogram:
+            with self.subTest(bucket=bucket):
+                upper = math.inf if bucket['max'] is None else bucket['max']
+                self.assertEqual(bucket['count'], sum(bucket['min'] <= price < upper for price in prices))
+        self.assertEqual([bucket['min'] for bucket in histogram], sorted(bucket['min'] for bucket in histogram))
+
+    def test_overflow_bucket_and_filters(self):
+        part = PCPart(
+            name='RTX 6000 Ada', manufacturer='NVIDIA', type='GPU', price=6800.0, url='https://example.com/6000',
+            specs={'Memory': '48 GB'},
+        )
+        part.save()
+        self.addCleanup(lambda: PCPart.objects(id=part.id).delete())
+        histogram = self.facets('?min_price=1600')['price']['histogram']
+        expected = PCPart.objects(price__gte=1600, price__lt=2000).count()
+        self.assertEqual(histogram[0], {'min': 1500, 'max': 2000, 'count': expected})
+        self.assertEqual(histogram[-1], {'min': 2000, 'max': None, 'count': PCPart.objects(price__gte=2000).count()})
+        self.assertEqual(self.facets('?type=nonexistent')['total'], 0)
+
+
+class CatalogCacheTests(MongoTestCase):
+    def test_conditional_get_and_invalidation_on_save(self):
+        factory = APIRequestFactory()
+        first = views.get_parts(factory.get('/api/parts/?type=case'))
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertIn('max-age', first['Cache-Control'])
+
+        cached = views.get_parts(factory.get('/api/parts/?type=case', HTTP_IF_NONE_MATCH=first['ETag']))
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['X-Cache'], 'HIT')
+
+        part = PCPart.objects.get(name='NR200P')
+        part.price = 89.99
+        part.save()
+        refreshed = views.get_parts(factory.get('/api/parts/?type=case', HTTP_IF_NONE_MATCH=first['ETag']))
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertEqual(refreshed['X-Cache'], 'MISS')
+        self.assertNotEqual(refreshed['ETag'], first['ETag'])
+
+    def test_failed_cache_write_still_serves_the_response(self):
+        get_cache().clear()
+        with mock.patch.object(type(get_cache()), 'set', side_effect=ConnectionError('cache down')), \
+                self.assertLogs('api.cache', 'ERROR'):
+            response = views.get_parts(APIRequestFactory().get('/api/parts/?type=psu'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertTrue(response['ETag'])
+        self.assertTrue(response.data)
+
+
+class UserCacheTests(MongoTestCase):
+    def authenticate(self, user):
+        token = jwt.encode({'id': str(user.id)}, settings.SECRET_KEY, algorithm='HS256')
+        request = APIRequestFactory().get('/api/orders/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return IsAuthenticatedCustom().has_permission(request, None)
+
+    def test_cached_until_user_is_deleted(self):
+        user_cache.clear()
+        user = User(username='cache-test', password_hash='x')
+        user.save()
+        before = user_cache.stats()
+
+        self.assertTrue(self.authenticate(user))
+        self.assertTrue(self.authenticate(user))
+        stats = user_cache.stats()
+        self.assertEqual(stats['misses'] - before['misses'], 1)
+        self.assertEqual(stats['hits'] - before['hits'], 1)
+
+        user.delete()
+        self.assertFalse(self.authenticate(user))
+
+    def test_load_overtaken_by_invalidation_is_not_stored(self):
+        cache = UserCache()
+        loads = []
+
+        def load_during_write(user_id):
+            loads.append(user_id)
+            if len(loads) == 1:
+                # another request updates the user while this one reads it
+                cache.invalidate(user_id)
+            return f'user-{len(loads)}'
+
+        self.assertEqual(cache.get('u', load_during_write), 'user-1')
+        self.assertEqual(cache.get('u', load_during_write), 'user-2')
+        self.assertEqual(cache.get('u', load_during_write), 'user-2')
+        self.assertEqual(len(loads), 2)
+
+
+class PasswordHashingTests(MongoTestCase):
+    def login(self, username, password):
+        request = RequestFactory().post(
+            '/api/login/', data=json.dumps({'username': username, 'password': password}), content_type='application/json'
+        )
+        return async_to_sync(views.login_view)(request)
+
+    def test_login_upgrades_outdated_hash(self):
+        user = User(username='legacy', password_hash=generate_password_hash('s3cret', method='pbkdf2:sha256:1000'))
+        user.save()
+
+        self.assertEqual(self.login('legacy', 'wrong').status_code, 401)
+        response = self.login('legacy', 's3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('token', json.loads(response.content))
+
+        upgraded = User.objects.get(username='legacy').password_hash
+        self.assertFalse(needs_rehash(upgraded))
+        self.assertEqual(self.login('legacy', 's3cret').status_code, 200)
+
+    def test_method_prefix_is_computed_at_startup(self):
+        # ApiConfig.ready hashed once, so needs_rehash never hashes on a login
+        self.assertEqual(current_method_prefix.cache_info().currsize, 1)
+        with mock.patch('api.passwords.generate_password_hash') as generate:
+            self.assertFalse(needs_rehash(generate_password_hash('s3cret', method=passwords.HASH_METHOD)))
+        generate.assert_not_called()
+
+
+class AsyncViewTests(MongoTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        set_client_factory(lambda: AsyncClientStandIn(PCPart._get_db().client))
+        cls.user = User(username='async-orders', password_hash='x')
+        cls.user.save()
+        parts = list(PCPart.objects.limit(3))
+        for quantity in (1, 2):
+            Order(
+                user=cls.user, items=[OrderItem(product=part, quantity=quantity) for part in parts],
+                subtotal=10.0 * quantity, total_amount=11.3 * quantity,
+                created_at=datetime.datetime(2025, 1, quantity, 12, 30, 15, 123000),
+            ).save()
+
+    @classmethod
+    def tearDownClass(cls):
+        set_client_factory(None)
+        super().tearDownClass()
+
+    def test_async_views_match_sync_views(self):
+        factory = APIRequestFactory()
+        part_id = str(PCPart.objects.get(name='Ryzen 7 7800X3D').id)
+        requests = [
+            ('get_parts', '/api/parts/?type=cpu&sort=-price&page_size=4&fields=id,name,price', {}),
+            ('get_parts', '/api/parts/?search=corsair&cores__gte=1', {}),
+            ('get_part_by_id', f'/api/parts/{part_id}/', {'part_id': part_id}),
+        ]
+        for name, url, kwargs in requests:
+            with self.subTest(url=url):
+                sync_response = getattr(views, name)(factory.get(url), **kwargs)
+                get_cache().clear()
+                async_response = async_to_sync(getattr(async_views, name))(factory.get(url), **kwargs)
+                get_cache().clear()
+                self.assertEqual(async_response.status_code, 200)
+                self.assertEqual(json.loads(async_response.content), json.loads(JSONRenderer().render(sync_response.data)))
+
+        ids = [str(part.id) for part in PCPart.objects(type__in=['CPU', 'PSU']).limit(4)]
+        body = json.dumps({'ids': ids})
+        sync_response = views.get_cart_tdp(factory.post('/api/cart/tdp/', body, content_type='application/json'))
+        async_response = async_to_sync(async_views.get_cart_tdp)(factory.post('/api/cart/tdp/', body, content_type='application/json'))
+        self.assertEqual(json.loads(async_response.content), sync_response.data)
+
+    def test_async_order_listing_matches_viewset(self):
+        token = jwt.encode({'id': str(self.user.id)}, settings.SECRET_KEY, algorithm='HS256')
+        request = lambda: APIRequestFactory().get('/api/orders/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        sync_response = views.OrderViewSet.as_view({'get': 'list'})(request())
+        async_response = async_to_sync(async_views.orders)(request())
+        self.assertEqual(async_response.status_code, 200)
+        self.assertEqual(len(json.loads(async_response.content)), 2)
+        self.assertEqual(json.loads(async_response.content), json.loads(JSONRenderer().render(sync_response.data)))
+
+        anonymous = async_to_sync(async_views.orders)(APIRequestFactory().get('/api/orders/'))
+        self.assertEqual(anonymous.status_code, 403)
+
+    def test_async_order_pages_and_expansion_match_viewset(self):
+        token = jwt.encode({'id': str(self.user.id)}, settings.SECRET_KEY, algorithm='HS256')
+        request = lambda query: APIRequestFactory().get(f'/api/orders/{query}', HTTP_AUTHORIZATION=f'Bearer {token}')
+        for query in ('?page_size=1', '?page_size=1&page=2&expand=product', '?page_size=5&page=last', '?expand=product'):
+            with self.subTest(query=query):
+                sync_response = views.OrderViewSet.as_view({'get': 'list'})(request(query))
+                async_response = async_to_sync(async_views.orders)(request(query))
+                self.assertEqual(async_response.status_code, 200)
+                self.assertEqual(json.loads(async_response.content), json.loads(JSONRenderer().render(sync_response.data)))
+
+        page = json.loads(async_to_sync(async_views.orders)(request('?page_size=1&expand=product')).content)
+        self.assertEqual(page['count'], 2)
+        self.assertEqual(page['results'][0]['items'][0]['product']['id'], page['results'][0]['items'][0]['product_id'])
+        self.assertEqual(async_to_sync(async_views.orders)(request('?page_size=1&page=3')).status_code, 404)
+
+
+class OrderViewSetTests(MongoTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User(username='order-listing', password_hash='x')
+        cls.user.save()
+        parts = list(PCPart.objects.limit(4))
+        for day in (1, 2, 3):
+            Order(
+                user=cls.user, items=[OrderItem(product=part, quantity=day) for part in parts[day - 1:]],
+                subtotal=10.0 * day, total_amount=11.3 * day,
+                created_at=datetime.datetime(2025, 2, day, 9, 0),
+            ).save()
+
+    def list_orders(self, query=''):
+        token = jwt.encode({'id': str(self.user.id)}, settings.SECRET_KEY, algorithm='HS256')
+        request = APIRequestFactory().get(f'/api/orders/{query}', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return views.OrderViewSet.as_view({'get': 'list'})(request)
+
+    def test_products_are_not_dereferenced_per_item(self):
+        collection = type(PCPart._get_collection())
+        with mock.patch.object(collection, 'find', autospec=True, side_effect=collection.find) as find:
+            response = self.list_orders('?expand=product')
+        part_queries = [call for call in find.call_args_list if call.args[0].name == PCPart._get_collection_name()]
+        self.assertEqual(len(part_queries), 1)
+
+        items = [item for order in response.data for item in order['items']]
+        self.assertEqual(len(items), 9)
+        for item in items:
+            self.assertEqual(item['product']['id'], item['product_id'])
+            self.assertEqual(set(item['product']), {'id', 'name', 'manufacturer', 'type', 'price'})
+
+        plain = self.list_orders()
+        self.assertNotIn('product', plain.data[0]['items'][0])
+        self.assertEqual(plain.data[0]['user']['username'], 'order-listing')
+
+    def test_pagination_is_opt_in(self):
+        self.assertEqual(len(self.list_orders().data), 3)
+        page = self.list_orders('?page_size=2').data
+        self.assertEqual(page['count'], 3)
+        self.assertEqual([order['subtotal'] for order in page['results']], [30.0, 20.0])
+        self.assertIsNotNone(page['next'])
+
+    def post_orders(self, action, body):
+        token = jwt.encode({'id': str(self.user.id)}, settings.SECRET_KEY, algorithm='HS256')
+        request = APIRequestFactory().post(
+            '/api/orders/', body, format='json', HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+        return views.OrderViewSet.as_view({'post': action})(request)
+
+    def test_create_fetches_products_once(self):
+        self.addCleanup(lambda: Order.objects(created_at__gte=datetime.datetime(2026, 1, 1)).delete())
+        parts = list(PCPart.objects.limit(2))
+        body = {'order_items_input': [{'product_id': str(part.id), 'quantity': 2} for part in parts]}
+        collection = type(PCPart._get_collection())
+        with mock.patch.object(collection, 'find', autospec=True, side_effect=collection.find) as find:
+            response = self.post_orders('create', body)
+        self.assertEqual(response.status_code, 201)
+        part_queries = [call for call in find.call_args_list if call.args[0].name == PCPart._get_collection_name()]
+        self.assertEqual(len(part_queries), 1)
+        self.assertEqual(response.data['subtotal'], sum(2 * float(part.price) for part in parts))
+
+    def test_bulk_import(self):
+        self.addCleanup(lambda: Order.objects(order_number__startswith='POS-').delete())
+        part_ids = [str(part.id) for part in PCPart.objects.limit(3)]
+        orders = [
+            {
+                'order_number': f'POS-{n}', 'created_at': f'2024-06-0{n}T10:00:00Z',
+                'order_items_input': [{'product_id': part_ids[n - 1], 'quantity': n}],
+            }
+            for n in (1, 2, 3)
+        ]
+        invalid = self.post_orders('bulk_import', {'orders': orders + [{'order_items_input': [
+            {'product_id': 'nope', 'quantity': 1},
+        ]}]})
+        self.assertEqual(invalid.status_code, 400)
+        self.assertEqual(list(invalid.data['errors']), [3])
+        self.assertEqual(Order.objects(order_number__startswith='POS-').count(), 0)
+
+        response = self.post_orders('bulk_import', {'orders': orders})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['created']), 3)
+        imported = Order.objects.get(order_number='POS-2')
+        self.assertEqual(imported.created_at, datetime.datetime(2024, 6, 2, 10, 0))
+        self.assertEqual(imported.subtotal, 2 * float(PCPart.objects.get(id=part_ids[1]).price))
+
+        replay = self.post_orders('bulk_import', {'orders': orders})
+        self.assertEqual(replay.data, {'created': [], 'skipped': ['POS-1', 'POS-2', 'POS-3']})
+
+    def test_bulk_import_renumbers_generated_collisions(self):
+        created_at = datetime.datetime(2024, 7, 1, 8, 0)
+        self.addCleanup(lambda: Order.objects(created_at=created_at).delete())
+        part = PCPart.objects.first()
+        part_id = str(part.id)
+        # another order of this user was numbered in the same second
+        existing = Order(
+            user=self.user, items=[OrderItem(product=part, quantity=1)], subtotal=0, total_amount=0, created_at=created_at,
+        )
+        existing.save()
+        entry = {'created_at': '2024-07-01T08:00:00Z', 'order_items_input': [{'product_id': part_id, 'quantity': 1}]}
+
+        response = self.post_orders('bulk_import', {'orders': [entry, entry]})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((len(response.data['created']), response.data['skipped']), (2, []))
+        numbers = [Order.objects.get(id=order_id).order_number for order_id in response.data['created']]
+        self.assertEqual(len({existing.order_number, *numbers}), 3)
+        self.assertTrue(all(number.startswith(existing.order_number) for number in numbers))
+
+
+class CompatibilityTests(MongoTestCase):
+    def check(self, *names):
+        ids = [str(PCPart.objects.get(name=name).id) for name in names]
+        request = APIRequestFactory().post('/api/cart/compatibility/', {'ids': ids}, format='json')
+        return views.check_cart_compatibility(request).data
+
+    def test_compatible_build(self):
+        result = self.check('Ryzen 7 7800X3D', 'ROG Strix B650E-F', 'Vengeance 32GB', 'RM850x')
+        self.assertTrue(result['compatible'])
+        self.assertEqual(result['violations'], [])
+        self.assertEqual(result['total_tdp'], 120)
+
+    def test_violations_are_structured(self):
+        result = self.check('Core i5-13600K', 'ROG Strix B650E-F', 'NR200P', 'GeForce RTX 4070')
+        self.assertFalse(result['compatible'])
+        self.assertEqual(
+            sorted((violation['rule'], violation['severity']) for violation in result['violations']),
+            [('cpu_socket', 'error'), ('form_factor', 'error')],
+        )
+        socket = next(violation for violation in result['violations'] if violation['rule'] == 'cpu_socket')
+        self.assertEqual(len(socket['parts']), 2)
+
+    def set_wattage(self, wattage):
+        part = PCPart.objects.get(name='RM850x')
+        part.specs['Wattage'] = wattage
+        part.save()
+
+    def test_table_follows_catalog_writes(self):
+        self.check('RM850x')
+        self.set_wattage('300 W')
+        self.addCleanup(self.set_wattage, '850 W')
+        # run the background rebuild inline
+        rebuild_inline = lambda target, args, daemon: mock.Mock(start=lambda: target(*args))
+        with mock.patch('api.indexes.threading.Thread', side_effect=rebuild_inline):
+            self.check('RM850x')
+        result = self.check('Ryzen 7 7800X3D', 'GeForce RTX 4070', 'RM850x')
+        self.assertEqual([violation['severity'] for violation in result['violations']], ['error'])
+
+    def test_unknown_ids_are_looked_up_once(self):
+        table = compatibility.build_rule_table()
+        part_id = ObjectId()
+        self.assertEqual(table.resolve([str(part_id), 'not-an-id']), ([], [str(part_id), 'not-an-id']))
+        PCPart._get_collection().insert_one({'_id': part_id, 'name': 'Late PSU', 'type': 'PSU', 'price': 80})
+        self.addCleanup(lambda: PCPart._get_collection().delete_one({'_id': part_id}))
+        self.assertEqual(table.resolve([str(part_id)]), ([], [str(part_id)]))
+        # a table rebuilt after the TTL (writes by other workers) sees the part
+        expired = mock.Mock(version=table.version, built_at=table.built_at - compatibility.TABLE_TTL - 1)
+        self.assertTrue(compatibility._table._is_stale(expired))
+        self.assertEqual([part.name for part in compatibility.build_rule_table().resolve([str(part_id)])[0]], ['Late PSU'])
+
+    def test_resolve_leaves_readers_parts_unchanged(self):
+        table = compatibility.build_rule_table()
+        part_id = ObjectId()
+        PCPart._get_collection().insert_one({'_id': part_id, 'name': 'Late PSU', 'type': 'PSU', 'price': 80})
+        self.addCleanup(lambda: PCPart._get_collection().delete_one({'_id': part_id}))
+        # e.g. BuildCatalog iterating over the table on another thread
+        parts, count = table.parts, len(table)
+        self.assertEqual([part.name for part in table.resolve([str(part_id)])[0]], ['Late PSU'])
+        self.assertEqual(len(parts), count)
+        self.assertEqual(len(table), count + 1)
+
+    def test_batch_evaluation_matches_single_cart_endpoint(self):
+        factory = APIRequestFactory()
+        parts = {part.name: str(part.id) for part in PCPart.objects(type__in=['CPU', 'GPU', 'PSU'])}
+        carts = [
+            [parts['Ryzen 7 7800X3D'], parts['GeForce RTX 4070'], parts['RM850x']],
+            [parts['Core i5-13600K'], parts['RM850x'], parts['RM850x'], 'not-an-id'],
+            list(parts.values())[:12],
+        ]
+        response = views.evaluate_carts_view(factory.post('/api/cart/evaluate/', {'carts': carts}, format='json'))
+        self.assertEqual(response.status_code, 200)
+        for cart, result in zip(carts, response.data['results']):
+            single = views.get_cart_tdp(factory.post('/api/cart/tdp/', {'ids': cart}, format='json')).data
+            self.assertEqual(result['total_tdp'], single['total_tdp'])
+            self.assertCountEqual(result['psu_warnings'], single['psu_warnings'])
+            expected_price = sum(float(PCPart.objects.get(id=pid).price) for pid in set(cart) if pid != 'not-an-id')
+            self.assertAlmostEqual(result['total_price'], expected_price, places=2)
+        self.assertEqual(response.data['results'][1]['missing_ids'], ['not-an-id'])
+
+
+class AutoBuildTests(MongoTestCase):
+    def build(self, query):
+        return views.auto_build_view(APIRequestFactory().get(f'/api/build/{query}'))
+
+    def test_build_is_compatible_and_within_budget(self):
+        for budget, socket in ((3000, None), (4000, 'AM5'), (4000, 'lga-1700')):
+            with self.subTest(budget=budget, socket=socket):
+                query = f'?budget={budget}' + (f'&socket={socket}' if socket else '')
+                build = self.build(query).data
+                self.assertLessEqual(build['total_price'], budget)
+                self.assertEqual(len(build['parts']), 6)
+                parts, missing = get_rule_table().resolve([part['id'] for part in build['parts']])
+                self.assertEqual(missing, [])
+                self.assertEqual(check_compatibility(parts)['violations'], [])
+                if socket:
+                    cpu = next(part for part in parts if part.type == 'CPU')
+                    self.assertEqual(cpu.socket, normalize_text(socket))
+
+    def test_more_budget_never_scores_lower(self):
+        scores = [self.build(f'?budget={budget}').data['score'] for budget in (2500, 3500, 6000)]
+        self.assertEqual(scores, sorted(scores))
+
+    def test_unaffordable_and_invalid_budgets(self):
+        self.assertEqual(self.build('?budget=50').status_code, 404)
+        for budget in ('abc', 'inf', 'nan', '-5'):
+            with self.subTest(budget=budget):
+                self.assertEqual(self.build(f'?budget={budget}').status_code, 400)
+
+    def test_use_case_selects_weight_profile(self):
+        builds = {use_case: self.build(f'?budget=2000&use_case={use_case}').data for use_case in ('gaming', 'workstation')}
+        self.assertEqual(builds['gaming']['use_case'], 'gaming')
+        self.assertEqual(self.build('?budget=2000').data, builds['gaming'])
+        price = lambda build, part_type: next(part['price'] for part in build['parts'] if part['type'] == part_type)
+        # the workstation profile spends more of the same budget on memory and less on the GPU
+        self.assertGreater(price(builds['workstation'], 'RAM'), price(builds['gaming'], 'RAM'))
+        self.assertLess(price(builds['workstation'], 'GPU'), price(builds['gaming'], 'GPU'))
+        self.assertEqual(self.build('?budget=2000&use_case=mining').status_code, 400)
+
+
+class SimilarPartsTests(MongoTestCase):
+    def similar(self, part, query=''):
+        url = f'/api/parts/{part.id}/similar/{query}'
+        return views.get_similar_parts(APIRequestFactory().get(url), part_id=str(part.id))
+
+    def test_neighbours_share_type_and_are_ordered(self):
+        part = PCPart.objects.get(name='Ryzen 7 7800X3D')
+        response = self.similar(part, '?limit=5&fields=id,name,type')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 5)
+        self.assertNotIn(str(part.id), [neighbour['id'] for neighbour in response.data])
+        self.assertTrue(all(neighbour['type'] == 'CPU' for neighbour in response.data))
+        distances = [neighbour['distance'] for neighbour in response.data]
+        self.assertEqual(distances, sorted(distances))
+
+    def test_closest_part_is_its_near_twin(self):
+        original = PCPart.objects.get(name='Ryzen 7 7800X3D')
+        self.similar(original)
+        twin = PCPart(
+            name='Ryzen 7 7800X3D Tray', manufacturer='AMD', type='CPU', price=445.0,
+            url='https://example.com/tray', specs=dict(original.specs),
+        )
+        twin.save()
+        self.addCleanup(twin.delete)
+        # parts newer than the index are encoded on the fly
+        self.assertEqual(self.similar(twin).data[0]['id'], str(original.id))
+
+    def test_unknown_part(self):
+        missing = PCPart(id='0' * 24)
+        self.assertEqual(self.similar(missing).status_code, 404)
+
+
+class SearchIndexTests(SimpleTestCase):
+    PARTS = [
+        ('a', 'Ryzen 7 7800X3D', 'AMD', 'CPU'),
+        ('b', 'GeForce RTX 4070', 'NVIDIA', 'GPU'),
+        ('c', 'Vengeance 32GB', 'Corsair', 'RAM'),
+        ('d', 'RM850x', 'Corsair', 'PSU'),
+        ('e', 'Fury Beast', 'Kingston', 'RAM'),
+        ('f', 'Kingston Cooler', 'Noctua', 'Cooler'),
+        ('g', 'RTXA 6000', 'NVIDIA', 'GPU'),
+    ]
+
+    def setUp(self):
+        self.index = search.SearchIndex()
+        for part in self.PARTS:
+            self.index.add(*part)
+
+    def test_typos_and_prefixes(self):
+        self.assertEqual(self.index.search('ryzn')[:1], ['a'])
+        self.assertEqual(self.index.search('geforse')[:1], ['b'])
+        self.assertEqual(self.index.search('vengance')[:1], ['c'])
+        self.assertEqual(self.index.search('venge'), ['c'])
+        self.assertEqual(self.index.search('xyzzy'), [])
+
+    def test_ranking(self):
+        # a name match outweighs a manufacturer match, an exact term a prefix of a longer one
+        self.assertEqual(self.index.search('kingston'), ['f', 'e'])
+        self.assertEqual(self.index.search('rtx')[:2], ['b', 'g'])
+        # parts matching every query term come before partial matches
+        self.assertEqual(self.index.search('corsair 32gb'), ['c'])
+        self.index.remove('c')
+        self.assertEqual(self.index.search('corsair 32gb'), ['d'])
+
+
+class SearchIndexRebuildTests(MongoTestCase):
+    def test_writes_during_a_rebuild_reach_the_new_index(self):
+        lazy = search._index
+        search.get_index()
+        # a rebuild that read the catalog before the write below
+        built_before_write = search.build_index()
+        started = []
+        with mock.patch.object(lazy, '_is_stale', lambda index: True), \
+                mock.patch.object(lazy, '_build', lambda: built_before_write), \
+                mock.patch('api.indexes.threading.Thread', lambda target, args, daemon: mock.Mock(
+                    start=lambda: started.append((target, args)))):
+            search.get_index()
+            part = PCPart(
+                name='Zotac Trinity Twin', manufacturer='Zotac', type='GPU', price=899.0,
+                url='https://example.com/zotac', specs={'memory': '12 GB'},
+            )
+            part.save()
+            self.addCleanup(lambda: PCPart.objects(id=part.id).delete())
+            target, args = started[0]
+            target(*args)
+        self.assertIs(search.get_index(), built_before_write)
+        self.assertEqual(search.search_part_ids('trinity'), [str(part.id)])
+        search.reset_index()
+
+
+class CatalogSnapshotTests(MongoTestCase):
+    URLS = [
+        '/api/parts/',
+        '/api/parts/?type=cpu&sort=-price&page_size=4',
+        '/api/parts/?manufacturer=corsair&min_price=50&max_price=900&sort=name',
+        '/api/parts/?type=Motherboard&socket=am5&form_factor=ATX',
+        '/api/parts/?cores__gte=8&boost_clock__lt=5.5&sort=-name&page_size=3&fields=id,name',
+        '/api/parts/?memory=16&page_size=5',
+        '/api/parts/?type=nonexistent&socket=lga1700',
+        '/api/parts/?search=corsair&sort=price&page_size=2',
+        '/api/parts/?search=ryzen',
+    ]
+
+    def setUp(self):
+        super().setUp()
+        for patch in (mock.patch.object(snapshot, 'ENABLED', True), mock.patch.object(snapshot, 'POLL_SECONDS', 0)):
+            patch.start()
+            self.addCleanup(patch.stop)
+        snapshot.reset_snapshot()
+        self.addCleanup(snapshot.reset_snapshot)
+
+    def pages(self, url, enabled):
+        """Every page of ``url``, following next_cursor."""
+        pages = []
+        with mock.patch.object(snapshot, 'ENABLED', enabled):
+            while url and len(pages) < 5:
+                get_cache().clear()
+                response = views.get_parts(APIRequestFactory().get(url))
+                self.assertEqual(response.status_code, 200, response.data)
+                pages.append(json.loads(JSONRenderer().render(response.data)))
+                cursor = pages[-1].get('next_cursor') if isinstance(pages[-1], dict) else None
+                url = cursor and f"{url.split('&cursor=')[0]}&cursor={cursor}"
+        return pages
+
+    def assertMatchesDatabase(self, urls=URLS):
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.pages(url, True), self.pages(url, False))
+
+    def test_answers_like_the_database(self):
+        self.assertMatchesDatabase()
+        self.assertIsNotNone(snapshot.current_snapshot())
+
+        with mock.patch.object(async_views, 'SNAPSHOT_ENABLED', True):
+            url = '/api/parts/?type=gpu&sort=price&page_size=3'
+            response = async_to_sync(async_views.get_parts)(APIRequestFactory().get(url))
+        self.assertEqual(json.loads(response.content), self.pages(url, False)[0])
+
+        response = views.get_parts(APIRequestFactory().get('/api/parts/?sort=weight'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_refresh_applies_only_changed_parts(self):
+        built = snapshot.get_snapshot()
+        part = PCPart(
+            name='Core i9-14900K', manufacturer='Intel', type='CPU', price=589.0, url='https://example.com/14900k',
+            specs={'Cores': '24', 'Boost Clock': '6.0 GHz', 'Socket': 'LGA 1700'},
+        )
+        part.save()
+        self.addCleanup(lambda: PCPart.objects(id=part.id).delete())
+        changed = PCPart.objects.get(name='Vengeance 32GB')
+        changed.price, changed.name = 54.5, 'Vengeance 32GB Extended Edition'
+        changed.save()
+        self.addCleanup(lambda: PCPart.objects(id=changed.id).update(price=104.5, name='Vengeance 32GB'))
+        removed = PCPart.objects.get(name='NR200P')
+        removed.delete()
+        self.addCleanup(lambda: PCPart(**SAMPLE_PARTS[-1]).save())
+
+        refreshed = snapshot.refresh_snapshot()
+        self.assertIsNot(refreshed, built)
+        self.assertGreater(refreshed.revision, built.revision)
+        self.assertEqual(len(refreshed), len(built))
+        self.assertIsNone(refreshed.get(removed.id))
+        self.assertEqual(refreshed.get(changed.id)['price'], 54.5)
+        unchanged = PCPart.objects.get(name='RM850x').id
+        self.assertIs(refreshed.get(unchanged), built.get(unchanged))
+        self.assertIs(snapshot.refresh_snapshot(), refreshed)
+        self.assertMatchesDatabase([
+            '/api/parts/?sort=name&page_size=30', '/api/parts/?type=cpu&socket=lga1700', '/api/parts/?max_price=60',
+        ])
+
+    def test_bulk_writes_reload_the_snapshot(self):
+        built = snapshot.get_snapshot()
+        collection = PCPart._get_collection()
+        prices = {doc['_id']: doc['price'] for doc in collection.find({'type_key': 'psu'}, {'price': True})}
+        collection.update_many({'type_key': 'psu'}, {'$set': {'price': 75.0}})
+        for part_id, price in prices.items():
+            self.addCleanup(collection.update_one, {'_id': part_id}, {'$set': {'price': price}})
+        snapshot.next_revision(reload=True)
+        reloaded = snapshot.refresh_snapshot()
+        self.assertIsNot(reloaded, built)
+        self.assertEqual({reloaded.get(doc['_id'])['price'] for doc in PCPart.objects(type_key='psu').as_pymongo()}, {75.0})
+
+    def test_search_cap_applies_after_filters(self):
+        # only the best match counts on its own, but filters pick from every match
+        with mock.patch.object(filters, 'MAX_RESULTS', 1), mock.patch.object(pagination, 'MAX_RESULTS', 1):
+            for url, names in (
+                ('/api/parts/?search=corsair&type=PSU', ['RM850x']),
+                ('/api/parts/?search=corsair&type=RAM', ['Vengeance 32GB']),
+            ):
+                with self.subTest(url=url):
+                    self.assertEqual([part['name'] for part in self.pages(url, False)[0]], names)
+            # sorted otherwise than by relevance, every filtered match is listed
+            by_price = [part['name'] for part in self.pages('/api/parts/?search=corsair&type=RAM&sort=price', False)[0]]
+            self.assertIn('Vengeance 32GB', by_price)
+            self.assertEqual(len(by_price), PCPart.objects(type='RAM', manufacturer='Corsair').count())
+            self.assertEqual(len(self.pages('/api/parts/?search=corsair', False)[0]), 1)
+            self.assertMatchesDatabase(['/api/parts/?search=corsair&type=PSU', '/api/parts/?search=corsair'])
+
+    def test_parts_without_key_fields_still_match(self):
+        # parts saved before type_key/manufacturer_key existed, not yet backfilled by parse_specs
+        collection = PCPart._get_collection()
+        legacy = list(collection.find({'type_key': 'cpu'}, {'type_key': True, 'manufacturer_key': True}))
+        collection.update_many({'type_key': 'cpu'}, {'$unset': {'type_key': '', 'manufacturer_key': ''}})
+        for doc in legacy:
+            self.addCleanup(collection.update_one, {'_id': doc['_id']}, {'$set': {
+                'type_key': doc['type_key'], 'manufacturer_key': doc['manufacturer_key'],
+            }})
+        urls = ['/api/parts/?type=CPU', '/api/parts/?manufacturer=amd&sort=price', '/api/parts/?type=cpu&search=ryzen']
+        self.assertEqual(len(self.pages(urls[0], False)[0]), len(legacy))
+        self.assertMatchesDatabase(urls)
+        url = '/api/parts/?type=cpu&manufacturer=AMD'
+        set_client_factory(lambda: AsyncClientStandIn(PCPart._get_db().client))
+        self.addCleanup(set_client_factory, None)
+        response = async_to_sync(async_views.get_parts)(APIRequestFactory().get(url))
+        self.assertEqual(json.loads(response.content), self.pages(url, False)[0])
+        self.assertTrue(json.loads(response.content))
+
+    def test_writes_skip_revisions_when_snapshots_are_off(self):
+        revision = snapshot.catalog_revision()
+        part = PCPart.objects.get(name='RM850x')
+        with mock.patch.object(snapshot, 'ENABLED', False):
+            part.save()
+            inserted = insert_parts(synthetic_parts(1, seed=7))
+        self.addCleanup(lambda: PCPart.objects(id__in=inserted).delete())
+        self.assertEqual(snapshot.catalog_revision(), revision)
+        self.assertIsNone(PCPart.objects.get(id=part.id).revision)
+
+
+class SuggestTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        suggest.reset_index()
+        self.addCleanup(suggest.reset_index)
+
+    def suggest(self, query):
+        response = views.suggest_parts(APIRequestFactory().get(f'/api/parts/suggest/{query}'))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_matches_word_prefixes_with_display_names(self):
+        gpu = PCPart.objects.get(name='GeForce RTX 4070')
+        self.assertEqual(self.suggest('?q=RTX 40'), [{'id': str(gpu.id), 'name': 'NVIDIA GeForce RTX 4070'}])
+        self.assertEqual(self.suggest('?q=nvidia geforce rtx-4070'), self.suggest('?q=geforce'))
+        self.assertEqual([part['name'] for part in self.suggest('?q=ryzen 7')], ['AMD Ryzen 7 7800X3D'])
+        self.assertEqual(len(self.suggest('?q=cpu model&limit=3')), 3)
+        self.assertEqual(self.suggest('?q=%20-'), [])
+        response = views.suggest_parts(APIRequestFactory().get('/api/parts/suggest/?q=a&limit=many'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_ranked_by_orders(self):
+        self.assertEqual(self.suggest('?q=corsair')[0]['name'], 'Corsair PSU Model 000004')
+        user = User(username='suggest-orders', password_hash='x')
+        user.save()
+        self.addCleanup(user.delete)
+        vengeance = PCPart.objects.get(name='Vengeance 32GB')
+        order = Order(user=user, items=[OrderItem(product=vengeance, quantity=2)], subtotal=209.0, total_amount=209.0)
+        order.save()
+        self.addCleanup(order.delete)
+        suggest.reset_index()
+        self.assertEqual(self.suggest('?q=corsair')[0]['name'], 'Corsair Vengeance 32GB')
+
+    def test_follows_part_writes(self):
+        self.suggest('?q=x')
+        part = PCPart(
+            name='Xeon w9-3495X', manufacturer='Intel', type='CPU', price=5889.0, url='https://example.com/w9',
+            specs={'Cores': '56'},
+        )
+        part.save()
+        self.addCleanup(lambda: PCPart.objects(id=part.id).delete())
+        self.assertEqual(self.suggest('?q=intel xe'), [{'id': str(part.id), 'name': 'Intel Xeon w9-3495X'}])
+        part.name = 'Xeon w9-3595X'
+        part.save()
+        self.assertEqual([part['name'] for part in self.suggest('?q=w9')], ['Intel Xeon w9-3595X'])
+        part.delete()
+        self.assertEqual(self.suggest('?q=xeon'), [])
+
+    def test_writes_merge_like_a_rebuild(self):
+        docs = [{'_id': f'p{i}', 'name': f'Model {i} {word}', 'manufacturer': maker}
+                for i, (word, maker) in enumerate([('Ultra', 'Acme'), ('Mini', 'Acme'), ('Max', 'Bolt'), ('Ultra', 'Bolt')])]
+        popularity = {'p1': 3, 'p5': 5}
+        index = suggest.SuggestIndex(popularity)
+        index.load(docs)
+        keys = index._keys
+        index.add('p5', 'Model 5 Ultra', 'Acme')
+        index.add('p0', 'Model 0 Mega', 'Acme')
+        index.remove('p3')
+        self.assertIs(index._keys, keys)
+
+        rebuilt = suggest.SuggestIndex(popularity)
+        rebuilt.load([{'_id': 'p5', 'name': 'Model 5 Ultra', 'manufacturer': 'Acme'},
+                      {'_id': 'p0', 'name': 'Model 0 Mega', 'manufacturer': 'Acme'}] + docs[1:3])
+        for query in ('model', 'ultra', 'acme', 'bolt', 'mega', 'model 0', 'nothing'):
+            with self.subTest(query=query):
+                self.assertEqual(index.suggest(query, limit=3), rebuilt.suggest(query, limit=3))
+        with mock.patch.object(suggest, 'MAX_OVERLAY', 1):
+            index.add('p2', 'Model 2 Max', 'Bolt Labs')
+        self.assertEqual((index._overlay, index._masked), ([], set()))
+        self.assertEqual(index.suggest('bolt labs'), [('p2', 'Bolt Labs Model 2 Max')])
+
+
+class PartsBatchTests(MongoTestCase):
+    def batch(self, query='', body=None):
+        factory = APIRequestFactory()
+        if body is None:
+            request = factory.get(f'/api/parts/batch/{query}')
+        else:
+            request = factory.post(f'/api/parts/batch/{query}', body, format='json')
+        return views.get_parts_batch(request)
+
+    def finds(self, call):
+        """``call()``'s response and the _id filters of the part queries it sent."""
+        collection = type(PCPart._get_collection())
+        with mock.patch.object(collection, 'find', autospec=True, side_effect=collection.find) as find:
+            response = call()
+        return response, [c.args[1]['_id'] for c in find.call_args_list if c.args[0].name == 'products']
+
+    def test_request_order_missing_ids_and_fields(self):
+        ryzen, nr200p = (str(PCPart.objects.get(name=name).id) for name in ('Ryzen 7 7800X3D', 'NR200P'))
+        unknown = '0' * 24
+        response = self.batch(f'?ids={nr200p},{unknown},{ryzen},bogus,{nr200p}&fields=id,name')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+            {'id': nr200p, 'name': 'NR200P'}, {'id': ryzen, 'name': 'Ryzen 7 7800X3D'}, {'id': nr200p, 'name': 'NR200P'},
+        ])
+        self.assertEqual(response.data['missing'], [unknown, 'bogus'])
+
+        posted = self.batch(body={'ids': [ryzen]})
+        by_id = views.get_part_by_id(APIRequestFactory().get(f'/api/parts/{ryzen}/'), part_id=ryzen)
+        self.assertEqual(posted.data['results'], [by_id.data])
+
+        self.assertEqual(self.batch(body={'ids': ryzen}).status_code, 400)
+        self.assertEqual(self.batch('?ids=' + ','.join([ryzen] * (views.PARTS_BATCH_MAX + 1))).status_code, 400)
+        self.assertEqual(self.batch('?ids=&fields=password').status_code, 400)
+
+    def test_shares_the_per_part_cache_with_get_part_by_id(self):
+        first, second, third = (str(part.id) for part in PCPart.objects.only('id').limit(3))
+        get_one = lambda part_id, query='': views.get_part_by_id(
+            APIRequestFactory().get(f'/api/parts/{part_id}/{query}'), part_id=part_id,
+        )
+        get_one(first, '?fields=price')
+
+        response, queries = self.finds(lambda: self.batch(f'?ids={first},{second}'))
+        self.assertEqual([part['id'] for part in response.data['results']], [first, second])
+        self.assertEqual(queries, [{'$in': [ObjectId(second)]}])
+
+        response, queries = self.finds(lambda: get_one(second, '?fields=name'))
+        self.assertEqual(queries, [])
+        self.assertEqual(set(response.data), {'name'})
+
+        part = PCPart.objects.get(id=third)
+        part.save()
+        response, queries = self.finds(lambda: self.batch(f'?ids={first},{third}'))
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(set(queries[0]['$in']), {ObjectId(first), ObjectId(third)})
+
+
+class InstrumentationTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        reset_metrics()
+
+    def test_server_timing_log_and_metrics(self):
+        client = Client(SERVER_NAME='localhost')
+        with self.assertLogs('api.requests', 'INFO') as logs:
+            response = client.get('/api/parts/?type=cpu')
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ round trips", ')
+        self.assertIn('serialize;dur=', timing)
+        self.assertRegex(timing, r'total;dur=[\d.]+$')
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((record['route'], record['status']), ('api/parts/', 200))
+        self.assertGreater(record['serialize_ms'], 0)
+
+        request = RequestFactory().get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        with mock.patch.object(instrumentation, 'METRICS_TOKEN', 'scrape-token'):
+            self.assertEqual(instrumentation.metrics_view(RequestFactory().get('/metrics')).status_code, 401)
+            response = instrumentation.metrics_view(request)
+        self.assertEqual(response.status_code, 200)
+        metrics = response.content.decode()
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="api/parts/",status="200"} 1', metrics)
+        self.assertIn('http_request_serialize_duration_seconds_bucket{route="api/parts/",le="+Inf"} 1', metrics)
+        self.assertIn('# TYPE auth_user_cache_hits_total counter\nauth_user_cache_hits_total ', metrics)
+        self.assertIn('# TYPE auth_user_cache_size gauge', metrics)
+
+    def test_listener_counts_round_trips_and_logs_slow_commands(self):
+        listener = CommandTimingListener(slow_query_ms=50)
+        timings = RequestTimings()
+
+        def run(request_id, duration_ms, command):
+            listener.started(mock.Mock(
+                connection_id=('db', 27017), request_id=request_id, database_name='pcparts_db', command=command,
+            ))
+            listener.succeeded(mock.Mock(
+                connection_id=('db', 27017), request_id=request_id, command_name=next(iter(command)),
+                duration_micros=duration_ms * 1000,
+            ))
+
+        token = instrumentation._current.set(timings)
+        try:
+            run(1, 2, {'find': 'products', 'filter': {'type_key': 'cpu'}})
+            with self.assertLogs('api.slow_queries', 'WARNING') as logs:
+                run(2, 80, {'aggregate': 'orders', 'pipeline': [{'$match': {}}]})
+        finally:
+            instrumentation._current.reset(token)
+
+        self.assertEqual(timings.db_round_trips, 2)
+        self.assertAlmostEqual(timings.db, 0.082)
+        self.assertEqual(len(logs.records), 1)
+        slow = json.loads(logs.records[0].getMessage())
+        self.assertEqual(
+            (slow['command'], slow['collection'], slow['duration_ms'], slow['pipeline']),
+            ('aggregate', 'orders', 80, [{'$match': {}}]),
+        )
+        self.assertIn('mongodb_command_duration_seconds_count{command="find",outcome="success"} 1', render_metrics())
+
+
+class ImportPartsCommandTests(SimpleTestCase):
+    def setUp(self):
+        connect_in_memory('pcparts_import_test')
+
+    def tearDown(self):
+        mongoengine.disconnect()
+
+    def write(self, suffix, text):
+        handle = tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False)
+        with handle:
+            handle.write(text)
+        self.addCleanup(os.unlink, handle.name)
+        return handle.name
+
+    def run_import(self, path, **options):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_parts', path, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue().splitlines(), stderr.getvalue().splitlines()
+
+    def test_csv_normalizes_specs_and_reports_bad_rows(self):
+        path = self.write('.csv', (
+            'name,manufacturer,type,price,url,spec:core count,spec:TDP,specs\n'
+            'Ryzen 5 7600, AMD ,CPU,$229.99,https://amd.com/7600,6,65 W,"{""Socket"": "" AM5 ""}"\n'
+            'Broken,AMD,CPU,abc,https://amd.com/x,,,\n'
+            'Odd TDP,AMD,CPU,10,https://amd.com/y,4,lots,\n'
+            'No URL,AMD,CPU,10,,4,,\n'
+        ))
+        output, errors = self.run_import(path, batch_size=2)
+
+        self.assertEqual(errors, [
+            "Line 3: Invalid price: 'abc'", "Line 4: Unparseable TDP spec: 'lots'", 'Line 5: Missing url',
+        ])
+        self.assertIn('1 new, 0 updated, 0 unchanged, 3 rejected', output[-1])
+        part = PCPart.objects.get(name='Ryzen 5 7600')
+        self.assertEqual((part.manufacturer, float(part.price)), ('AMD', 229.99))
+        self.assertEqual(part.specs, {'Cores': '6', 'TDP': '65 W', 'Socket': 'AM5'})
+        self.assertEqual(part.spec_values, {'cores': 6, 'tdp': 65, 'socket': 'am5'})
+        self.assertEqual(part.manufacturer_key, 'amd')
+
+    def test_jsonl_upserts_on_manufacturer_and_name(self):
+        rows = [dict(part, price=100.0 + i) for i, part in enumerate(SAMPLE_PARTS)]
+        path = self.write('.jsonl', '\n'.join(json.dumps(row) for row in rows) + '\n')
+        self.run_import(path, batch_size=3, workers=2)
+        self.assertEqual(PCPart.objects.count(), len(SAMPLE_PARTS))
+
+        rows[0]['price'] = 1.0
+        rows[1]['manufacturer'] = rows[1]['manufacturer'].upper()
+        rows.append(dict(rows[2], price=5.0))
+        path = self.write('.jsonl', '\n'.join(json.dumps(row) for row in rows) + '\n{oops\n')
+        output, errors = self.run_import(path)
+
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith(f'Line {len(rows) + 1}: Invalid JSON'))
+        self.assertIn(f'0 new, 3 updated, {len(SAMPLE_PARTS) - 3} unchanged, 1 rejected', output[-1])
+        self.assertEqual(PCPart.objects.count(), len(SAMPLE_PARTS))
+        self.assertEqual(float(PCPart.objects.get(name=rows[0]['name']).price), 1.0)
+        self.assertEqual(float(PCPart.objects.get(name=rows[2]['name']).price), 5.0)
+
+    def test_aborted_import_still_invalidates_what_it_wrote(self):
+        rows = [SAMPLE_PARTS[0], dict(SAMPLE_PARTS[1], price='abc')]
+        path = self.write('.jsonl', '\n'.join(json.dumps(row) for row in rows) + '\n')
+        version = catalog_version()
+        with self.assertRaises(CommandError):
+            self.run_import(path, batch_size=1, max_errors=1)
+        self.assertEqual(PCPart.objects.count(), 1)
+        self.assertNotEqual(catalog_version(), version)
+
+
+class ReadPreferenceTests(MongoTestCase):
+    def read_preferences(self, view, *args, query=''):
+        collection = type(PCPart._get_collection())
+        with mock.patch.object(collection, 'find', autospec=True, side_effect=collection.find) as find:
+            response = view(APIRequestFactory().get(f'/api/parts/{query}'), *args)
+        self.assertEqual(response.status_code, 200)
+        preferences = []
+        for call in find.call_args_list:
+            if call.args[0].read_preference not in preferences:
+                preferences.append(call.args[0].read_preference)
+        return preferences
+
+    def test_catalog_views_read_from_secondaries(self):
+        part_id = str(PCPart.objects.first().id)
+        staleness_bound = SecondaryPreferred(max_staleness=90)
+        self.assertEqual(self.read_preferences(views.get_parts, query='?type=cpu&page_size=2'), [staleness_bound])
+        self.assertEqual(self.read_preferences(views.get_part_by_id, part_id), [staleness_bound])
+        similar.get_index()    # built from the primary, like the other in-memory indexes
+        self.assertEqual(self.read_preferences(views.get_similar_parts, part_id), [staleness_bound])
+
+        routes = {'PCPart': 'primary', 'get_part_by_id': 'nearest:120'}
+        with override_settings(MONGODB_READ_PREFERENCES=routes):
+            get_cache().clear()
+            self.assertEqual(self.read_preferences(views.get_parts), [Primary()])
+            self.assertEqual(self.read_preferences(views.get_part_by_id, part_id), [Nearest(max_staleness=120)])
+
+    def test_invalid_read_preferences(self):
+        for spec in ('fastest', 'primary:90', 'secondary:30', 'secondary:soon'):
+            with self.subTest(spec=spec), self.assertRaises(ImproperlyConfigured):
+                db.parse_read_preference(spec)
+
+    def test_server_selection_on_a_replica_set(self):
+        now = datetime.datetime(2026, 1, 1)
+
+        def member(host, primary, lag):
+            hello = Hello({
+                'ok': 1, 'isWritablePrimary': primary, 'secondary': not primary, 'setName': 'rs',
+                'hosts': ['primary:27017', 'fresh:27017', 'lagging:27017'], 'maxWireVersion': 17,
+                'lastWrite': {'lastWriteDate': now - datetime.timedelta(seconds=lag)},
+            })
+            return (host, 27017), ServerDescription((host, 27017), hello, round_trip_time=0.001)
+
+        topology = TopologyDescription(
+            TOPOLOGY_TYPE.ReplicaSetWithPrimary,
+            dict([member('primary', True, 0), member('fresh', False, 5), member('lagging', False, 600)]),
+            'rs', None, None, TopologySettings(heartbeat_frequency=10),
+        )
+
+        def selected(document):
+            return [server.address[0] for server in topology.apply_selector(db.read_preference(document))]
+
+        self.assertEqual(selected(PCPart), ['fresh'])
+        # orders and users are never routed, so they keep the client's primary reads
+        self.assertIsNone(db.read_preference(Order))
+        self.assertIsNone(db.read_preference(User))
+        self.assertEqual([server.address[0] for server in topology.apply_selector(Primary())], ['primary'])
+
+    def test_cache_entries_expire_within_the_staleness_bound(self):
+        self.assertEqual(get_cache().default_timeout, 300)
+        self.assertEqual(cache_timeout('get_parts'), 90)
+        routes = {'PCPart': 'primary', 'get_part_by_id': 'nearest:120', 'get_parts_batch': 'secondary'}
+        with override_settings(MONGODB_READ_PREFERENCES=routes):
+            self.assertEqual(cache_timeout('get_parts'), 300)
+            self.assertEqual(cache_timeout('get_part_by_id'), 120)
+            self.assertEqual(cache_timeout('get_parts_batch'), 300)
+
+        get_cache().clear()
+        with mock.patch.object(type(get_cache()), 'set', autospec=True) as cache_set:
+            views.get_parts(APIRequestFactory().get('/api/parts/?type=gpu'))
+        self.assertEqual(cache_set.call_args.kwargs['timeout'], 90)
+
+
+@override_settings(
+    MONGODB_HOST='mongodb://db.invalid:27017/pcparts_db', MONGODB_CONNECT_ON_STARTUP=False,
+    MONGODB_CONNECT_OPTIONS={'maxPoolSize': 7, 'serverSelectionTimeoutMS': 50},
+)
+class DatabaseSetupTests(SimpleTestCase):
+    def setUp(self):
+        mongoengine.disconnect()
+
+    def tearDown(self):
+        mongoengine.disconnect()
+
+    def test_configure_connects_on_first_use(self):
+        db.configure()
+        self.assertNotIn('default', mongoengine.connection._connections)
+        client = mongoengine.get_connection()
+        self.assertEqual(client.options.pool_options.max_pool_size, 7)
+        self.assertIn('mongodb_client_seconds', db.startup_timings)
+
+    @override_settings(MONGODB_HOST=None)
+    def test_missing_connection_string_does_not_crash(self):
+        with self.assertLogs('api.db', 'WARNING'):
+            db.configure()
+        with self.assertRaises(mongoengine.connection.ConnectionFailure):
+            mongoengine.get_connection()
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "needs os.fork")
+    def test_forked_child_opens_its_own_client(self):
+        db.configure()
+        parent = mongoengine.get_connection()
+        # what _get_collection caches, without the index creation round trips
+        PCPart._collection = mongoengine.get_db()[PCPart._get_collection_name()]
+        pid = os.fork()
+        if pid == 0:
+            fresh = PCPart._collection is None and mongoengine.get_connection() is not parent
+            os._exit(0 if fresh else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertIs(mongoengine.get_connection(), parent)
+
+
+class BenchmarkCommandTests(SimpleTestCase):
+    def tearDown(self):
+        mongoengine.disconnect()
+
+    def test_writes_percentiles_per_size_and_scenario(self):
+        with tempfile.NamedTemporaryFile('r', suffix='.json') as output:
+            call_command(
+                'benchmark', sizes='60,120', requests=3, warmup=0, scenarios='get_parts_filtered,orders_create',
+                output=output.name, stdout=mock.Mock(),
+            )
+            report = json.load(output)
+        self.assertEqual(report['meta']['database'], 'mongomock')
+        self.assertEqual(
+            [(result['size'], result['scenario']) for result in report['results']],
+            [(60, 'get_parts_filtered'), (60, 'orders_create'), (120, 'get_parts_filtered'), (120, 'orders_create')],
+        )
+        for result in report['results']:
+            self.assertEqual(result['errors'], 0)
+            self.assertEqual(set(result['latency_ms']), {'p50', 'p90', 'p95', 'p99', 'mean', 'max'})
+
+
+class CommandRecorder(monitoring.CommandListener):
+    """Keeps the read commands sent to Mongo so their query plans can be explained afterwards."""
+    READS = ('find', 'aggregate', 'count', 'distinct')
+
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name in self.READS:
+            self.commands.append(dict(event.command))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def winning_stages(explain):
+    """Every stage name in the winning plans of an explain() result, including aggregation sub-plans."""
+    stages = []
+
+    def walk(node, in_plan):
+        if isinstance(node, dict):
+            if in_plan and 'stage' in node:
+                stages.append(node['stage'])
+            for key, value in node.items():
+                if key != 'rejectedPlans':
+                    walk(value, in_plan or key == 'winningPlan')
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_plan)
+
+    walk(explain, False)
+    return stages
+
+
+EXPLAIN_URI = os.getenv('MONGODB_EXPLAIN_URI')
+
+
+@unittest.skipUnless(EXPLAIN_URI, "set MONGODB_EXPLAIN_URI to a disposable mongod (its database is dropped)")
+class QueryPlanTests(SimpleTestCase):
+    """
+    Runs the catalog, cart and order views against a real mongod, then explains every query they
+    sent and fails on collection scans and in-memory sorts. Full-catalog listings without filters
+    and the in-process index builds read every part by design and are not covered.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.recorder = CommandRecorder()
+        mongoengine.disconnect()
+        mongoengine.connect('pcparts_explain_test', host=EXPLAIN_URI, event_listeners=[cls.recorder])
+        db = PCPart._get_db()
+        db.client.drop_database(db.name)
+        for document in (PCPart, User, Order):
+            document.ensure_indexes()
+        for fields in SAMPLE_PARTS:
+            PCPart(**fields).save()
+        insert_parts(synthetic_parts(2000))
+
+        cls.user = User(username='query-plans', password_hash='x')
+        cls.user.save()
+        parts = list(PCPart.objects.limit(3))
+        for day in range(1, 6):
+            Order(
+                user=cls.user, items=[OrderItem(product=part, quantity=1) for part in parts],
+                subtotal=10.0, total_amount=11.3, created_at=datetime.datetime(2025, 3, day),
+            ).save()
+
+        # the in-process indexes load the whole catalog once; build them before recording
+        search.get_index()
+        similar.get_index()
+        get_rule_table()
+
+    @classmethod
+    def tearDownClass(cls):
+        db = PCPart._get_db()
+        db.client.drop_database(db.name)
+        mongoengine.disconnect()
+        reset_indexes()
+        super().tearDownClass()
+
+    def setUp(self):
+        get_cache().clear()
+        user_cache.clear()
+        self.recorder.commands = []
+
+    def assert_plans_use_indexes(self, response):
+        self.assertEqual(response.status_code, 200, getattr(response, 'data', None))
+        self.assertTrue(self.recorder.commands, "the view sent no query")
+        db = PCPart._get_db()
+        for command in self.recorder.commands:
+            command = {key: value for key, value in command.items() if not key.startswith('$') and key != 'lsid'}
+            stages = winning_stages(db.command('explain', command, verbosity='queryPlanner'))
+            self.assertNotIn('COLLSCAN', stages, command)
+            self.assertNotIn('SORT', stages, command)
+        self.recorder.commands = []
+
+    def get(self, view, url, **kwargs):
+        return view(APIRequestFactory().get(url), **kwargs)
+
+    def test_catalog_queries(self):
+        urls = [
+            '/api/parts/?type=CPU',
+            '/api/parts/?type=cpu&sort=price&page_size=10',
+            '/api/parts/?type=GPU&sort=-name&page_size=5',
+            '/api/parts/?manufacturer=amd&sort=price&page_size=5',
+            '/api/parts/?manufacturer=Corsair&sort=name&page_size=5',
+            '/api/parts/?type=cpu&manufacturer=AMD&min_price=100&max_price=900&sort=-price&page_size=5',
+            '/api/parts/?type=CPU&cores__gte=8&socket=AM5',
+            '/api/parts/?type=PSU&wattage__gte=750',
+            '/api/parts/?sort=price&page_size=10',
+            '/api/parts/?page_size=10',
+            '/api/parts/?search=ryzen',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.get(views.get_parts, url)
+                self.assert_plans_use_indexes(response)
+                if isinstance(response.data, dict) and response.data['next_cursor']:
+                    next_page = self.get(views.get_parts, f"{url}&cursor={response.data['next_cursor']}")
+                    self.assert_plans_use_indexes(next_page)
+
+        part_id = str(PCPart.objects.get(name='RM850x').id)
+        self.assert_plans_use_indexes(self.get(views.get_part_by_id, f'/api/parts/{part_id}/', part_id=part_id))
+        self.assert_plans_use_indexes(self.get(views.get_part_facets, '/api/parts/facets/?type=gpu'))
+        self.assert_plans_use_indexes(
+            self.get(views.get_similar_parts, f'/api/parts/{part_id}/similar/', part_id=part_id)
+        )
+
+    def test_cart_queries(self):
+        ids = [str(part.id) for part in PCPart.objects(type_key__in=['cpu', 'psu']).only('id').limit(4)]
+        request = APIRequestFactory().post('/api/cart/tdp/', {'ids': ids}, format='json')
+        self.assert_plans_use_indexes(views.get_cart_tdp(request))
+
+    def test_order_queries(self):
+        token = jwt.encode({'id': str(self.user.id)}, settings.SECRET_KEY, algorithm='HS256')
+        for query in ('', '?expand=product', '?page_size=2'):
+            with self.subTest(query=query):
+                request = APIRequestFactory().get(f'/api/orders/{query}', HTTP_AUTHORIZATION=f'Bearer {token}')
+                self.assert_plans_use_indexes(views.OrderViewSet.as_view({'get': 'list'})(request))
@@ -1,17 +1,29 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register(r'orders', views.OrderViewSet, basename='order')
 
+# API_ASYNC_VIEWS swaps in the async implementations of the hot read endpoints
+catalog_views = async_views if settings.API_ASYNC_VIEWS else views
+
 urlpatterns = [
-    path('parts/', views.get_parts, name='get-parts'),
-    path('parts/<str:part_id>/', views.get_part_by_id, name='get-part-by-id'),
+    path('parts/', catalog_views.get_parts, name='get-parts'),
+    path('parts/facets/', views.get_part_facets, name='get-part-facets'),
+    path('parts/suggest/', views.suggest_parts, name='suggest-parts'),
+    path('parts/batch/', views.get_parts_batch, name='get-parts-batch'),
+    path('parts/<str:part_id>/', catalog_views.get_part_by_id, name='get-part-by-id'),
+    path('parts/<str:part_id>/similar/', views.get_similar_parts, name='get-similar-parts'),
     path('register/', views.register_view, name='register'),
     path('login/', views.login_view, name='login'),
     path('create-checkout-session/', views.create_checkout_session, name='create-checkout-session'),
     path('session-status/', views.session_status, name='session-status'),
-    path("cart/tdp/", views.get_cart_tdp, name="cart-tdp"),
+    path("cart/tdp/", catalog_views.get_cart_tdp, name="cart-tdp"),
+    path("cart/compatibility/", views.check_cart_compatibility, name="cart-compatibility"),
+    path("cart/evaluate/", views.evaluate_carts_view, name="cart-evaluate"),
+    path("build/", views.auto_build_view, name="auto-build"),
+    *([path('orders/', async_views.orders, name='order-list')] if settings.API_ASYNC_VIEWS else []),
     path('', include(router.urls)),
 ] 
\ No newline at end of file
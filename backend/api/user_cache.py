@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class UserCache:
+    """
+    Bounded LRU of authenticated users keyed by user id, with a TTL so writes made by
+    other workers are picked up. Lookups that miss are never cached, so deleted users
+    stop authenticating as soon as their entry is invalidated or expires. A load that an
+    invalidation overtakes is returned but not stored, so it cannot put back the user as read
+    before the write.
+    """
+
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # user id -> [generation, loads in flight]; invalidate() bumps the generation of a key being loaded
+        self._loading = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id, loader):
+        key = str(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            loading = self._loading.setdefault(key, [0, 0])
+            loading[1] += 1
+            generation = loading[0]
+
+        try:
+            user = loader(user_id)
+        except BaseException:
+            with self._lock:
+                self._done_loading(key)
+            raise
+
+        with self._lock:
+            if self._done_loading(key) == generation:
+                self._entries[key] = (now + self.ttl, user)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return user
+
+    def _done_loading(self, key):
+        """Ends one load of ``key`` and returns the key's current generation. Call with the lock held."""
+        loading = self._loading[key]
+        loading[1] -= 1
+        if not loading[1]:
+            del self._loading[key]
+        return loading[0]
+
+    def invalidate(self, user_id):
+        key = str(user_id)
+        with self._lock:
+            self._entries.pop(key, None)
+            if key in self._loading:
+                self._loading[key][0] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for loading in self._loading.values():
+                loading[0] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+user_cache = UserCache(
+    max_size=getattr(settings, 'AUTH_USER_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'AUTH_USER_CACHE_TTL', 60),
+)
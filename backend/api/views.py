@@ -1,71 +1,99 @@
 import asyncio
+import datetime
+import json
+import math
+import secrets
 import time
 import jwt
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.http import JsonResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.pagination import PageNumberPagination
 from .models import PCPart, User, Order
-from .serializers import PCPartSerializer, UserSerializer, OrderSerializer
+from .serializers import (
+    ORDER_PRODUCT_FIELDS, OrderImportSerializer, OrderSerializer, PCPartSerializer, RawPCPartSerializer,
+    UserSerializer, fetch_order_products, order_product_ids, parse_part_fields, select_part_fields,
+)
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework_mongoengine import viewsets as mongo_viewsets
 from .permissions import IsAuthenticatedCustom
-from bson import ObjectId
+from .builder import DEFAULT_USE_CASE as BUILDER_DEFAULT_USE_CASE, SCORE_WEIGHTS as BUILDER_SCORE_WEIGHTS
+from .builder import NoBuildFound, auto_build
+from .cache import cache_parts, cached_catalog_response, get_cached_parts
+from .db import routed
+from .compatibility import (
+    CART_PROJECTION, cart_tdp_summary, check_compatibility, evaluate_carts, get_rule_table, parse_object_ids,
+)
+from .filters import facet_stages, filter_parts, format_facets
+from .instrumentation import timed
+from .pagination import PagePlan, PaginationError, paginate_parts, sort_fields
+from .passwords import HashingBusy, check_password_async, hash_password_async, needs_rehash
+from .similar import DEFAULT_LIMIT as SIMILAR_DEFAULT_LIMIT, MAX_LIMIT as SIMILAR_MAX_LIMIT, SIMILAR_PROJECTION
+from .similar import get_index as get_similarity_index
+from .snapshot import get_snapshot
+from .suggest import DEFAULT_LIMIT as SUGGEST_DEFAULT_LIMIT, MAX_LIMIT as SUGGEST_MAX_LIMIT
+from .suggest import get_index as get_suggest_index
+from .specs import normalize_text
 
 
 import logging
 import stripe
+from pymongo.errors import BulkWriteError
 
 logger = logging.getLogger(__name__)
 
+# Serve catalog reads from raw documents instead of hydrating mongoengine Documents
+FAST_PATH = getattr(settings, 'PARTS_FAST_PATH', True)
+ORDER_IMPORT_MAX_BATCH = getattr(settings, 'ORDER_IMPORT_MAX_BATCH', 5000)
+# inserts tried per imported order whose generated order number is already taken
+ORDER_NUMBER_ATTEMPTS = 3
+CART_BATCH_MAX = getattr(settings, 'CART_BATCH_MAX', 100)
+PARTS_BATCH_MAX = getattr(settings, 'PARTS_BATCH_MAX', 200)
+
 @api_view(['GET'])
+@cached_catalog_response
 def get_parts(request):
     try:
-        queryset = PCPart.objects
-
-        part_type = request.query_params.get('type')
-        if part_type and part_type.lower() != 'all':
-            queryset = queryset.filter(type__iexact=part_type)
+        try:
+            fields = parse_part_fields(request.query_params.get('fields'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        manufacturer = request.query_params.get('manufacturer')
-        if manufacturer and manufacturer.lower() != 'all':
-            queryset = queryset.filter(manufacturer__iexact=manufacturer)
-
-        min_price = request.query_params.get('min_price')
-        if min_price:
+        snapshot = get_snapshot()
+        if snapshot is not None:
             try:
-                min_price_float = float(min_price)
-                queryset = queryset.filter(price__gte=min_price_float)
-            except ValueError:
-                logger.warning(f"Invalid min_price value: {min_price}")
+                plan = PagePlan(request.query_params)
+            except PaginationError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            with timed('snapshot'):
+                parts, next_cursor = plan.finish(snapshot.select(request.query_params, plan))
+            paginated = plan.paginated
+            serializer_class = RawPCPartSerializer
+        else:
+            queryset = filter_parts(routed(PCPart.objects, 'get_parts'), request.query_params)
+            # the sort key is always loaded so the next cursor can be built from the last row
+            projection = set(fields or PCPartSerializer.Meta.fields) | sort_fields(request.query_params)
+            queryset = queryset.only(*projection)
+            if FAST_PATH:
+                queryset = queryset.as_pymongo()
 
-        max_price = request.query_params.get('max_price')
-        if max_price:
             try:
-                max_price_float = float(max_price)
-                queryset = queryset.filter(price__lte=max_price_float)
-            except ValueError:
-                logger.warning(f"Invalid max_price value: {max_price}")
-
-        search = request.query_params.get('search')
-        if search:
-            search = search.strip()
-            try:
-                queryset = queryset.filter(__raw__={
-                    '$or': [
-                        {'name': {'$regex': search, '$options': 'i'}},
-                        {'manufacturer': {'$regex': search, '$options': 'i'}},
-                        {'type': {'$regex': search, '$options': 'i'}},
-                    ]
-                })
-            except Exception as e:
-                logger.error(f"Search error: {str(e)}")
-                raise
+                parts, next_cursor, paginated = paginate_parts(queryset, request.query_params)
+            except PaginationError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            serializer_class = RawPCPartSerializer if FAST_PATH else PCPartSerializer
 
-        parts = list(queryset)
-        serializer = PCPartSerializer(parts, many=True)
+        serializer = serializer_class(parts, many=True, fields=fields)
         data = serializer.data
+        if paginated:
+            return Response({
+                "results": data,
+                "next_cursor": next_cursor,
+            })
         return Response(data)
     except Exception as e:
         logger.error(f"Error in get_parts: {str(e)}", exc_info=True)
@@ -74,12 +102,31 @@ def get_parts(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
+@cached_catalog_response
 def get_part_by_id(request, part_id):
     """Fetches a single PCPart by its ID."""
     try:
-        part = PCPart.objects.get(id=part_id)
-        serializer = PCPartSerializer(part)
-        return Response(serializer.data)
+        try:
+            fields = parse_part_fields(request.query_params.get('fields'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        cached = get_cached_parts([part_id])
+        if part_id in cached:
+            return Response(select_part_fields(cached[part_id], fields))
+
+        # the whole part is loaded, whatever ``fields`` asks for, so the entry serves any projection
+        queryset = routed(PCPart.objects, 'get_part_by_id').filter(id=part_id)
+        queryset = queryset.only(*PCPartSerializer.Meta.fields)
+        if FAST_PATH:
+            part = queryset.as_pymongo().first()
+            if part is None:
+                raise PCPart.DoesNotExist
+            data = RawPCPartSerializer(part).data
+        else:
+            data = PCPartSerializer(queryset.get()).data
+        cache_parts({part_id: data}, 'get_part_by_id')
+        return Response(select_part_fields(data, fields))
     except PCPart.DoesNotExist:
         return Response({'error': 'Part not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
@@ -88,43 +135,193 @@ def get_part_by_id(request, part_id):
             "error": "An error occurred while fetching the part. Please try again."
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-@csrf_exempt
-@api_view(['POST'])
-def register_view(request):
-    data = request.data
+@api_view(['GET'])
+@cached_catalog_response
+def get_similar_parts(request, part_id):
+    """Parts of the same type with the closest specs and price, nearest first, each with its distance."""
+    try:
+        try:
+            fields = parse_part_fields(request.query_params.get('fields'))
+            limit = int(request.query_params.get('limit', SIMILAR_DEFAULT_LIMIT))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, SIMILAR_MAX_LIMIT))
+
+        catalog = routed(PCPart.objects, 'get_similar_parts')
+        object_ids = parse_object_ids([part_id])
+        index = get_similarity_index()
+        doc = None
+        if part_id not in index:
+            doc = catalog.filter(id__in=object_ids).only(*SIMILAR_PROJECTION).as_pymongo().first()
+            if doc is None:
+                return Response({'error': 'Part not found'}, status=status.HTTP_404_NOT_FOUND)
+        # ask for spares: parts deleted since the index was built are dropped below
+        neighbours = index.similar(part_id, 2 * limit, doc=doc)
+
+        projection = set(fields or PCPartSerializer.Meta.fields)
+        parts = catalog.filter(id__in=parse_object_ids([pid for pid, _ in neighbours])).only(*projection).as_pymongo()
+        parts = {str(part['_id']): part for part in parts}
+        return Response([
+            {**RawPCPartSerializer(parts[pid], fields=fields).data, 'distance': round(distance, 4)}
+            for pid, distance in neighbours if pid in parts
+        ][:limit])
+    except Exception as e:
+        logger.error(f"Error in get_similar_parts for ID {part_id}: {str(e)}", exc_info=True)
+        return Response({
+            "error": "An error occurred while fetching similar parts. Please try again."
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _batch_ids(request):
+    """Part ids from ``?ids=a,b`` (GET) or a ``{"ids": [...]}`` body (POST). Raises ValueError."""
+    if request.method == 'GET':
+        raw = request.query_params.get('ids', '')
+        return [part_id.strip() for part_id in raw.split(',') if part_id.strip()]
+    part_ids = request.data.get('ids') if isinstance(request.data, dict) else None
+    if not isinstance(part_ids, list) or not all(isinstance(part_id, str) for part_id in part_ids):
+        raise ValueError("Expected a list of part IDs in ids")
+    return part_ids
+
+
+@api_view(['GET', 'POST'])
+def get_parts_batch(request):
+    """
+    Many parts in one request, replacing a get_part_by_id call per cart or order item: the found
+    parts in request order and the ids that matched none. Shares get_part_by_id's per-part cache;
+    the rest are fetched with one ``$in`` query.
+    """
+    try:
+        try:
+            fields = parse_part_fields(request.query_params.get('fields'))
+            part_ids = _batch_ids(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if len(part_ids) > PARTS_BATCH_MAX:
+            return Response({"error": f"At most {PARTS_BATCH_MAX} parts can be fetched at once"}, status=status.HTTP_400_BAD_REQUEST)
+
+        unique_ids = list(dict.fromkeys(part_ids))
+        parts = get_cached_parts(unique_ids)
+        object_ids = parse_object_ids([part_id for part_id in unique_ids if part_id not in parts])
+        if object_ids:
+            queryset = routed(PCPart.objects, 'get_parts_batch').filter(id__in=object_ids)
+            fetched = {str(doc['_id']): RawPCPartSerializer(doc).data
+                       for doc in queryset.only(*PCPartSerializer.Meta.fields).as_pymongo()}
+            cache_parts(fetched, 'get_parts_batch')
+            parts.update(fetched)
+
+        return Response({
+            "results": [select_part_fields(parts[part_id], fields) for part_id in part_ids if part_id in parts],
+            "missing": [part_id for part_id in unique_ids if part_id not in parts],
+        })
+    except Exception as e:
+        logger.error(f"Error in get_parts_batch: {str(e)}", exc_info=True)
+        return Response({
+            "error": "An error occurred while fetching parts. Please try again."
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+def suggest_parts(request):
+    """Typeahead: ids and display names of parts whose name or manufacturer starts with ``q``, most ordered first."""
+    try:
+        try:
+            limit = int(request.query_params.get('limit', SUGGEST_DEFAULT_LIMIT))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+
+        suggestions = get_suggest_index().suggest(request.query_params.get('q', ''), limit)
+        return Response([{'id': part_id, 'name': name} for part_id, name in suggestions])
+    except Exception as e:
+        logger.error(f"Error in suggest_parts: {str(e)}", exc_info=True)
+        return Response({
+            "error": "An error occurred while fetching suggestions. Please try again."
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@cached_catalog_response
+def get_part_facets(request):
+    """Counts per type and manufacturer, a price histogram and spec ranges for the filtered catalog."""
+    try:
+        queryset = filter_parts(PCPart.objects, request.query_params)
+        result = next(queryset.aggregate([{'$facet': facet_stages()}]), {})
+        return Response(format_facets(result))
+    except Exception as e:
+        logger.error(f"Error in get_part_facets: {str(e)}", exc_info=True)
+        return Response({
+            "error": "An error occurred while fetching facets. Please try again."
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def async_csrf_exempt(view):
+    # django.views.decorators.csrf.csrf_exempt wraps views in a sync function on Django 4.2,
+    # which would hide the coroutine from the handler, so mark the view in place instead
+    view.csrf_exempt = True
+    return view
+
+
+def _json_body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def method_not_allowed(request):
+    return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+@async_csrf_exempt
+async def register_view(request):
+    """Async so password hashing runs on the hashing executor instead of blocking a request worker."""
+    if request.method != 'POST':
+        return method_not_allowed(request)
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=status.HTTP_400_BAD_REQUEST)
     username = data.get('username')
     password = data.get('password')
     
     if not username or not password:
-        return Response({'error': 'All fields required'}, status=status.HTTP_400_BAD_REQUEST)
-    if User.objects(username=username).first():
-        return Response({'error': 'User already exists'}, status=status.HTTP_400_BAD_REQUEST)
-    user = User(username=username)
-    user.set_password(password)
-    user.save()
+        return JsonResponse({'error': 'All fields required'}, status=status.HTTP_400_BAD_REQUEST)
+    if await sync_to_async(User.objects(username=username).first, thread_sensitive=False)():
+        return JsonResponse({'error': 'User already exists'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        password_hash = await hash_password_async(password)
+    except HashingBusy:
+        return JsonResponse({'error': 'Server busy, please retry'}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
+    user = User(username=username, password_hash=password_hash)
+    await sync_to_async(user.save, thread_sensitive=False)()
     serializer = UserSerializer(user)
-    return Response({
+    return JsonResponse({
         'message': 'User registered successfully',
         'user': serializer.data
     }, status=status.HTTP_201_CREATED)
 
-@csrf_exempt
-@api_view(['POST'])
-def login_view(request):
-    data = request.data
+@async_csrf_exempt
+async def login_view(request):
+    """Verifies the password off the request thread and upgrades hashes made with an old PASSWORD_HASH_METHOD."""
+    if request.method != 'POST':
+        return method_not_allowed(request)
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=status.HTTP_400_BAD_REQUEST)
     username = data.get('username')
     password = data.get('password')
     
     if not username or not password:
-        return Response({'error': 'All fields required'}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse({'error': 'All fields required'}, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        user = User.objects.get(username=username)
-    except User.DoesNotExist:
-        return Response({'error': 'Invalid username or password'}, status=status.HTTP_401_UNAUTHORIZED)
+    user = await sync_to_async(User.objects(username=username).first, thread_sensitive=False)()
+    if user is None:
+        return JsonResponse({'error': 'Invalid username or password'}, status=status.HTTP_401_UNAUTHORIZED)
     
-    if not user.check_password(password):
-        return Response({'error': 'Invalid username or password'}, status=status.HTTP_401_UNAUTHORIZED)
+    try:
+        if not await check_password_async(user.password_hash, password):
+            return JsonResponse({'error': 'Invalid username or password'}, status=status.HTTP_401_UNAUTHORIZED)
+        if needs_rehash(user.password_hash):
+            user.password_hash = await hash_password_async(password)
+            await sync_to_async(user.save, thread_sensitive=False)()
+    except HashingBusy:
+        return JsonResponse({'error': 'Server busy, please retry'}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
     
     payload = {
         'id': str(user.id),
@@ -134,20 +331,29 @@ def login_view(request):
     
     token = jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
     serializer = UserSerializer(user)
-    return Response({
+    return JsonResponse({
         'token': token,
         'user': serializer.data
     })
 
+class OrderPagination(PageNumberPagination):
+    """Opt-in: orders are paginated only when the client sends ?page_size=."""
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
 class OrderViewSet(mongo_viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticatedCustom]
+    pagination_class = OrderPagination
 
     def get_queryset(self):
         user = self.request.user
         if user:
             try:
-                return Order.objects.filter(user=user).order_by('-created_at')
+                # references are resolved in bulk by the serializer context, never one by one
+                return Order.objects.filter(user=user).order_by('-created_at').no_dereference()
             except TypeError:
                 logger.error(f"TypeError filtering orders for user {user}. Is request.user a MongoEngine User object?", exc_info=True)
                 return Order.objects.none()
@@ -160,6 +366,119 @@ class OrderViewSet(mongo_viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def _expand_products(self, orders):
+        """With ?expand=product, loads summaries of every product on the page in one $in query."""
+        if self.request.query_params.get('expand') != 'product':
+            return {}
+        summaries = PCPart.objects(id__in=order_product_ids(orders)).only(*ORDER_PRODUCT_FIELDS).as_pymongo()
+        return {'products': {
+            str(doc['_id']): RawPCPartSerializer(doc, fields=ORDER_PRODUCT_FIELDS).data for doc in summaries
+        }}
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        orders = list(page if page is not None else queryset)
+        context = {**self.get_serializer_context(), **self._expand_products(orders)}
+        serializer = self.get_serializer(orders, many=True, context=context)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        order = self.get_object()
+        context = {**self.get_serializer_context(), **self._expand_products([order])}
+        serializer = self.get_serializer(order, context=context)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """
+        Validates and inserts a batch of the caller's orders (e.g. replayed from the POS) with one
+        product lookup and one insert_many. Nothing is written unless every order is valid. Orders
+        whose order_number already exists are skipped, so a replay can safely be retried; orders
+        without one whose generated number is taken are retried under a new number.
+        """
+        orders_input = request.data.get('orders') if isinstance(request.data, dict) else None
+        if not isinstance(orders_input, list) or not orders_input:
+            return Response({"error": "Expected a non-empty list of orders"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(orders_input) > ORDER_IMPORT_MAX_BATCH:
+            return Response(
+                {"error": f"At most {ORDER_IMPORT_MAX_BATCH} orders can be imported at once"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        product_ids = [
+            item.get('product_id')
+            for entry in orders_input if isinstance(entry, dict)
+            for item in entry.get('order_items_input') or [] if isinstance(item, dict)
+        ]
+        context = {**self.get_serializer_context(), 'products': fetch_order_products(product_ids)}
+
+        orders = []
+        errors = {}
+        for index, entry in enumerate(orders_input):
+            serializer = OrderImportSerializer(data=entry, context=context)
+            if not serializer.is_valid():
+                errors[index] = serializer.errors
+                continue
+            orders.append((index, serializer.build_order({**serializer.validated_data, 'user': request.user})))
+
+        documents = []
+        # input index of each document, and whether the client gave its order number
+        sources = []
+        numbers = set()
+        now = datetime.datetime.utcnow()
+        for index, order in orders:
+            replayed = bool(order.order_number)
+            number = order.assign_order_number()
+            if number in numbers:
+                if replayed:
+                    errors[index] = {'order_number': [f"Duplicate order number in this import: {number}"]}
+                    continue
+                # generated numbers only have one-second resolution
+                suffix = 2
+                while f"{number}-{suffix}" in numbers:
+                    suffix += 1
+                order.order_number = number = f"{number}-{suffix}"
+            numbers.add(number)
+            order.updated_at = now
+            order.validate()
+            documents.append(order.to_mongo().to_dict())
+            sources.append((index, replayed))
+        if errors:
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        skipped = set()
+        pending = list(range(len(documents)))
+        for _ in range(ORDER_NUMBER_ATTEMPTS):
+            try:
+                Order._get_collection().insert_many([documents[i] for i in pending], ordered=False)
+                taken = []
+            except BulkWriteError as e:
+                write_errors = e.details.get('writeErrors', [])
+                if any(error.get('code') != 11000 for error in write_errors):
+                    logger.error(f"Error importing orders for user {request.user}: {e.details}")
+                    return Response({'error': 'An internal server error occurred.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                taken = [pending[error['index']] for error in write_errors]
+            # a replayed number that exists was imported before; a generated one collided with another order
+            skipped.update(i for i in taken if sources[i][1])
+            pending = [i for i in taken if not sources[i][1]]
+            if not pending:
+                break
+            for i in pending:
+                documents[i]['order_number'] = f"{documents[i]['order_number']}-{secrets.token_hex(2)}"
+        if pending:
+            logger.error(f"Could not assign unique order numbers importing orders for user {request.user}")
+            errors = {sources[i][0]: {'order_number': ["Could not assign a unique order number"]} for i in pending}
+
+        created = [str(doc['_id']) for i, doc in enumerate(documents) if i not in skipped and i not in pending]
+        return Response({
+            "created": created,
+            "skipped": [doc['order_number'] for i, doc in enumerate(documents) if i in skipped],
+            **({"errors": errors} if errors else {}),
+        }, status=status.HTTP_201_CREATED)
+
 # --- Stripe Views Start ---
 
 @api_view(['POST'])
@@ -215,40 +534,79 @@ def get_cart_tdp(request):
         if not part_ids or not isinstance(part_ids, list):
             return Response({"error": "Expected list of part IDs"}, status=400)
 
-        
-        object_ids = []
-        for pid in part_ids:
-            try:
-                object_ids.append(ObjectId(pid))
-            except:
-                continue  
-
-        parts = PCPart.objects(id__in=object_ids)
-
-        
-        total_tdp = sum(part.numeric_spec("TDP") for part in parts)
-
-        psu_warnings = []
-        for part in parts:
-            if part.type.strip().upper() == "PSU":
-                wattage = part.numeric_spec("Wattage")
-                if wattage == 0:
-                    psu_warnings.append({
-                        "psu_name": part.name,
-                        "wattage": "Unknown",
-                        "warning": f"Could not read wattage for PSU: {part.name}"
-                    })
-                elif total_tdp > wattage:
-                    psu_warnings.append({
-                        "psu_name": part.name,
-                        "wattage": wattage,
-                        "warning": f"Total TDP ({total_tdp}W) exceeds PSU wattage ({wattage}W)"
-                    })
+        object_ids = parse_object_ids(part_ids)
+        parts = PCPart.objects(id__in=object_ids).only(*CART_PROJECTION).as_pymongo()
+        return Response(cart_tdp_summary(parts))
+
+    except Exception as e:
+        return Response({"error": str(e)}, status=500)
 
-        return Response({
-            "total_tdp": total_tdp,
-            "psu_warnings": psu_warnings
-        })
+
+@csrf_exempt
+@api_view(['POST'])
+def check_cart_compatibility(request):
+    """Socket, memory type, form factor and PSU checks for a cart, answered from the in-memory rule table."""
+    try:
+        part_ids = request.data.get("ids", [])
+        if not part_ids or not isinstance(part_ids, list):
+            return Response({"error": "Expected list of part IDs"}, status=400)
+
+        parts, missing_ids = get_rule_table().resolve(part_ids)
+        return Response({**check_compatibility(parts), "missing_ids": missing_ids})
+
+    except Exception as e:
+        logger.error(f"Error checking cart compatibility: {e}", exc_info=True)
+        return Response({"error": str(e)}, status=500)
+
+
+@csrf_exempt
+@api_view(['POST'])
+def evaluate_carts_view(request):
+    """Total TDP, PSU warnings and price total for each of many candidate builds in one request."""
+    try:
+        carts = request.data.get("carts", [])
+        if not carts or not isinstance(carts, list) or not all(isinstance(cart, list) for cart in carts):
+            return Response({"error": "Expected list of carts, each a list of part IDs"}, status=400)
+        if len(carts) > CART_BATCH_MAX:
+            return Response({"error": f"At most {CART_BATCH_MAX} carts can be evaluated at once"}, status=400)
+
+        return Response({"results": evaluate_carts(carts, get_rule_table())})
 
     except Exception as e:
+        logger.error(f"Error evaluating carts: {e}", exc_info=True)
         return Response({"error": str(e)}, status=500)
+
+
+@api_view(['GET'])
+@cached_catalog_response
+def auto_build_view(request):
+    """
+    Highest scoring compatible build (one part per type) within ?budget=, optionally on ?socket=,
+    with part types weighted for ?use_case= (gaming, workstation or office; see BUILDER_SCORE_WEIGHTS).
+    """
+    try:
+        try:
+            budget = float(request.query_params.get('budget', ''))
+        except ValueError:
+            budget = 0
+        if not (math.isfinite(budget) and budget > 0):
+            return Response({"error": "budget must be a positive number"}, status=status.HTTP_400_BAD_REQUEST)
+        socket = request.query_params.get('socket')
+        use_case = request.query_params.get('use_case', BUILDER_DEFAULT_USE_CASE)
+        if use_case not in BUILDER_SCORE_WEIGHTS:
+            return Response(
+                {"error": f"use_case must be one of {', '.join(BUILDER_SCORE_WEIGHTS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            build = auto_build(get_rule_table(), budget, normalize_text(socket) if socket else None, use_case)
+        except NoBuildFound:
+            return Response({"error": "No compatible build fits within the budget"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(build)
+
+    except Exception as e:
+        logger.error(f"Error in auto_build_view: {str(e)}", exc_info=True)
+        return Response({
+            "error": "An error occurred while generating a build. Please try again."
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
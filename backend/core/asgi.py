@@ -2,15 +2,23 @@
 ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (``uvicorn core.asgi:application``) so async views such
+as login_view and register_view run on the event loop instead of a worker thread.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
 
 import os
+import time
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
+started = time.perf_counter()
 application = get_asgi_application()
+
+from api.db import startup_timings  # noqa: E402
+
+startup_timings['application_load_seconds'] = time.perf_counter() - started
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from pathlib import Path
+import json
 import os
 from dotenv import load_dotenv
 
@@ -52,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.instrumentation.TimingMiddleware',  # first, so its total covers every other layer
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Add CORS middleware
@@ -94,18 +96,135 @@ DATABASES = {
 }
 
 # MongoDB settings
-import mongoengine
-
+# api/db.py registers the connection in ApiConfig.ready; the client and its pool are created
+# by the first query in each process, so manage.py commands that never query stay fast.
 # Get the connection string and add database name if not present
 connection_string = os.getenv('MONGODB_CONNECTION_STRING')
 db_name = os.getenv('MONGODB_DB_NAME', 'pcparts_db')
 
 # Ensure the database name is in the connection string
-if '/' not in connection_string.split('?')[0]:
+if connection_string and '/' not in connection_string.split('?')[0]:
     connection_string = connection_string.replace('/?', f'/{db_name}/?')
 
-# Connect with TLS/SSL certificate verification disabled
-mongoengine.connect(host=connection_string, ssl=True, tlsAllowInvalidCertificates=True)
+MONGODB_HOST = connection_string
+# Connect with TLS/SSL certificate verification disabled unless told otherwise
+MONGODB_CONNECT_OPTIONS = {
+    'ssl': os.getenv('MONGODB_TLS', 'true').lower() in ('1', 'true', 'yes'),
+    'tlsAllowInvalidCertificates': os.getenv('MONGODB_TLS_ALLOW_INVALID_CERTIFICATES', 'true').lower() in ('1', 'true', 'yes'),
+}
+# Pool and timeouts per deployment; unset ones keep the pymongo defaults. Every worker process
+# opens its own pool, so MONGODB_MAX_POOL_SIZE x workers has to fit the server's connection limit.
+for option, variable in (
+    ('maxPoolSize', 'MONGODB_MAX_POOL_SIZE'),
+    ('minPoolSize', 'MONGODB_MIN_POOL_SIZE'),
+    ('maxIdleTimeMS', 'MONGODB_MAX_IDLE_TIME_MS'),
+    ('waitQueueTimeoutMS', 'MONGODB_WAIT_QUEUE_TIMEOUT_MS'),
+    ('connectTimeoutMS', 'MONGODB_CONNECT_TIMEOUT_MS'),
+    ('serverSelectionTimeoutMS', 'MONGODB_SERVER_SELECTION_TIMEOUT_MS'),
+    ('socketTimeoutMS', 'MONGODB_SOCKET_TIMEOUT_MS'),
+):
+    if os.getenv(variable):
+        MONGODB_CONNECT_OPTIONS[option] = int(os.getenv(variable))
+# Wire compression, e.g. "zstd,zlib" (zstd and snappy need the zstandard / python-snappy packages)
+if os.getenv('MONGODB_COMPRESSORS'):
+    MONGODB_CONNECT_OPTIONS['compressors'] = os.getenv('MONGODB_COMPRESSORS')
+# Open the pool and ping the server while the app loads instead of on the first request
+MONGODB_CONNECT_ON_STARTUP = os.getenv('MONGODB_CONNECT_ON_STARTUP', 'false').lower() in ('1', 'true', 'yes')
+# Read preferences by view name or model name (a view's entry wins), applied to the reads routed
+# through api.db.routed(): the catalog list, detail, batch and similar-parts views. A mode may
+# carry a max staleness in seconds (90 or more), e.g. "secondaryPreferred:90"; catalog edits can
+# take that long to show there, so catalog cache entries are kept no longer than that bound
+# either. Orders, users and the prices orders are charged at are never routed and always read
+# from the primary. Extra entries can be given as JSON in MONGODB_READ_PREFERENCES.
+MONGODB_READ_PREFERENCES = {
+    'PCPart': os.getenv('CATALOG_READ_PREFERENCE', 'secondaryPreferred:90'),
+    **json.loads(os.getenv('MONGODB_READ_PREFERENCES', '{}')),
+}
+
+# Route catalog and order-listing endpoints to the async views in api/async_views.py
+# (serve with core.asgi). They use one motor client per event loop with this pool size.
+API_ASYNC_VIEWS = os.getenv('API_ASYNC_VIEWS', 'false').lower() in ('1', 'true', 'yes')
+ASYNC_MONGODB_POOL_SIZE = int(os.getenv('ASYNC_MONGODB_POOL_SIZE', 100))
+
+# Caches
+# The 'catalog' cache backs the catalog response cache (api/cache.py). It defaults to an
+# in-process LRU; set CATALOG_CACHE_BACKEND/CATALOG_CACHE_LOCATION to a shared backend
+# (e.g. django.core.cache.backends.redis.RedisCache) so invalidations reach every worker.
+
+CATALOG_CACHE_BACKEND = os.getenv('CATALOG_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': CATALOG_CACHE_BACKEND,
+        'LOCATION': os.getenv('CATALOG_CACHE_LOCATION', 'catalog'),
+        'TIMEOUT': int(os.getenv('CATALOG_CACHE_TIMEOUT', 300)),
+    },
+}
+if CATALOG_CACHE_BACKEND.endswith('LocMemCache'):
+    CACHES['catalog']['OPTIONS'] = {'MAX_ENTRIES': int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', 5000))}
+
+CATALOG_CACHE_MAX_AGE = int(os.getenv('CATALOG_CACHE_MAX_AGE', 60))
+
+# In-memory columnar snapshot of the catalog (api/snapshot.py) answering /api/parts/ without a
+# Mongo round trip. Each worker process holds its own copy and keeps it current from a change
+# stream (replica sets) or by polling the catalog revision every CATALOG_SNAPSHOT_POLL_SECONDS.
+CATALOG_SNAPSHOT = os.getenv('CATALOG_SNAPSHOT', 'false').lower() in ('1', 'true', 'yes')
+CATALOG_SNAPSHOT_POLL_SECONDS = float(os.getenv('CATALOG_SNAPSHOT_POLL_SECONDS', 5))
+CATALOG_SNAPSHOT_CHANGE_STREAMS = os.getenv('CATALOG_SNAPSHOT_CHANGE_STREAMS', 'true').lower() in ('1', 'true', 'yes')
+
+# Users resolved by IsAuthenticatedCustom are cached per process (api/user_cache.py)
+AUTH_USER_CACHE_SIZE = int(os.getenv('AUTH_USER_CACHE_SIZE', 1024))
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', 60))
+
+# Spare PSU capacity over the cart's total TDP below which /api/cart/compatibility/ warns
+CART_PSU_HEADROOM = float(os.getenv('CART_PSU_HEADROOM', 1.25))
+# Most carts accepted by one POST /api/cart/evaluate/
+CART_BATCH_MAX = int(os.getenv('CART_BATCH_MAX', 100))
+# Most part ids resolved by one /api/parts/batch/ request
+PARTS_BATCH_MAX = int(os.getenv('PARTS_BATCH_MAX', 200))
+
+# Largest batch accepted by POST /api/orders/import/ (bulk replay of POS orders)
+ORDER_IMPORT_MAX_BATCH = int(os.getenv('ORDER_IMPORT_MAX_BATCH', 5000))
+
+# Per-request instrumentation (api/instrumentation.py): a Server-Timing header, one JSON line per
+# request on the api.requests logger and Prometheus histograms. Mongo commands slower than
+# SLOW_QUERY_MS (0 disables) are logged on api.slow_queries.
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'true').lower() in ('1', 'true', 'yes')
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 100))
+# The histograms are served at /metrics only with METRICS_ENABLED=true. They show per-route
+# latency and user cache stats, so also set METRICS_TOKEN and give the scraper the same value as
+# a bearer token (Prometheus: `authorization: {credentials: <token>}` in the scrape config);
+# without a token /metrics is open to anyone who can reach the server.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'structured': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+    },
+    'loggers': {
+        'api.requests': {
+            'handlers': ['structured'], 'level': os.getenv('REQUEST_LOG_LEVEL', 'INFO'), 'propagate': False,
+        },
+        'api.slow_queries': {'handlers': ['structured'], 'level': 'WARNING', 'propagate': False},
+        # connection and startup timings of each process
+        'api.db': {'handlers': ['structured'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Password hashing (api/passwords.py). Hashes made with another method or cost are
+# upgraded transparently on the next successful login.
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 4))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', 32))
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -8,9 +8,15 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 """
 
 import os
+import time
 
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
+started = time.perf_counter()
 application = get_wsgi_application()
+
+from api.db import startup_timings  # noqa: E402
+
+startup_timings['application_load_seconds'] = time.perf_counter() - started